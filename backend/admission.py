@@ -0,0 +1,380 @@
+import math
+import random
+import threading
+import time
+import uuid
+from collections import Counter, OrderedDict
+from functools import wraps
+from flask import current_app, g, jsonify, request
+from flask_jwt_extended import get_jwt_identity, verify_jwt_in_request
+
+# Admission control for the routes that come in bursts and are expensive:
+# login and register (bcrypt) and reservation writes (write transactions).
+# Each policy rate limits every client IP and every user with a token bucket
+# (429 when it is empty) and caps how many of its requests run at once.
+# Requests over the cap wait in a bounded queue; once ADMISSION_*_QUEUE are
+# already waiting, or after ADMISSION_QUEUE_TIMEOUT_SECONDS, they get 503.
+# Both responses carry Retry-After. A burst is shed at the door instead of
+# tying up every worker in front of /api/books.
+#
+# State is per process by default. With ADMISSION_WORKERS > 1 each worker
+# then gets its share of the rates, bursts, slots and queue, but a sync worker
+# runs one request at a time, so its slots and queue never engage: set
+# ADMISSION_REDIS_URL to share buckets and slots across workers and hosts.
+# If Redis fails, each worker falls back to its own state until it answers again.
+
+POLICIES = ('login', 'reservations')
+OUTCOMES = ('admitted', 'rate_limited_ip', 'rate_limited_user', 'queue_full', 'queue_timeout')
+
+# A shared slot whose holder died without releasing it frees itself after this long
+SLOT_LEASE_SECONDS = 60
+SHARED_POLL_SECONDS = 0.01
+SHARED_RETRY_SECONDS = 30
+MAX_BUCKETS = 100000
+
+# Status and message of each way a request can be turned away
+REJECTIONS = {
+    'rate_limited_ip': (429, 'Too many requests from this address, please retry later'),
+    'rate_limited_user': (429, 'Too many requests for this account, please retry later'),
+    'queue_full': (503, 'Server is busy, please retry shortly'),
+    'queue_timeout': (503, 'Server is busy, please retry shortly'),
+}
+
+
+class Policy:
+    """Limits for one group of routes, from the ADMISSION_<NAME>_* settings.
+
+    `workers` processes that each keep their own state share the limits.
+    """
+
+    def __init__(self, name, config, workers=1):
+        prefix = f'ADMISSION_{name.upper()}_'
+        self.name = name
+        self.concurrency = math.ceil(config[prefix + 'CONCURRENCY'] / workers)
+        self.queue = math.ceil(config[prefix + 'QUEUE'] / workers)
+        self.ip_rate = config[prefix + 'IP_RATE'] / workers
+        self.ip_burst = math.ceil(config[prefix + 'IP_BURST'] / workers)
+        self.user_rate = config[prefix + 'USER_RATE'] / workers
+        self.user_burst = math.ceil(config[prefix + 'USER_BURST'] / workers)
+        self.queue_timeout = config['ADMISSION_QUEUE_TIMEOUT_SECONDS']
+
+
+class MemoryBackend:
+    """Token buckets and concurrency slots in this process"""
+
+    name = 'memory'
+
+    def __init__(self):
+        self._buckets = OrderedDict()
+        self._buckets_lock = threading.Lock()
+        self._slots = {}
+        self._slots_lock = threading.Lock()
+
+    def take_token(self, key, rate, burst):
+        """Take one token from bucket `key`; returns 0, or the seconds until one is available"""
+        now = time.monotonic()
+        with self._buckets_lock:
+            tokens, updated = self._buckets.pop(key, (burst, now))
+            tokens = min(burst, tokens + (now - updated) * rate)
+            wait = 0.0
+            if tokens >= 1:
+                tokens -= 1
+            else:
+                wait = (1 - tokens) / rate
+            self._buckets[key] = (tokens, now)
+            if len(self._buckets) > MAX_BUCKETS:
+                # The least recently used bucket; forgetting it only refills it
+                self._buckets.popitem(last=False)
+        return wait
+
+    def acquire(self, key, limit, queue, timeout):
+        """Wait for one of `limit` slots; returns (outcome, release callable or None)"""
+        with self._slots_lock:
+            slots = self._slots.get(key)
+            if slots is None:
+                slots = self._slots[key] = _Slots()
+
+        with slots.condition:
+            # Queued requests go first: a newcomer only skips the queue when it is empty
+            if slots.running < limit and not slots.waiting:
+                slots.running += 1
+                return 'admitted', slots.release
+            if slots.waiting >= queue:
+                return 'queue_full', None
+
+            slots.waiting += 1
+            try:
+                if not slots.condition.wait_for(lambda: slots.running < limit, timeout):
+                    return 'queue_timeout', None
+                slots.running += 1
+                return 'admitted', slots.release
+            finally:
+                slots.waiting -= 1
+
+    def status(self):
+        with self._slots_lock:
+            return {key: {'running': slots.running, 'waiting': slots.waiting}
+                    for key, slots in self._slots.items()}
+
+
+class _Slots:
+    __slots__ = ('condition', 'running', 'waiting')
+
+    def __init__(self):
+        self.condition = threading.Condition()
+        self.running = 0
+        self.waiting = 0
+
+    def release(self):
+        with self.condition:
+            self.running -= 1
+            self.condition.notify()
+
+
+# KEYS[1] bucket; ARGV rate, burst. Redis' clock, so every host agrees.
+TOKEN_BUCKET_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local tokens = tonumber(state[1]) or burst
+local updated = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - updated) * rate)
+local wait = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+else
+    wait = (1 - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil(burst / rate) + 1)
+return tostring(wait)
+"""
+
+# KEYS running, waiting (sorted sets of request ids scored by expiry time);
+# ARGV id, limit, queue, lease, queue timeout, 1 on the first attempt.
+# Returns 1 admitted, 0 queued (poll again), -1 queue full.
+ACQUIRE_SCRIPT = """
+local id = ARGV[1]
+local limit = tonumber(ARGV[2])
+local queue = tonumber(ARGV[3])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', now)
+redis.call('ZREMRANGEBYSCORE', KEYS[2], '-inf', now)
+local first = ARGV[6] == '1'
+local waiting = redis.call('ZCARD', KEYS[2])
+if redis.call('ZCARD', KEYS[1]) < limit and (waiting == 0 or not first) then
+    redis.call('ZREM', KEYS[2], id)
+    redis.call('ZADD', KEYS[1], now + tonumber(ARGV[4]), id)
+    redis.call('EXPIRE', KEYS[1], math.ceil(tonumber(ARGV[4])) + 1)
+    return 1
+end
+if first then
+    if waiting >= queue then
+        return -1
+    end
+    redis.call('ZADD', KEYS[2], now + tonumber(ARGV[5]), id)
+    redis.call('EXPIRE', KEYS[2], math.ceil(tonumber(ARGV[5])) + 1)
+end
+return 0
+"""
+
+
+class RedisBackend:
+    """Token buckets and concurrency slots shared through Redis"""
+
+    name = 'redis'
+
+    def __init__(self, client, prefix='admission:'):
+        import redis
+        self.client = client
+        self.prefix = prefix
+        self.errors = (redis.RedisError,)
+        self.fallback = MemoryBackend()
+        self._down_until = 0
+        self._take_token = client.register_script(TOKEN_BUCKET_SCRIPT)
+        self._acquire = client.register_script(ACQUIRE_SCRIPT)
+
+    @classmethod
+    def from_url(cls, url):
+        import redis
+        return cls(redis.Redis.from_url(url))
+
+    def _available(self):
+        return time.monotonic() >= self._down_until
+
+    def _mark_down(self, exc):
+        self._down_until = time.monotonic() + SHARED_RETRY_SECONDS
+        print(f"WARNING: admission control Redis failed, using per-process limits for "
+              f"{SHARED_RETRY_SECONDS}s: {exc}")
+
+    def take_token(self, key, rate, burst):
+        if self._available():
+            try:
+                return float(self._take_token(keys=[self.prefix + key], args=[rate, burst]))
+            except self.errors as exc:
+                self._mark_down(exc)
+        return self.fallback.take_token(key, rate, burst)
+
+    def acquire(self, key, limit, queue, timeout):
+        if not self._available():
+            return self.fallback.acquire(key, limit, queue, timeout)
+
+        keys = [f'{self.prefix}{key}:running', f'{self.prefix}{key}:waiting']
+        request_id = uuid.uuid4().hex
+        deadline = time.monotonic() + timeout
+        first = True
+        try:
+            while True:
+                result = self._acquire(keys=keys, args=[request_id, limit, queue, SLOT_LEASE_SECONDS, timeout,
+                                                        1 if first else 0])
+                if result == 1:
+                    return 'admitted', lambda: self._release(keys[0], request_id)
+                if result == -1:
+                    return 'queue_full', None
+                if time.monotonic() >= deadline:
+                    self.client.zrem(keys[1], request_id)
+                    return 'queue_timeout', None
+                first = False
+                time.sleep(SHARED_POLL_SECONDS * random.uniform(0.5, 1.5))
+        except self.errors as exc:
+            self._mark_down(exc)
+            return self.fallback.acquire(key, limit, queue, max(0.0, deadline - time.monotonic()))
+
+    def _release(self, key, request_id):
+        try:
+            self.client.zrem(key, request_id)
+        except self.errors:
+            # The lease runs out on its own
+            pass
+
+    def status(self):
+        return {'redis_available': self._available(), 'fallback': self.fallback.status()}
+
+
+class AdmissionControl:
+    def __init__(self, backend, policies):
+        self.backend = backend
+        self.policies = policies
+        self.decisions = Counter()
+        self._lock = threading.Lock()
+
+    def record(self, policy, outcome):
+        with self._lock:
+            self.decisions[policy, outcome] += 1
+
+    def admit(self, policy, ip, user_key):
+        """Rate limit one request from `ip` (and `user_key`, if not None), then wait for a slot.
+
+        Returns (outcome, release, seconds). `release` is None when the
+        request is turned away, and `seconds` is then its Retry-After;
+        once admitted, it is the time spent queued. May block while queued.
+        """
+        if policy.ip_rate > 0:
+            wait = self.backend.take_token(f'{policy.name}:ip:{ip}', policy.ip_rate, policy.ip_burst)
+            if wait:
+                self.record(policy.name, 'rate_limited_ip')
+                return 'rate_limited_ip', None, wait
+        if policy.user_rate > 0 and user_key is not None:
+            wait = self.backend.take_token(f'{policy.name}:user:{user_key}', policy.user_rate, policy.user_burst)
+            if wait:
+                self.record(policy.name, 'rate_limited_user')
+                return 'rate_limited_user', None, wait
+
+        started = time.perf_counter()
+        outcome, release = self.backend.acquire(policy.name, policy.concurrency, policy.queue, policy.queue_timeout)
+        self.record(policy.name, outcome)
+        if release is None:
+            # A short, jittered wait so shed clients do not all come back at once
+            return outcome, None, random.uniform(1, 3)
+        return outcome, release, time.perf_counter() - started
+
+    def stats(self):
+        with self._lock:
+            decisions = {
+                policy: {outcome: self.decisions[policy, outcome] for outcome in OUTCOMES}
+                for policy in self.policies
+            }
+        return {'backend': self.backend.name, 'decisions': decisions, 'slots': self.backend.status()}
+
+
+def jwt_user():
+    """The JWT identity of the request, if it carries a valid token"""
+    try:
+        verify_jwt_in_request(optional=True)
+        return get_jwt_identity()
+    except Exception:
+        # Rejected properly by the view's own decorator
+        return None
+
+
+def login_user_key():
+    """The username a login or register request is for, together with the client IP.
+
+    Keyed per address, so failed logins from one client cannot lock the
+    account out for everyone else.
+    """
+    data = request.get_json(silent=True)
+    username = data.get('username') if isinstance(data, dict) else None
+    if not isinstance(username, str) or not username.strip():
+        return None
+    return f'{username.strip().lower()}@{request.remote_addr}'
+
+
+def rejection(outcome, retry_after):
+    """(body, status, headers) of the response turning a request away"""
+    status, message = REJECTIONS[outcome]
+    return {'error': message}, status, {'Retry-After': str(max(1, math.ceil(retry_after)))}
+
+
+def admission_control(policy_name, user=jwt_user):
+    """Rate limit and cap the concurrency of a view under the named policy.
+
+    `user` returns the key for the per-user bucket (None skips it).
+    """
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            control = current_app.extensions.get('admission')
+            if control is None:
+                return fn(*args, **kwargs)
+
+            policy = control.policies[policy_name]
+            user_key = user() if policy.user_rate > 0 else None
+            outcome, release, seconds = control.admit(policy, request.remote_addr, user_key)
+            if release is None:
+                g.admission = (policy.name, outcome, None)
+                body, status, headers = rejection(outcome, seconds)
+                return jsonify(body), status, headers
+
+            g.admission = (policy.name, outcome, seconds)
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                release()
+
+        return wrapper
+    return decorator
+
+
+def admission_stats():
+    control = current_app.extensions.get('admission')
+    return control.stats() if control is not None else {'enabled': False}
+
+
+def init_admission(app):
+    """Attach admission control to `app` unless ADMISSION_CONTROL_ENABLED is off"""
+    if not app.config['ADMISSION_CONTROL_ENABLED']:
+        return
+
+    url = app.config['ADMISSION_REDIS_URL']
+    workers = 1
+    if not url and app.config['ADMISSION_WORKERS'] > 1:
+        workers = app.config['ADMISSION_WORKERS']
+        print(f"WARNING: admission control limits are split across {workers} workers without "
+              f"ADMISSION_REDIS_URL, and concurrency caps and queues cannot engage in sync workers")
+    backend = RedisBackend.from_url(url) if url else MemoryBackend()
+    policies = {name: Policy(name, app.config, workers) for name in POLICIES}
+    app.extensions['admission'] = AdmissionControl(backend, policies)
@@ -1,49 +1,109 @@
 import os
-from flask import Flask, jsonify, request
+import sys
+from collections import Counter
+from types import SimpleNamespace
+from flask import Blueprint, Flask, Response, current_app, jsonify, request, stream_with_context
 from flask_cors import CORS
 from flask_jwt_extended import JWTManager, create_access_token, create_refresh_token, jwt_required, get_jwt_identity, verify_jwt_in_request
 from config import Config
 from models import db, bcrypt, User, Book, Reservation
+from database import engine_options, init_engine
+from replicas import init_replicas, read_replica
+from admission import admission_control, admission_stats, init_admission, login_user_key
 from auth import get_current_user, teacher_required, student_or_teacher_required
+from pagination import InvalidCursor, keyset_filter, paginate, parse_limit
+from query_plans import check_query_plans
+from book_import import BookImport, isbn_error, limit_rows, normalize_isbn, parse_ndjson
+from catalog_cache import bump_catalog_version, catalog_cache_stats, catalog_cached, init_catalog_cache
+from enrichment import (cached_metadata, enqueue_enrichment, fill_from_metadata, init_enrichment,
+                        missing_fields, retry_pending_enrichment, with_placeholders)
+from google_books import clean_isbn
+from search import detect_search_backend, ensure_search_index, search_books, search_filter
+from json_provider import init_json_provider
+from monitoring import capture_exception, init_sentry
+from query_budget import init_query_budget, query_budget, record_engine
+from sparse_fields import load_only_fields, parse_fields
+from export import (BOOK_EXPORT_FIELDS, EXPORT_FORMATS, RESERVATION_EXPORT_FIELDS, parse_since,
+                    reservation_export_row, stream_export)
+from reservation_sweeper import init_reservation_sweeper
+from reservation_stats import (checked_out_query, init_reservation_stats, overdue_query, parse_stats_args,
+                               per_day_query, reservation_stats, status_counts_query, top_borrowers_query)
 from datetime import datetime
-import sentry_sdk
-
-sentry_sdk.init(
-    dsn="https://84bc426841bfd59d35d8790e6955fd00@o4510743534829568.ingest.us.sentry.io/4510743813816320",
-    # Add data like request headers and IP for users,
-    # see https://docs.sentry.io/platforms/python/data-management/data-collected/ for more info
-    send_default_pii=True,
-    # Enable sending logs to Sentry
-    enable_logs=True,
-    # Set traces_sample_rate to 1.0 to capture 100%
-    # of transactions for tracing.
-    traces_sample_rate=1.0,
-    # Set profile_session_sample_rate to 1.0 to profile 100%
-    # of profile sessions.
-    profile_session_sample_rate=1.0,
-    # Set profile_lifecycle to "trace" to automatically
-    # run the profiler on when there is an active transaction
-    profile_lifecycle="trace",
-)
-
-
-app = Flask(__name__)
-app.config.from_object(Config)
-
-# Initialize extensions
-CORS(app)
-db.init_app(app)
-bcrypt.init_app(app)
-jwt = JWTManager(app)
-
-# Create tables
-with app.app_context():
-    db.create_all()
+from sqlalchemy.exc import IntegrityError
+
+# Routes, CLI commands and error handlers live on this blueprint; create_app()
+# builds a configured app around it. Building an app opens no database
+# connections, so it is safe before a fork (gunicorn --preload): each worker
+# connects on its first request. Tables and the search index are created
+# separately, by `flask --app app init-db` or init_db(app).
+
+api = Blueprint('api', __name__, cli_group=None)
+jwt = JWTManager()
+
+
+def create_app(config=Config):
+    """Build the Flask app from a config object"""
+    app = Flask(__name__)
+    app.config.from_object(config)
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(app.config)
+    init_sentry(app.config)
+    init_json_provider(app)
+
+    # Initialize extensions
+    CORS(app)
+    db.init_app(app)
+    bcrypt.init_app(app)
+    jwt.init_app(app)
+    init_catalog_cache(app)
+    init_reservation_stats(app)
+    init_enrichment(app)
+    init_admission(app)
+    init_reservation_sweeper(app, expire_old_reservations)
+
+    with app.app_context():
+        init_engine(db.engine, app.config)
+        replica_engines = init_replicas(app)
+        if app.config['METRICS_ENABLED']:
+            # prometheus_client is only imported when metrics are on
+            from metrics import init_metrics
+            init_metrics(app, db.engine, *replica_engines)
+        init_query_budget(app, db.engine, *replica_engines)
+    detect_search_backend(app)
+
+    app.register_blueprint(api)
+    return app
+
+
+def instrument_engines(app, *engines):
+    """Count statements on further engines (asgi.py's async ones) in metrics and query budgets"""
+    for engine in engines:
+        if app.config['METRICS_ENABLED']:
+            from metrics import instrument_engine
+            instrument_engine(engine)
+        if app.config['QUERY_DEBUG']:
+            record_engine(engine)
+
+
+def init_db(app):
+    """Create missing tables and the full-text search index"""
+    with app.app_context():
+        db.create_all()
+        ensure_search_index(app)
+
+
+def __getattr__(name):
+    # `from app import app` and `gunicorn app:app` get a default app, built on first use
+    if name == 'app':
+        global app
+        app = create_app()
+        return app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 # ========== Authentication Endpoints ==========
 
-@app.route('/api/auth/register', methods=['POST'])
+@api.route('/api/auth/register', methods=['POST'])
+@admission_control('login', user=login_user_key)
 def register():
     """Register a new user"""
     data = request.get_json()
@@ -105,7 +165,9 @@ def register():
     }), 201
 
 
-@app.route('/api/auth/login', methods=['POST'])
+@api.route('/api/auth/login', methods=['POST'])
+@admission_control('login', user=login_user_key)
+@query_budget(3)
 def login():
     """Login user"""
     data = request.get_json()
@@ -123,6 +185,11 @@ def login():
     if not user.active:
         return jsonify({'error': 'User account is inactive'}), 401
 
+    # Upgrade hashes made with an outdated cost while we have the plaintext
+    if user.password_needs_rehash():
+        user.set_password(data['password'])
+        db.session.commit()
+
     # Create tokens
     access_token = create_access_token(identity=str(user.id))
     refresh_token = create_refresh_token(identity=str(user.id))
@@ -134,7 +201,7 @@ def login():
     }), 200
 
 
-@app.route('/api/auth/refresh', methods=['POST'])
+@api.route('/api/auth/refresh', methods=['POST'])
 @jwt_required(refresh=True)
 def refresh():
     """Refresh access token"""
@@ -146,7 +213,8 @@ def refresh():
     }), 200
 
 
-@app.route('/api/auth/me', methods=['GET'])
+@api.route('/api/auth/me', methods=['GET'])
+@query_budget(1)
 @jwt_required()
 def get_current_user_info():
     """Get current user info"""
@@ -158,7 +226,7 @@ def get_current_user_info():
     return jsonify(current_user.to_dict()), 200
 
 
-@app.route('/api/auth/logout', methods=['POST'])
+@api.route('/api/auth/logout', methods=['POST'])
 @jwt_required()
 def logout():
     """Logout user (client-side token removal)"""
@@ -167,79 +235,313 @@ def logout():
 
 # ========== Book Endpoints ==========
 
-@app.route('/api/books', methods=['GET'])
+def filter_books(query, genre=None, search=None, available_only=False):
+    """Apply the catalog filters shared by the book listing endpoints"""
+    if genre:
+        query = query.filter(Book.genre == genre)
+
+    if search:
+        query = query.filter(search_filter(current_app.extensions['search_backend'], search))
+
+    if available_only:
+        query = query.filter(Book.available)
+
+    return query
+
+
+@api.route('/api/books', methods=['GET'])
+@query_budget(1)
+@read_replica
+@catalog_cached
 def get_books():
-    """Get all books with optional filtering"""
+    """Get all books with optional filtering.
+
+    Passing `limit` and/or `cursor` opts into keyset pagination and returns
+    {'books': [...], 'next_cursor': ...} instead of a bare list. `fields`
+    (e.g. fields=title,author,cover) selects and serializes only those columns.
+    """
     genre = request.args.get('genre')
     search = request.args.get('search')
     available_only = request.args.get('available', 'false').lower() == 'true'
-    
-    query = Book.query
-    
-    if genre:
-        query = query.filter_by(genre=genre)
-    
-    if search:
-        search_filter = f"%{search}%"
-        query = query.filter(
-            (Book.title.ilike(search_filter)) | (Book.author.ilike(search_filter))
+    cursor = request.args.get('cursor')
+    paginated = 'limit' in request.args or cursor is not None
+
+    try:
+        fields = parse_fields(request.args.get('fields'), Book.FIELDS)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    query = filter_books(Book.query, genre, search, available_only)
+    if fields:
+        # The cursor is built from the last row's title, so keep it loaded
+        query = query.options(load_only_fields(Book, fields, extra=['title'] if paginated else []))
+
+    if not paginated:
+        books = query.order_by(Book.title, Book.id).all()
+        return jsonify([book.to_dict(fields) for book in books])
+
+    try:
+        limit = parse_limit(
+            request.args.get('limit'),
+            current_app.config['BOOKS_PAGE_DEFAULT_LIMIT'],
+            current_app.config['BOOKS_PAGE_MAX_LIMIT']
         )
-    
-    if available_only:
-        query = query.filter_by(available=True)
-    
-    books = query.all()
-    return jsonify([book.to_dict() for book in books])
+        books, next_cursor = paginate(query, [Book.title, Book.id], limit, cursor)
+    except InvalidCursor:
+        return jsonify({'error': 'Invalid cursor'}), 400
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    return jsonify({
+        'books': [book.to_dict(fields) for book in books],
+        'next_cursor': next_cursor
+    })
+
+
+@api.route('/api/books/search', methods=['GET'])
+@query_budget(2)
+@read_replica
+@catalog_cached
+def search_books_ranked():
+    """Full-text search over title, author and description, best match first"""
+    q = request.args.get('q', '').strip()
+    genre = request.args.get('genre')
+    available_only = request.args.get('available', 'false').lower() == 'true'
+
+    if not q:
+        return jsonify({'error': 'Missing required query parameter: q'}), 400
+
+    try:
+        limit = parse_limit(
+            request.args.get('limit'),
+            current_app.config['BOOKS_PAGE_DEFAULT_LIMIT'],
+            current_app.config['BOOKS_PAGE_MAX_LIMIT']
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    results = search_books(current_app.extensions['search_backend'], q, limit, genre, available_only)
+
+    return jsonify({
+        'results': [
+            dict(book.to_dict(), rank=rank, snippet=snippet)
+            for book, rank, snippet in results
+        ]
+    })
+
+
+FACETS = [
+    ('genre', Book.genre),
+    ('room', Book.room_number),
+    ('available', Book.available),
+    ('decade', (Book.year // 10) * 10),
+]
+
+
+def facet_counts_query(genre=None, search=None, available_only=False):
+    """(facet, value, count) rows: one GROUP BY per facet, sent as a single UNION ALL round-trip"""
+    queries = [
+        filter_books(
+            db.session.query(
+                db.literal(name).label('facet'),
+                db.cast(column, db.String).label('value'),
+                db.func.count(Book.id).label('count')
+            ),
+            genre, search, available_only
+        ).group_by(column)
+        for name, column in FACETS
+    ]
+    return queries[0].union_all(*queries[1:])
+
+
+@api.route('/api/books/facets', methods=['GET'])
+@query_budget(1)
+@read_replica
+@catalog_cached
+def get_book_facets():
+    """Counts per genre, room, availability and publication decade in one query.
+
+    Honours the same genre/search/available filters as GET /api/books.
+    """
+    genre = request.args.get('genre')
+    search = request.args.get('search')
+    available_only = request.args.get('available', 'false').lower() == 'true'
+
+    rows = facet_counts_query(genre, search, available_only).all()
 
+    counts = {name: [] for name, _ in FACETS}
+    for facet, value, count in rows:
+        counts[facet].append((value, count))
 
-@app.route('/api/books/<int:book_id>', methods=['GET'])
+    availability = {'available': 0, 'unavailable': 0}
+    for value, count in counts['available']:
+        key = 'available' if value in ('1', 'true') else 'unavailable'
+        availability[key] += count
+
+    return jsonify({
+        'total': sum(count for _, count in counts['genre']),
+        'genres': [
+            {'value': value, 'count': count}
+            for value, count in sorted(counts['genre'], key=lambda item: (-item[1], item[0]))
+        ],
+        'rooms': [
+            {'value': value, 'count': count}
+            for value, count in sorted(counts['room'], key=lambda item: (-item[1], item[0] or ''))
+        ],
+        'availability': availability,
+        'decades': sorted(
+            ({'value': int(value), 'count': count} for value, count in counts['decade']),
+            key=lambda item: item['value']
+        ),
+    })
+
+
+@api.route('/api/books/<int:book_id>', methods=['GET'])
+@query_budget(1)
+@read_replica
+@catalog_cached
 def get_book(book_id):
-    """Get a specific book by ID"""
-    book = Book.query.get_or_404(book_id)
-    return jsonify(book.to_dict())
+    """Get a specific book by ID (supports ?fields= like GET /api/books)"""
+    try:
+        fields = parse_fields(request.args.get('fields'), Book.FIELDS)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    query = Book.query
+    if fields:
+        query = query.options(load_only_fields(Book, fields))
+    book = query.get_or_404(book_id)
+    return jsonify(book.to_dict(fields))
 
 
-@app.route('/api/books', methods=['POST'])
+@api.route('/api/books', methods=['POST'])
+@query_budget(5)
 @teacher_required
 def create_book():
-    """Create a new book"""
+    """Create a new book.
+
+    If only an ISBN (plus e.g. room_number) is given, the missing fields are
+    filled from the isbn_metadata store. On a cache miss the book is stored
+    with placeholders, looked up upstream in the background, and 202 is
+    returned with metadata_status 'pending'.
+    """
     data = request.get_json()
-    
-    # Validate required fields
-    required_fields = ['title', 'author', 'genre', 'year', 'isbn', 'description']
-    for field in required_fields:
-        if field not in data:
-            return jsonify({'error': f'Missing required field: {field}'}), 400
-    
+
+    error = isbn_error(data.get('isbn'))
+    if error:
+        return jsonify({'error': error}), 400
+    # The same form bulk imports store, so both paths dedupe against each other
+    data = dict(data, isbn=normalize_isbn(data['isbn']))
+
     # Check if ISBN already exists
     if Book.query.filter_by(isbn=data['isbn']).first():
         return jsonify({'error': 'Book with this ISBN already exists'}), 400
-    
+
+    # Validate required fields, filling gaps from the ISBN metadata store
+    metadata = None
+    pending_fields = missing_fields(data)
+    if pending_fields:
+        metadata = cached_metadata([data['isbn']]).get(clean_isbn(data['isbn']))
+        if metadata is not None and not metadata.found:
+            return jsonify({
+                'error': f'No metadata found for ISBN {data["isbn"]}. Missing required field: {pending_fields[0]}'
+            }), 400
+        if metadata is not None:
+            data = fill_from_metadata(data, metadata)
+            pending_fields = missing_fields(data)
+            if pending_fields:
+                return jsonify({'error': f'Missing required field: {pending_fields[0]}'}), 400
+
+    try:
+        total_copies = parse_total_copies(data.get('total_copies', 1))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    values = with_placeholders(data) if pending_fields else data
+
     book = Book(
-        title=data['title'],
-        author=data['author'],
-        genre=data['genre'],
-        year=data['year'],
-        isbn=data['isbn'],
-        description=data['description'],
-        cover=data.get('cover', ''),
-        available=data.get('available', True),
-        room_number=data.get('room_number', '')
+        title=values['title'],
+        author=values['author'],
+        genre=values['genre'],
+        year=values['year'],
+        isbn=values['isbn'],
+        description=values['description'],
+        cover=values.get('cover', ''),
+        total_copies=total_copies,
+        available_copies=total_copies,
+        room_number=values.get('room_number', ''),
+        metadata_status='pending' if pending_fields else None
     )
-    
+
     db.session.add(book)
     db.session.commit()
-    
+    bump_catalog_version()
+
+    if pending_fields:
+        enqueue_enrichment(book.id, book.isbn, missing_fields(data, include_optional=True))
+        return jsonify(book.to_dict()), 202
+
     return jsonify(book.to_dict()), 201
 
 
-@app.route('/api/books/<int:book_id>', methods=['PUT'])
+@api.route('/api/books/bulk', methods=['POST'])
+@teacher_required
+def bulk_create_books():
+    """Create many books from a JSON array or an NDJSON stream.
+
+    ?mode=upsert updates books whose ISBN already exists instead of skipping
+    them. Rows may carry just an ISBN (plus room_number); see create_book.
+    Returns a per-row report plus a summary of created, updated,
+    skipped_duplicate, invalid and failed rows.
+    """
+    mode = request.args.get('mode', 'insert')
+    if mode not in ('insert', 'upsert'):
+        return jsonify({'error': 'mode must be either "insert" or "upsert"'}), 400
+
+    if request.mimetype in ('application/x-ndjson', 'application/ndjson', 'application/jsonl'):
+        rows = parse_ndjson(request.stream)
+    else:
+        rows = request.get_json(silent=True)
+        if not isinstance(rows, list):
+            return jsonify({'error': 'Request body must be a JSON array of books or NDJSON'}), 400
+
+    book_import = BookImport(
+        upsert=(mode == 'upsert'),
+        chunk_size=current_app.config['BULK_IMPORT_CHUNK_SIZE']
+    ).run(limit_rows(rows, current_app.config['BULK_IMPORT_MAX_ROWS']))
+
+    if book_import.summary['created'] or book_import.summary['updated']:
+        bump_catalog_version()
+
+    # 202 while ISBN-only rows are still being looked up in the background
+    enriching = any(result.get('metadata_status') == 'pending' for result in book_import.results)
+
+    return jsonify({
+        'summary': book_import.summary,
+        'results': book_import.results
+    }), 202 if enriching else 200
+
+
+@api.route('/api/books/<int:book_id>', methods=['PUT'])
+@query_budget(5)
 @teacher_required
 def update_book(book_id):
     """Update a book"""
     book = Book.query.get_or_404(book_id)
     data = request.get_json()
-    
+
+    if 'available' in data:
+        return jsonify({'error': 'available follows the reservations; change total_copies instead'}), 400
+
+    if 'total_copies' in data:
+        try:
+            total_copies = parse_total_copies(data['total_copies'])
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        if not db.session.execute(set_total_copies(book_id, total_copies)).rowcount:
+            db.session.rollback()
+            return jsonify({'error': 'total_copies cannot be less than the copies currently reserved or checked out'}), 400
+
     # Update fields if provided
     if 'title' in data:
         book.title = data['title']
@@ -253,65 +555,151 @@ def update_book(book_id):
         book.description = data['description']
     if 'cover' in data:
         book.cover = data['cover']
-    if 'available' in data:
-        book.available = data['available']
     if 'room_number' in data:
         book.room_number = data['room_number']
-    
+
     db.session.commit()
-    
+    bump_catalog_version()
+
     return jsonify(book.to_dict())
 
 
-@app.route('/api/books/<int:book_id>', methods=['DELETE'])
+def parse_total_copies(value):
+    """Validate a total_copies value from a request body; raises ValueError"""
+    if isinstance(value, bool) or not isinstance(value, int) or value < 1:
+        raise ValueError('total_copies must be a positive integer')
+    return value
+
+
+def set_total_copies(book_id, total_copies):
+    """UPDATE setting a book's copy count and moving its shelf count by the same amount.
+
+    Matches no row if that would leave fewer copies than are currently held
+    by reservations.
+    """
+    added = total_copies - Book.total_copies
+    return (
+        db.update(Book)
+        .where(Book.id == book_id, Book.available_copies + added >= 0)
+        .values(total_copies=total_copies, available_copies=Book.available_copies + added)
+        .execution_options(synchronize_session=False)
+    )
+
+
+@api.route('/api/books/<int:book_id>', methods=['DELETE'])
+@query_budget(4)
 @teacher_required
 def delete_book(book_id):
     """Delete a book"""
     book = Book.query.get_or_404(book_id)
     db.session.delete(book)
     db.session.commit()
-    
+    bump_catalog_version()
+
     return jsonify({'message': 'Book deleted successfully'}), 200
 
 
 # ========== Reservation Endpoints ==========
 
-def expire_old_reservations():
-    """Auto-expire pending reservations older than 3 days"""
-    expired_reservations = Reservation.query.filter_by(status='pending').all()
+def expiry_update(book_id=None, user_id=None):
+    """UPDATE expiring stale pending reservations, RETURNING the book of each one"""
+    expired = Reservation.effectively_expired()
+    if book_id is not None:
+        expired = expired & (Reservation.book_id == book_id)
+    if user_id is not None:
+        expired = expired & (Reservation.user_id == user_id)
+
+    return (
+        db.update(Reservation)
+        .where(expired)
+        .values(status='expired')
+        .returning(Reservation.book_id)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def release_copies(book_ids):
+    """UPDATE putting one copy per entry of `book_ids` back on its book's shelf"""
+    counts = Counter(book_ids)
+    return (
+        db.update(Book)
+        .where(Book.id.in_(counts))
+        .values(available_copies=Book.available_copies + db.case(counts, value=Book.id))
+        .execution_options(synchronize_session=False)
+    )
 
-    for reservation in expired_reservations:
-        if reservation.is_expired(days=3):
-            reservation.status = 'expired'
-            # Make book available again (if book still exists)
-            if reservation.book:
-                reservation.book.available = True
 
+def expire_old_reservations(book_id=None, user_id=None):
+    """Expire pending reservations past RESERVATION_EXPIRY_DAYS in two set-based UPDATEs.
+
+    Returns the number of reservations expired. Pass book_id or user_id to
+    sweep a single book or user.
+    """
+    # Only the rows this UPDATE changed come back, so a concurrent sweep or
+    # cancellation of the same reservation can never release its copy twice
+    book_ids = db.session.scalars(expiry_update(book_id, user_id)).all()
+    if book_ids:
+        db.session.execute(release_copies(book_ids))
     db.session.commit()
 
+    if book_ids:
+        bump_catalog_version()
 
-@app.route('/api/reservations', methods=['GET'])
-@student_or_teacher_required
-def get_reservations():
-    """Get all reservations with optional filtering"""
-    # Auto-expire old reservations before returning results
-    expire_old_reservations()
+    return len(book_ids)
 
-    current_user = get_current_user()
 
-    status = request.args.get('status')
-    book_id = request.args.get('book_id')
-    user_email = request.args.get('user_email')
+@api.cli.command('enrich-pending-books')
+def enrich_pending_books_command():
+    """Retry ISBN lookups for books left pending (e.g. by a restart) or failed"""
+    count = retry_pending_enrichment()
+    current_app.extensions['isbn_enrichment_pool'].shutdown(wait=True)
+    print(f"Enriched {count} book(s)")
 
-    query = Reservation.query
 
+@api.cli.command('expire-reservations')
+def expire_reservations_command():
+    """Expire stale pending reservations now (each worker also does this every RESERVATION_SWEEP_SECONDS)"""
+    count = expire_old_reservations()
+    print(f"Expired {count} reservation(s)")
+
+
+def serialize_reservations(reservations, sideload_books=False, fields=None, include_book=True):
+    """Serialize reservations, optionally side-loading each referenced book once.
+
+    With sideload_books the result is {'reservations': [...], 'books': {id: book}}
+    and reservations carry only book_id; otherwise it is a list with the book
+    embedded in every reservation (unless include_book is False). `fields`
+    limits the reservation keys.
+    """
+    if not sideload_books:
+        return [reservation.to_dict(include_book=include_book, fields=fields) for reservation in reservations]
+
+    books = {}
+    for reservation in reservations:
+        if reservation.book and reservation.book_id not in books:
+            books[reservation.book_id] = reservation.book.to_dict()
+
+    return {
+        'reservations': [reservation.to_dict(include_book=False, fields=fields) for reservation in reservations],
+        'books': {str(book_id): book for book_id, book in books.items()}
+    }
+
+
+def filter_reservations(query, current_user, status=None, book_id=None, user_email=None):
+    """Apply visibility rules and the filters shared by the reservation listing endpoints"""
     # Students can only see their own reservations
     if current_user.role == 'student':
         query = query.filter_by(user_id=current_user.id)
 
     # Teachers can see all reservations (no additional filter)
 
-    if status:
+    # Filter on the effective status so reads agree with to_dict() without
+    # waiting for the expiry sweep
+    if status == 'pending':
+        query = query.filter(Reservation.effectively_pending())
+    elif status == 'expired':
+        query = query.filter((Reservation.status == 'expired') | Reservation.effectively_expired())
+    elif status:
         query = query.filter_by(status=status)
 
     if book_id:
@@ -320,18 +708,78 @@ def get_reservations():
     if user_email:
         query = query.filter_by(user_email=user_email)
 
+    return query
+
+
+@api.route('/api/reservations', methods=['GET'])
+@query_budget(3)
+@student_or_teacher_required
+def get_reservations():
+    """Get all reservations with optional filtering.
+
+    Pass ?sideload=books to receive each referenced book once in a top-level
+    'books' map instead of embedded in every reservation. `fields` selects
+    reservation keys; the embedded book is only included if 'book' is listed.
+    """
+    current_user = get_current_user()
+
+    status = request.args.get('status')
+    book_id = request.args.get('book_id')
+    user_email = request.args.get('user_email')
+    sideload_books = request.args.get('sideload') == 'books'
+
+    try:
+        fields = parse_fields(request.args.get('fields'), Reservation.FIELDS + ('book',))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    include_book = fields is None or 'book' in fields
+    query = Reservation.query
+    if fields:
+        fields = [field for field in fields if field != 'book']
+        # book_id is the key the book relationship is loaded through
+        query = query.options(load_only_fields(
+            Reservation, fields, extra=['book_id'] if include_book or sideload_books else []
+        ))
+
+    if include_book or sideload_books:
+        # Load all referenced books in one extra SELECT instead of one per row
+        query = query.options(db.selectinload(Reservation.book))
+    query = filter_reservations(query, current_user, status, book_id, user_email)
+
     reservations = query.order_by(Reservation.reservation_date.desc()).all()
-    return jsonify([reservation.to_dict() for reservation in reservations])
+    return jsonify(serialize_reservations(reservations, sideload_books, fields, include_book))
+
+
+@api.route('/api/reservations/stats', methods=['GET'])
+@query_budget(6)
+@teacher_required
+def get_reservation_stats():
+    """Reservation counts for the teacher dashboard (teachers only).
+
+    Counts by status, currently checked-out books, overdue pickups,
+    reservations per day over the last ?days= (default 30) and the ?top=
+    (default 10) borrowers in that window. Cached briefly per worker.
+    """
+    try:
+        days, top = parse_stats_args(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
 
+    return jsonify(reservation_stats(days, top))
 
-@app.route('/api/reservations/<int:reservation_id>', methods=['GET'])
+
+@api.route('/api/reservations/<int:reservation_id>', methods=['GET'])
+@query_budget(1)
 def get_reservation(reservation_id):
     """Get a specific reservation by ID"""
-    reservation = Reservation.query.get_or_404(reservation_id)
+    reservation = Reservation.query.options(db.joinedload(Reservation.book)).get_or_404(reservation_id)
     return jsonify(reservation.to_dict())
 
 
-@app.route('/api/reservations', methods=['POST'])
+@api.route('/api/reservations', methods=['POST'])
+@admission_control('reservations')
+@query_budget(9)
 @student_or_teacher_required
 def create_reservation():
     """Create a new reservation"""
@@ -344,55 +792,119 @@ def create_reservation():
         if field not in data:
             return jsonify({'error': f'Missing required field: {field}'}), 400
 
-    # Check if book exists and is available
-    book = Book.query.get_or_404(data['book_id'])
+    # Check if book exists
+    book_id = Book.query.get_or_404(data['book_id']).id
+    # Plain values: every rollback and commit below expires the ORM objects,
+    # and reading an expired attribute would SELECT the row again
+    user = reservation_user(current_user)
+
+    # Nothing below reads-then-writes: the conditional UPDATE claims the book
+    # and the partial unique index enforces one pending reservation per
+    # student. Each is retried once after sweeping stale reservations that
+    # may still be holding the book or the student's slot.
+    try:
+        for attempt in range(2):
+            outcome, reservation = reserve_book(book_id, user, data)
+            if outcome == 'created':
+                bump_catalog_version()
+                return jsonify(reservation.to_dict()), 201
+
+            if attempt == 0:
+                swept = expire_old_reservations(book_id=book_id) if outcome == 'unavailable' \
+                    else expire_old_reservations(user_id=user.id)
+                if swept:
+                    continue
+            break
+    except Exception as e:
+        db.session.rollback()
+        capture_exception(e)
+        return jsonify({'error': f'Failed to create reservation: {str(e)}'}), 500
 
-    if not book.available:
+    if outcome == 'unavailable':
         return jsonify({'error': 'Book is not available for reservation'}), 400
 
-    # Limit students to one active reservation at a time
-    if current_user.role == 'student':
-        active_reservation = Reservation.query.filter_by(
-            user_id=current_user.id,
-            status='pending'
-        ).first()
+    active_reservation = Reservation.query.options(db.joinedload(Reservation.book)).filter(
+        Reservation.user_id == user.id,
+        Reservation.status == 'pending'
+    ).first()
+    return jsonify(active_reservation_error(active_reservation)), 400
 
-        if active_reservation:
-            return jsonify({
-                'error': 'You already have an active reservation. Please pick up or cancel your current reservation before reserving another book.',
-                'active_reservation': {
-                    'book_title': active_reservation.book.title,
-                    'reservation_id': active_reservation.id
-                }
-            }), 400
 
-    try:
-        # Create reservation using authenticated user's info
-        reservation = Reservation(
-            book_id=data['book_id'],
-            user_id=current_user.id,
-            user_name=current_user.full_name,
-            user_email=current_user.email,
-            user_phone=data.get('user_phone', ''),
-            pickup_date=datetime.fromisoformat(data['pickup_date']) if data.get('pickup_date') else None,
-            notes=data.get('notes', ''),
-            status='pending'
-        )
+def reservation_user(user):
+    """The fields of `user` a reservation copies, detached from the session"""
+    return SimpleNamespace(id=user.id, full_name=user.full_name, email=user.email, role=user.role)
 
-        # Mark book as unavailable
-        book.available = False
 
-        db.session.add(reservation)
-        db.session.commit()
+def active_reservation_error(active_reservation):
+    """Body of the 400 returned when a student already holds a pending reservation"""
+    return {
+        'error': 'You already have an active reservation. Please pick up or cancel your current reservation before reserving another book.',
+        'active_reservation': {
+            'book_title': active_reservation.book.title,
+            'reservation_id': active_reservation.id
+        } if active_reservation else None
+    }
 
-        return jsonify(reservation.to_dict()), 201
-    except Exception as e:
+
+def claim_book(book_id):
+    """UPDATE taking one copy of `book_id` off the shelf; it matches no row unless a copy is left"""
+    return (
+        db.update(Book)
+        .where(Book.id == book_id, Book.available_copies > 0)
+        .values(available_copies=Book.available_copies - 1)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def new_reservation(book_id, user, data):
+    """A pending reservation of `book_id` by the authenticated `user`"""
+    return Reservation(
+        book_id=book_id,
+        user_id=user.id,
+        user_name=user.full_name,
+        user_email=user.email,
+        user_role=user.role,
+        user_phone=data.get('user_phone', ''),
+        pickup_date=datetime.fromisoformat(data['pickup_date']) if data.get('pickup_date') else None,
+        notes=data.get('notes', ''),
+        status='pending'
+    )
+
+
+def reserve_book(book_id, user, data):
+    """Claim a book and record the reservation in a single transaction.
+
+    Returns ('created', reservation), ('unavailable', None) if another
+    request holds the book, or ('active_reservation', None) if a student
+    already has a pending reservation.
+    """
+    claimed = db.session.execute(claim_book(book_id)).rowcount
+    if not claimed:
         db.session.rollback()
-        sentry_sdk.capture_exception(e)
-        return jsonify({'error': f'Failed to create reservation: {str(e)}'}), 500
+        return 'unavailable', None
 
+    # Create reservation using authenticated user's info
+    reservation = new_reservation(book_id, user, data)
+    db.session.add(reservation)
 
-@app.route('/api/reservations/<int:reservation_id>', methods=['PUT'])
+    try:
+        # Flushed first so the id can be read before the commit expires it
+        db.session.flush()
+        reservation_id = reservation.id
+        db.session.commit()
+    except IntegrityError:
+        # Rolls the book claim back too
+        db.session.rollback()
+        return 'active_reservation', None
+
+    # Reload it and its book in one SELECT rather than two
+    reservation = db.session.get(Reservation, reservation_id, options=[db.joinedload(Reservation.book)],
+                                 populate_existing=True)
+    return 'created', reservation
+
+
+@api.route('/api/reservations/<int:reservation_id>', methods=['PUT'])
+@query_budget(6)
 @student_or_teacher_required
 def update_reservation(reservation_id):
     """Update a reservation"""
@@ -405,19 +917,21 @@ def update_reservation(reservation_id):
 
     data = request.get_json()
 
-    old_status = reservation.status
-
     # Update fields if provided
-    if 'status' in data:
-        reservation.status = data['status']
-
-        # If cancelling or expiring, make book available again
-        if data['status'] in ['cancelled', 'expired'] and old_status not in ['cancelled', 'expired']:
-            reservation.book.available = True
+    if 'status' in data and data['status'] != reservation.status:
+        if data['status'] not in Reservation.STATUSES:
+            return jsonify({'error': f"status must be one of: {', '.join(Reservation.STATUSES)}"}), 400
 
-        # If picking up, keep book unavailable
-        if data['status'] == 'picked_up':
-            reservation.book.available = False
+        try:
+            outcome = change_status(reservation, data['status'])
+        except IntegrityError:
+            db.session.rollback()
+            return jsonify(active_reservation_error(None)), 400
+        if outcome != 'changed':
+            db.session.rollback()
+            if outcome == 'unavailable':
+                return jsonify({'error': 'Book is not available for reservation'}), 400
+            return jsonify({'error': 'Reservation was changed by another request, please retry'}), 409
 
     if 'pickup_date' in data:
         reservation.pickup_date = datetime.fromisoformat(data['pickup_date']) if data['pickup_date'] else None
@@ -427,13 +941,45 @@ def update_reservation(reservation_id):
 
     db.session.commit()
 
+    # Status changes may move a copy on or off the shelf
+    if 'status' in data:
+        bump_catalog_version()
+
     return jsonify(reservation.to_dict())
 
 
-@app.route('/api/reservations/<int:reservation_id>', methods=['DELETE'])
+def change_status(reservation, status):
+    """Move `reservation` to `status`, claiming or releasing its copy in the same transaction.
+
+    The status only changes if it still is the one that was loaded, so two
+    requests (or a request and the expiry sweep) cannot both move the copy.
+    Returns 'changed', 'conflict' if another request changed it first, or
+    'unavailable' if it needs a copy and none is left. The caller commits or
+    rolls back.
+    """
+    changed = db.session.execute(
+        db.update(Reservation)
+        .where(Reservation.id == reservation.id, Reservation.status == reservation.status)
+        .values(status=status)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    if not changed:
+        return 'conflict'
+
+    held = reservation.status in Reservation.HOLDS_COPY
+    holds = status in Reservation.HOLDS_COPY
+    if held and not holds:
+        db.session.execute(release_copies([reservation.book_id]))
+    elif holds and not held and not db.session.execute(claim_book(reservation.book_id)).rowcount:
+        return 'unavailable'
+    return 'changed'
+
+
+@api.route('/api/reservations/<int:reservation_id>', methods=['DELETE'])
+@query_budget(5)
 @student_or_teacher_required
 def delete_reservation(reservation_id):
-    """Delete a reservation and make book available again"""
+    """Delete a reservation, putting its copy back on the shelf if it held one"""
     current_user = get_current_user()
     reservation = Reservation.query.get_or_404(reservation_id)
 
@@ -441,31 +987,167 @@ def delete_reservation(reservation_id):
     if current_user.role == 'student' and reservation.user_id != current_user.id:
         return jsonify({'error': 'You can only delete your own reservations'}), 403
 
-    # Make book available again
-    reservation.book.available = True
-
-    db.session.delete(reservation)
+    # The status as deleted, so a concurrent sweep cannot also release the copy
+    deleted = db.session.execute(
+        db.delete(Reservation)
+        .where(Reservation.id == reservation_id)
+        .returning(Reservation.status, Reservation.book_id)
+        .execution_options(synchronize_session=False)
+    ).first()
+    if deleted is not None and deleted.status in Reservation.HOLDS_COPY:
+        db.session.execute(release_copies([deleted.book_id]))
     db.session.commit()
+    bump_catalog_version()
 
     return jsonify({'message': 'Reservation deleted successfully'}), 200
 
 
+# ========== Export Endpoints ==========
+
+def export_response(rows, fields, name):
+    """Stream `rows` as NDJSON (default) or CSV according to ?format="""
+    fmt = request.args.get('format', 'ndjson').lower()
+    if fmt not in EXPORT_FORMATS:
+        return jsonify({'error': f"format must be one of: {', '.join(EXPORT_FORMATS)}"}), 400
+
+    # No Content-Length, so the body goes out chunked as batches are encoded.
+    # stream_with_context keeps the session (and its cursor) open until the end.
+    body = stream_export(rows, fields, fmt, current_app.config['EXPORT_BATCH_SIZE'])
+    return Response(
+        stream_with_context(body),
+        mimetype=EXPORT_FORMATS[fmt],
+        headers={
+            'Content-Disposition': f'attachment; filename="{name}.{fmt}"',
+            'X-Accel-Buffering': 'no',
+        }
+    )
+
+
+def export_books_query(genre=None, search=None, available_only=False, since=None):
+    """Books for /api/export/books in id order, or oldest first when `since` is given"""
+    query = filter_books(Book.query, genre, search, available_only)
+    if since:
+        # In index order, so the export streams without sorting the window first
+        return query.filter(Book.created_at >= since).order_by(Book.created_at, Book.id)
+    return query.order_by(Book.id)
+
+
+def export_reservations_query(user, status=None, book_id=None, user_email=None, since=None):
+    """Reservations for /api/export/reservations in id order, or oldest first when `since` is given"""
+    query = filter_reservations(
+        Reservation.query.options(db.joinedload(Reservation.book)), user, status, book_id, user_email
+    )
+    if since:
+        return query.filter(Reservation.reservation_date >= since).order_by(
+            Reservation.reservation_date, Reservation.id
+        )
+    return query.order_by(Reservation.id)
+
+
+@api.route('/api/export/books', methods=['GET'])
+@query_budget(2)
+@teacher_required
+def export_books():
+    """Stream the catalog as NDJSON or CSV (teachers only).
+
+    Accepts the /api/books filters (genre, search, available) plus `since`,
+    an ISO 8601 timestamp matched against created_at.
+    """
+    try:
+        since = parse_since(request.args.get('since'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    query = export_books_query(
+        request.args.get('genre'),
+        request.args.get('search'),
+        request.args.get('available', 'false').lower() == 'true',
+        since
+    )
+
+    # Session.scalars() rather than Query iteration, which uniquifies rows and
+    # so cannot stream with yield_per
+    books = db.session.scalars(
+        query.statement,
+        execution_options={'yield_per': current_app.config['EXPORT_BATCH_SIZE']}
+    )
+    return export_response((book.to_dict() for book in books), BOOK_EXPORT_FIELDS, 'books')
+
+
+@api.route('/api/export/reservations', methods=['GET'])
+@query_budget(2)
+@teacher_required
+def export_reservations():
+    """Stream the reservation history as NDJSON or CSV (teachers only).
+
+    Accepts the /api/reservations filters (status, book_id, user_email) plus
+    `since`, an ISO 8601 timestamp matched against reservation_date.
+    """
+    try:
+        since = parse_since(request.args.get('since'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    query = export_reservations_query(
+        get_current_user(),
+        request.args.get('status'),
+        request.args.get('book_id'),
+        request.args.get('user_email'),
+        since
+    )
+
+    reservations = db.session.scalars(
+        query.statement,
+        execution_options={'yield_per': current_app.config['EXPORT_BATCH_SIZE']}
+    )
+    return export_response(
+        (reservation_export_row(reservation) for reservation in reservations),
+        RESERVATION_EXPORT_FIELDS,
+        'reservations'
+    )
+
+
 # ========== Utility Endpoints ==========
 
-@app.route('/api/genres', methods=['GET'])
+@api.route('/api/genres', methods=['GET'])
+@query_budget(1)
+@read_replica
+@catalog_cached
 def get_genres():
     """Get all unique genres"""
     genres = db.session.query(Book.genre).distinct().all()
     return jsonify([genre[0] for genre in genres])
 
 
-@app.route('/api/health', methods=['GET'])
+@api.route('/api/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
-    return jsonify({'status': 'healthy', 'message': 'Virtual Library API is running'})
+    health = {'status': 'healthy', 'message': 'Virtual Library API is running'}
+    if 'read_replicas' in current_app.extensions:
+        health['replicas'] = current_app.extensions['read_replicas'].status()
+    return jsonify(health)
+
+
+@api.route('/api/cache/stats', methods=['GET'])
+def cache_stats():
+    """Hit/miss counters for this worker's catalog response cache"""
+    return jsonify(catalog_cache_stats())
+
 
+@api.route('/api/admission/stats', methods=['GET'])
+def admission_control_stats():
+    """Admission decisions and slot usage for this worker"""
+    return jsonify(admission_stats())
 
-@app.route('/api/setup-admin', methods=['POST'])
+
+@api.route('/api/metrics', methods=['GET'])
+def metrics():
+    """Prometheus metrics summed across all workers"""
+    from metrics import metrics_response
+    return metrics_response()
+
+
+@api.route('/api/setup-admin', methods=['POST'])
 def setup_admin():
     """One-time endpoint to create the first teacher account. Remove after use."""
     setup_key = os.environ.get('SETUP_KEY')
@@ -497,6 +1179,73 @@ def setup_admin():
     return jsonify({'message': f"Teacher account '{data['username']}' created successfully"}), 201
 
 
+# ========== CLI Commands ==========
+
+@api.cli.command('init-db')
+def init_db_command():
+    """Create missing tables and the full-text search index (run before starting workers)"""
+    init_db(current_app._get_current_object())
+    print("Database initialized")
+
+
+def endpoint_queries():
+    """Representative statements for the query behind each hot endpoint"""
+    student = SimpleNamespace(id=1, role='student')
+    teacher = SimpleNamespace(id=1, role='teacher')
+
+    def catalog(query):
+        return query.order_by(Book.title, Book.id).statement
+
+    def listing(query):
+        return query.order_by(Reservation.reservation_date.desc()).statement
+
+    return [
+        ('GET /api/books', catalog(filter_books(Book.query))),
+        ('GET /api/books?genre=', catalog(filter_books(Book.query, genre='Fiction'))),
+        ('GET /api/books?available=true', catalog(filter_books(Book.query, available_only=True))),
+        ('GET /api/books?genre=&available=true', catalog(filter_books(Book.query, genre='Fiction', available_only=True))),
+        ('GET /api/books?search=', catalog(filter_books(Book.query, search='tolkien'))),
+        ('GET /api/books?limit=&cursor=', filter_books(Book.query).filter(
+            keyset_filter([Book.title, Book.id], ['M', 1])
+        ).order_by(Book.title, Book.id).limit(51).statement),
+        ('GET /api/genres', db.session.query(Book.genre).distinct().statement),
+        ('GET /api/reservations (student)', listing(filter_reservations(Reservation.query, student))),
+        ('GET /api/reservations?status=pending (student)', listing(filter_reservations(Reservation.query, student, 'pending'))),
+        ('GET /api/reservations (teacher)', listing(filter_reservations(Reservation.query, teacher))),
+        ('GET /api/reservations?status=picked_up', listing(filter_reservations(Reservation.query, teacher, 'picked_up'))),
+        ('GET /api/reservations?status=expired', listing(filter_reservations(Reservation.query, teacher, 'expired'))),
+        ('GET /api/reservations?book_id=', listing(filter_reservations(Reservation.query, teacher, book_id=1))),
+        ('GET /api/reservations?user_email=', listing(filter_reservations(Reservation.query, teacher, user_email='a@b.c'))),
+        ('POST /api/reservations (active reservation check)', Reservation.query.filter(
+            Reservation.user_id == 1, Reservation.effectively_pending()
+        ).statement),
+        ('expire-reservations', db.select(Reservation.book_id).where(Reservation.effectively_expired())),
+        ('GET /api/reservations/stats (by status)', status_counts_query()),
+        ('GET /api/reservations/stats (checked out)', checked_out_query()),
+        ('GET /api/reservations/stats (overdue)', overdue_query()),
+        ('GET /api/reservations/stats (per day)', per_day_query(datetime.utcnow())),
+        ('GET /api/reservations/stats (top borrowers)', top_borrowers_query(datetime.utcnow(), 10)),
+        # Unfiltered facets and exports read every row by design, so only the filtered forms are checked
+        ('GET /api/books/facets?genre=', facet_counts_query(genre='Fiction').statement),
+        ('GET /api/books/facets?available=true', facet_counts_query(available_only=True).statement),
+        ('GET /api/export/books?genre=', export_books_query(genre='Fiction').statement),
+        ('GET /api/export/books?since=', export_books_query(since=datetime.utcnow()).statement),
+        ('GET /api/export/reservations?status=', export_reservations_query(teacher, 'picked_up').statement),
+        ('GET /api/export/reservations?since=', export_reservations_query(teacher, since=datetime.utcnow()).statement),
+        ('POST /api/auth/login', User.query.filter_by(username='student1').statement),
+    ]
+
+
+@api.cli.command('check-query-plans')
+def check_query_plans_command():
+    """EXPLAIN every endpoint query and exit non-zero if any falls back to a full table scan"""
+    failures = check_query_plans(db.engine, endpoint_queries(), verbose=True)
+    if failures:
+        print(f"\n{len(failures)} quer{'y' if len(failures) == 1 else 'ies'} fell back to a full table scan")
+        sys.exit(1)
+    print("\nAll endpoint queries use an index")
+
+
 # JWT Error handlers
 @jwt.expired_token_loader
 def expired_token_callback(jwt_header, jwt_payload):
@@ -514,17 +1263,19 @@ def unauthorized_callback(error):
 
 
 # Error handlers
-@app.errorhandler(404)
+@api.app_errorhandler(404)
 def not_found(error):
     return jsonify({'error': 'Resource not found'}), 404
 
 
-@app.errorhandler(500)
+@api.app_errorhandler(500)
 def internal_error(error):
     db.session.rollback()
-    sentry_sdk.capture_exception(error)
+    capture_exception(error)
     return jsonify({'error': 'Internal server error'}), 500
 
 
 if __name__ == '__main__':
+    app = create_app()
+    init_db(app)
     app.run(debug=True, port=5000)
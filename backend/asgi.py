@@ -0,0 +1,425 @@
+import json
+from contextlib import asynccontextmanager
+from a2wsgi import WSGIMiddleware
+from flask import g, request as flask_request
+from flask_jwt_extended import get_jwt_identity, verify_jwt_in_request
+from sqlalchemy import select
+from sqlalchemy.exc import DBAPIError, IntegrityError
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import configure_mappers, joinedload, selectinload
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import Response
+from starlette.routing import Mount, Route
+from werkzeug.exceptions import BadRequest, NotFound, UnsupportedMediaType
+
+from admission import jwt_user, rejection
+from app import (app, active_reservation_error, claim_book, expiry_update, filter_books, filter_reservations,
+                 instrument_engines, new_reservation, release_copies, reservation_user, serialize_reservations)
+from catalog_cache import async_catalog_cached, bump_catalog_version
+from database import engine_options, init_engine
+from models import db, Book, Reservation, User
+from monitoring import capture_exception
+from pagination import InvalidCursor, keyset_page, parse_limit, split_page
+from replicas import pinned_to_primary
+from sparse_fields import load_only_fields, parse_fields
+
+# Optional async serving mode: `uvicorn asgi:application`. The book, genre and
+# reservation read paths and reservation creation run as coroutines on an
+# async engine (aiosqlite / asyncpg), so a request waiting on the database
+# holds no thread. They reuse the Flask app's models, filters, statements and
+# JSON encoding, and return the same bodies and status codes. Each runs inside
+# a Flask request context with the app's before/after request hooks (CORS,
+# metrics, query budgets against the Flask view's @query_budget, replica
+# pins), and the catalog cache, read replicas and admission control wrap them
+# as they wrap the Flask views. Every other route is the Flask app itself,
+# served from a thread pool.
+
+ASYNC_DRIVERS = {'sqlite': 'sqlite+aiosqlite', 'postgresql': 'postgresql+asyncpg'}
+
+
+def async_url(url):
+    """The async-driver equivalent of a sync database URL"""
+    backend = url.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"No async driver configured for {backend} databases")
+    return url.set(drivername=ASYNC_DRIVERS[backend])
+
+
+def async_engine_options(config):
+    options = engine_options(config)
+    connect_args = options.pop('connect_args', None)
+    if connect_args and 'options' in connect_args:
+        # asyncpg takes server settings directly rather than libpq's -c options
+        name, value = connect_args['options'].removeprefix('-c ').split('=', 1)
+        options['connect_args'] = {'server_settings': {name: value}}
+    return options
+
+
+def replica_engine(replica):
+    """An async engine for one of the Flask app's read replica engines"""
+    config = dict(app.config, SQLALCHEMY_DATABASE_URI=replica.url)
+    replica_async = create_async_engine(async_url(replica.url), **async_engine_options(config))
+    init_engine(replica_async.sync_engine, config)
+    return replica_async
+
+
+with app.app_context():
+    # The Flask engine's URL, with relative SQLite paths already resolved
+    engine = create_async_engine(async_url(db.engine.url), **async_engine_options(app.config))
+    init_engine(engine.sync_engine, app.config)
+# Keyed by the Flask app's replica engine, which ReplicaSet chooses and marks down
+replica_engines = {
+    replica: replica_engine(replica)
+    for replica in (app.extensions['read_replicas'].engines if 'read_replicas' in app.extensions else [])
+}
+instrument_engines(app, engine.sync_engine, *(replica.sync_engine for replica in replica_engines.values()))
+Session = async_sessionmaker(engine, expire_on_commit=False)
+# Reservation.book is a backref, which only exists once the mappers are configured
+configure_mappers()
+
+
+def json_response(obj, status=200):
+    # Flask's own JSON provider, so bodies match the sync app byte for byte
+    response = app.json.response(obj)
+    response.status_code = status
+    return response
+
+
+def not_found():
+    return json_response({'error': 'Resource not found'}, 404)
+
+
+def endpoint(fn):
+    """Run `fn(request, session)` inside a Flask request context and an async session.
+
+    The request context matches the Flask route of the same path and method,
+    so the app's before/after request hooks run as they would for that view.
+    `fn` returns a Flask response, sent with its headers unchanged.
+    """
+    async def handler(request):
+        with app.test_request_context(
+            request.url.path,
+            method=request.method,
+            headers=list(request.headers.items()),
+            query_string=request.url.query,
+            environ_base={'REMOTE_ADDR': request.client.host} if request.client else None,
+        ):
+            response = app.preprocess_request()
+            if response is None:
+                async with Session() as session:
+                    response = await fn(request, session)
+            response = app.process_response(app.make_response(response))
+
+        sent = Response(response.get_data(), status_code=response.status_code)
+        sent.raw_headers = [(name.lower().encode('latin-1'), value.encode('latin-1'))
+                            for name, value in response.headers.items()]
+        return sent
+    return handler
+
+
+def admission_controlled(policy_name):
+    """Async counterpart of admission.admission_control (keyed by the JWT identity)"""
+    def decorator(fn):
+        async def wrapper(request, session):
+            control = app.extensions.get('admission')
+            if control is None:
+                return await fn(request, session)
+
+            policy = control.policies[policy_name]
+            user_key = jwt_user() if policy.user_rate > 0 else None
+            # A queued request blocks, so wait in a thread rather than on the event loop
+            outcome, release, seconds = await run_in_threadpool(
+                control.admit, policy, flask_request.remote_addr, user_key
+            )
+            if release is None:
+                g.admission = (policy.name, outcome, None)
+                body, status, headers = rejection(outcome, seconds)
+                response = json_response(body, status)
+                response.headers.update(headers)
+                return response
+
+            g.admission = (policy.name, outcome, seconds)
+            try:
+                return await fn(request, session)
+            finally:
+                release()
+
+        return wrapper
+    return decorator
+
+
+def read_replica(fn):
+    """Async counterpart of replicas.read_replica: read from a healthy replica unless pinned"""
+    async def wrapper(request, session):
+        replicas = app.extensions.get('read_replicas')
+        replica = replicas.choose() if replicas is not None and not pinned_to_primary() else None
+        if replica is None:
+            return await fn(request, session)
+
+        g.read_replica = True
+        try:
+            async with Session(bind=replica_engines[replica]) as replica_session:
+                return await fn(request, replica_session)
+        except DBAPIError as exc:
+            replicas.mark_down(replica, exc)
+
+        # Fail back to the primary
+        g.read_replica = False
+        return await fn(request, session)
+
+    return wrapper
+
+
+def student_or_teacher(fn):
+    """Async counterpart of auth.student_or_teacher_required, with the same responses"""
+    async def wrapper(request, session):
+        try:
+            # The Flask extension checks the header and token, so failures read the same
+            verify_jwt_in_request()
+            user_id = get_jwt_identity()
+            current_user = await session.get(User, int(user_id)) if user_id else None
+
+            if not current_user:
+                print("ERROR: User not found in database")
+                return json_response({'error': 'User not found'}, 401)
+
+            if not current_user.active:
+                print("ERROR: User account is inactive")
+                return json_response({'error': 'User account is inactive'}, 401)
+
+            if current_user.role not in ['student', 'teacher']:
+                print(f"ERROR: User role is {current_user.role}, not student or teacher")
+                return json_response({'error': 'Student or teacher access required'}, 403)
+
+            return await fn(request, session, current_user)
+        except Exception as e:
+            print(f"ERROR in student_or_teacher_required: {type(e).__name__}: {str(e)}")
+            capture_exception(e)
+            return json_response({'error': f'Authentication required: {str(e)}'}, 401)
+
+    return wrapper
+
+
+async def get_json(request):
+    """request.get_json() for Starlette, raising the same errors as Flask"""
+    content_type = request.headers.get('content-type', '').split(';')[0].strip()
+    if not (content_type == 'application/json'
+            or (content_type.startswith('application/') and content_type.endswith('+json'))):
+        raise UnsupportedMediaType(
+            "Did not attempt to load JSON data because the request Content-Type was not 'application/json'."
+        )
+    try:
+        return json.loads(await request.body())
+    except ValueError:
+        raise BadRequest()
+
+
+# ========== Book Endpoints ==========
+
+async def get_books(request, session):
+    genre = request.query_params.get('genre')
+    search = request.query_params.get('search')
+    available_only = request.query_params.get('available', 'false').lower() == 'true'
+    cursor = request.query_params.get('cursor')
+    paginated = 'limit' in request.query_params or cursor is not None
+
+    try:
+        fields = parse_fields(request.query_params.get('fields'), Book.FIELDS)
+    except ValueError as e:
+        return json_response({'error': str(e)}, 400)
+
+    query = filter_books(select(Book), genre, search, available_only)
+    if fields:
+        query = query.options(load_only_fields(Book, fields, extra=['title'] if paginated else []))
+
+    if not paginated:
+        books = (await session.scalars(query.order_by(Book.title, Book.id))).all()
+        return json_response([book.to_dict(fields) for book in books])
+
+    columns = [Book.title, Book.id]
+    try:
+        limit = parse_limit(
+            request.query_params.get('limit'),
+            app.config['BOOKS_PAGE_DEFAULT_LIMIT'],
+            app.config['BOOKS_PAGE_MAX_LIMIT']
+        )
+        query = keyset_page(query, columns, limit, cursor)
+    except InvalidCursor:
+        return json_response({'error': 'Invalid cursor'}, 400)
+    except ValueError as e:
+        return json_response({'error': str(e)}, 400)
+
+    books, next_cursor = split_page((await session.scalars(query)).all(), columns, limit)
+    return json_response({
+        'books': [book.to_dict(fields) for book in books],
+        'next_cursor': next_cursor
+    })
+
+
+async def get_book(request, session):
+    try:
+        fields = parse_fields(request.query_params.get('fields'), Book.FIELDS)
+    except ValueError as e:
+        return json_response({'error': str(e)}, 400)
+
+    options = [load_only_fields(Book, fields)] if fields else []
+    book = await session.get(Book, request.path_params['book_id'], options=options)
+    if book is None:
+        return not_found()
+    return json_response(book.to_dict(fields))
+
+
+async def get_genres(request, session):
+    genres = (await session.execute(select(Book.genre).distinct())).all()
+    return json_response([genre[0] for genre in genres])
+
+
+# ========== Reservation Endpoints ==========
+
+@student_or_teacher
+async def get_reservations(request, session, current_user):
+    status = request.query_params.get('status')
+    book_id = request.query_params.get('book_id')
+    user_email = request.query_params.get('user_email')
+    sideload_books = request.query_params.get('sideload') == 'books'
+
+    try:
+        fields = parse_fields(request.query_params.get('fields'), Reservation.FIELDS + ('book',))
+    except ValueError as e:
+        return json_response({'error': str(e)}, 400)
+
+    include_book = fields is None or 'book' in fields
+    query = select(Reservation)
+    if fields:
+        fields = [field for field in fields if field != 'book']
+        query = query.options(load_only_fields(
+            Reservation, fields, extra=['book_id'] if include_book or sideload_books else []
+        ))
+
+    if include_book or sideload_books:
+        # Nothing may lazy-load under asyncio, and this is one SELECT anyway
+        query = query.options(selectinload(Reservation.book))
+    query = filter_reservations(query, current_user, status, book_id, user_email)
+
+    reservations = (await session.scalars(query.order_by(Reservation.reservation_date.desc()))).all()
+    return json_response(serialize_reservations(reservations, sideload_books, fields, include_book))
+
+
+async def get_reservation(request, session):
+    reservation = await session.get(
+        Reservation, request.path_params['reservation_id'], options=[joinedload(Reservation.book)]
+    )
+    if reservation is None:
+        return not_found()
+    return json_response(reservation.to_dict())
+
+
+async def expire_old_reservations(session, book_id=None, user_id=None):
+    book_ids = (await session.scalars(expiry_update(book_id, user_id))).all()
+    if book_ids:
+        await session.execute(release_copies(book_ids))
+    await session.commit()
+
+    if book_ids:
+        bump_catalog_version()
+
+    return len(book_ids)
+
+
+async def reserve_book(session, book_id, user, data):
+    claimed = (await session.execute(claim_book(book_id))).rowcount
+    if not claimed:
+        await session.rollback()
+        return 'unavailable', None
+
+    reservation = new_reservation(book_id, user, data)
+    session.add(reservation)
+
+    try:
+        await session.commit()
+    except IntegrityError:
+        await session.rollback()
+        return 'active_reservation', None
+
+    # Reload with the book, whose loaded copy predates the UPDATE above
+    reservation = await session.get(
+        Reservation, reservation.id, options=[joinedload(Reservation.book)], populate_existing=True
+    )
+    return 'created', reservation
+
+
+@admission_controlled('reservations')
+@student_or_teacher
+async def create_reservation(request, session, current_user):
+    data = await get_json(request)
+
+    required_fields = ['book_id']
+    for field in required_fields:
+        if field not in data:
+            return json_response({'error': f'Missing required field: {field}'}, 400)
+
+    book = await session.get(Book, data['book_id'])
+    if book is None:
+        # get_or_404 inside the sync decorator
+        raise NotFound()
+    book_id = book.id
+    # A rollback expires every loaded object, and expired attributes cannot
+    # be lazily reloaded under asyncio
+    user = reservation_user(current_user)
+
+    # The same claim / unique-index / sweep-and-retry sequence as app.create_reservation
+    try:
+        for attempt in range(2):
+            outcome, reservation = await reserve_book(session, book_id, user, data)
+            if outcome == 'created':
+                bump_catalog_version()
+                return json_response(reservation.to_dict(), 201)
+
+            if attempt == 0:
+                swept = await expire_old_reservations(session, book_id=book_id) if outcome == 'unavailable' \
+                    else await expire_old_reservations(session, user_id=user.id)
+                if swept:
+                    continue
+            break
+    except Exception as e:
+        await session.rollback()
+        capture_exception(e)
+        return json_response({'error': f'Failed to create reservation: {str(e)}'}, 500)
+
+    if outcome == 'unavailable':
+        return json_response({'error': 'Book is not available for reservation'}, 400)
+
+    active_reservation = (await session.scalars(
+        select(Reservation)
+        .where(Reservation.user_id == user.id, Reservation.status == 'pending')
+        .options(joinedload(Reservation.book))
+        .limit(1)
+    )).first()
+    return json_response(active_reservation_error(active_reservation), 400)
+
+
+@asynccontextmanager
+async def lifespan(application):
+    # The async routes never reach Flask's before_request, which starts it under WSGI
+    if 'reservation_sweeper' in app.extensions:
+        app.extensions['reservation_sweeper'].ensure_started()
+    yield
+    await engine.dispose()
+    for replica in replica_engines.values():
+        await replica.dispose()
+
+
+application = Starlette(
+    routes=[
+        Route('/api/books', endpoint(read_replica(async_catalog_cached(get_books))), methods=['GET']),
+        Route('/api/books/{book_id:int}', endpoint(read_replica(async_catalog_cached(get_book))), methods=['GET']),
+        Route('/api/genres', endpoint(read_replica(async_catalog_cached(get_genres))), methods=['GET']),
+        Route('/api/reservations', endpoint(get_reservations), methods=['GET']),
+        Route('/api/reservations', endpoint(create_reservation), methods=['POST']),
+        Route('/api/reservations/{reservation_id:int}', endpoint(get_reservation), methods=['GET']),
+        # Everything else, including other methods on the paths above
+        Mount('/', app=WSGIMiddleware(app)),
+    ],
+    lifespan=lifespan,
+)
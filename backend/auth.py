@@ -1,15 +1,23 @@
 from functools import wraps
-from flask import jsonify
+from flask import g, jsonify
 from flask_jwt_extended import verify_jwt_in_request, get_jwt_identity, get_jwt
 from models import User
-import sentry_sdk
+from monitoring import capture_exception
 
 
 def get_current_user():
-    """Get the current authenticated user from the JWT token"""
+    """Get the current authenticated user from the JWT token.
+
+    The user is cached on `g`, so the auth decorators and the view share one
+    lookup per request.
+    """
+    if 'current_user' in g:
+        return g.current_user
+
     user_id = get_jwt_identity()
     if user_id:
-        return User.query.get(int(user_id))
+        g.current_user = User.query.get(int(user_id))
+        return g.current_user
     return None
 
 
@@ -33,7 +41,7 @@ def token_required(fn):
         except Exception as e:
             print(f"ERROR in token_required: {type(e).__name__}: {str(e)}")
             # Capture exception in Sentry
-            sentry_sdk.capture_exception(e)
+            capture_exception(e)
             return jsonify({'error': f'Authentication required: {str(e)}'}), 401
 
     return wrapper
@@ -63,7 +71,7 @@ def teacher_required(fn):
         except Exception as e:
             print(f"ERROR in teacher_required: {type(e).__name__}: {str(e)}")
             # Capture exception in Sentry
-            sentry_sdk.capture_exception(e)
+            capture_exception(e)
             return jsonify({'error': f'Authentication required: {str(e)}'}), 401
 
     return wrapper
@@ -95,7 +103,7 @@ def student_or_teacher_required(fn):
             import traceback
             traceback.print_exc()
             # Capture exception in Sentry
-            sentry_sdk.capture_exception(e)
+            capture_exception(e)
             return jsonify({'error': f'Authentication required: {str(e)}'}), 401
 
     return wrapper
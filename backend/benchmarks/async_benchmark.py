@@ -0,0 +1,266 @@
+"""Compare gunicorn sync workers with the ASGI app (uvicorn) under concurrent clients.
+
+Both servers run as real subprocesses with the same number of worker
+processes, against the same generated SQLite dataset. For each concurrency
+level, that many keep-alive clients request a mix of single books, filtered
+book pages, a student's reservations and single reservations, all endpoints
+the async app serves natively. The benchmark reports throughput, p50/p95
+latency and the resident memory of the whole server process tree: at idle,
+at peak, and the peak growth per concurrent connection. Linux only, because
+memory is read from /proc. Run from the backend directory:
+
+    python -m benchmarks.async_benchmark --books 20000 --workers 2 --levels 8,32,128 --duration 10
+"""
+import argparse
+import asyncio
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+from urllib.parse import quote
+
+HOST = '127.0.0.1'
+
+SERVERS = {
+    'gunicorn-sync': lambda port, workers: [
+        sys.executable, '-m', 'gunicorn', '--workers', str(workers), '--worker-class', 'sync',
+        '--bind', f'{HOST}:{port}', 'app:app',
+    ],
+    'uvicorn-asgi': lambda port, workers: [
+        sys.executable, '-m', 'uvicorn', 'asgi:application', '--workers', str(workers),
+        '--host', HOST, '--port', str(port), '--no-access-log', '--log-level', 'warning',
+    ],
+}
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind((HOST, 0))
+        return sock.getsockname()[1]
+
+
+def process_tree(pid):
+    pids = [pid]
+    for parent in pids:
+        try:
+            for task in os.listdir(f'/proc/{parent}/task'):
+                with open(f'/proc/{parent}/task/{task}/children') as f:
+                    pids.extend(int(child) for child in f.read().split())
+        except FileNotFoundError:
+            continue
+    return pids
+
+
+def tree_rss_mb(pid):
+    """Resident memory of `pid` and all its descendants, in MiB"""
+    total_kb = 0
+    for member in process_tree(pid):
+        try:
+            with open(f'/proc/{member}/status') as f:
+                for line in f:
+                    if line.startswith('VmRSS:'):
+                        total_kb += int(line.split()[1])
+                        break
+        except FileNotFoundError:
+            continue
+    return total_kb / 1024
+
+
+class Connection:
+    """A minimal HTTP/1.1 keep-alive client connection; reconnects when the server closes"""
+
+    def __init__(self, port):
+        self.port = port
+        self.reader = self.writer = None
+
+    async def get(self, path, headers):
+        for attempt in range(2):
+            if self.writer is None:
+                self.reader, self.writer = await asyncio.open_connection(HOST, self.port)
+            extra = ''.join(f'{name}: {value}\r\n' for name, value in headers.items())
+            self.writer.write(f'GET {path} HTTP/1.1\r\nHost: {HOST}\r\n{extra}\r\n'.encode())
+            status_line = await self.reader.readline()
+            if status_line:
+                break
+            # The server closed an idle keep-alive connection: reconnect and retry once
+            await self.close()
+        else:
+            raise ConnectionError('server closed the connection')
+
+        length = 0
+        close = False
+        while True:
+            line = await self.reader.readline()
+            if line in (b'\r\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            name = name.strip().lower()
+            if name == 'content-length':
+                length = int(value)
+            elif name == 'connection' and value.strip().lower() == 'close':
+                close = True
+        await self.reader.readexactly(length)
+        if close:
+            await self.close()
+        return int(status_line.split()[1])
+
+    async def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            try:
+                await self.writer.wait_closed()
+            except OSError:
+                pass
+        self.reader = self.writer = None
+
+
+async def drive(port, context, clients, duration):
+    latencies = []
+    errors = 0
+    deadline = time.perf_counter() + duration
+
+    async def client(index):
+        nonlocal errors
+        rng = random.Random(index)
+        connection = Connection(port)
+        student = {'Authorization': f"Bearer {context['student_tokens'][index % len(context['student_tokens'])]}"}
+        requests = [
+            lambda: (f"/api/books/{rng.randint(1, context['books'])}", {}),
+            lambda: (f"/api/books?limit=20&available=true&genre={quote(rng.choice(context['genres']))}", {}),
+            lambda: ('/api/reservations', student),
+            lambda: (f"/api/reservations/{rng.randint(1, context['reservations'])}", {}),
+        ]
+        while time.perf_counter() < deadline:
+            path, headers = rng.choice(requests)()
+            started = time.perf_counter()
+            try:
+                status = await connection.get(path, headers)
+            except (OSError, ConnectionError, asyncio.IncompleteReadError):
+                await connection.close()
+                errors += 1
+                continue
+            latencies.append(time.perf_counter() - started)
+            if status != 200:
+                errors += 1
+        await connection.close()
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client(i) for i in range(clients)))
+    return latencies, errors, time.perf_counter() - started
+
+
+def percentile_ms(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))] * 1000
+
+
+def wait_until_ready(port, process, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            sys.exit(f"Server exited with status {process.returncode}")
+        try:
+            status = asyncio.run(Connection(port).get('/api/health', {}))
+            if status == 200:
+                return
+        except OSError:
+            pass
+        time.sleep(0.2)
+    sys.exit('Server did not become ready')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--books', type=int, default=20000)
+    parser.add_argument('--users', type=int, default=500)
+    parser.add_argument('--workers', type=int, default=2, help='worker processes per server')
+    parser.add_argument('--levels', default='8,32,128', help='concurrent client connections')
+    parser.add_argument('--duration', type=float, default=10, help='seconds per level')
+    parser.add_argument('--servers', default=','.join(SERVERS))
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='async-bench-')
+    env = dict(
+        os.environ,
+        DATABASE_URL=f"sqlite:///{os.path.join(workdir, 'bench.db')}",
+        CATALOG_VERSION_FILE=os.path.join(workdir, 'catalog_version'),
+        PROMETHEUS_MULTIPROC_DIR=os.path.join(workdir, 'metrics'),
+        SENTRY_TRACES_SAMPLE_RATE='0',
+        SENTRY_PROFILE_SAMPLE_RATE='0',
+        BCRYPT_MAX_CONCURRENT='0',
+        # gunicorn.conf.py sizes per-worker limits from this, not from --workers
+        WEB_CONCURRENCY=str(args.workers),
+    )
+    os.makedirs(env['PROMETHEUS_MULTIPROC_DIR'])
+    os.environ.update(env)
+
+    from flask_jwt_extended import create_access_token
+    from app import app, init_db
+    from models import db, Reservation, User
+    import generate_data
+
+    init_db(app)
+
+    with app.app_context():
+        with db.engine.connect() as conn:
+            generate_data.generate(
+                conn, args.books, args.users, teachers=max(1, args.users // 40), reservations=args.books,
+                pending=args.users // 5, years=1, seed=42, anchor=datetime.utcnow(), password='password123',
+                rounds=4, batch_size=20000
+            )
+        students = User.query.filter_by(role='student').order_by(User.id).limit(64).all()
+        context = {
+            'books': args.books,
+            'reservations': db.session.query(db.func.max(Reservation.id)).scalar(),
+            'genres': [genre for genre, _ in generate_data.GENRES],
+            'student_tokens': [create_access_token(identity=str(user.id)) for user in students],
+        }
+        db.session.remove()
+        db.engine.dispose()
+
+    levels = [int(level) for level in args.levels.split(',')]
+    print(f"{args.books} books, {args.workers} worker processes per server, "
+          f"{args.duration:g}s per level, {os.cpu_count()} CPUs")
+    print(f"  {'server':<14} {'clients':>7} {'req/s':>8} {'p50':>9} {'p95':>9} {'errors':>7} "
+          f"{'idle RSS':>9} {'peak RSS':>9} {'per conn':>9}")
+
+    for name in args.servers.split(','):
+        port = free_port()
+        process = subprocess.Popen(SERVERS[name](port, args.workers), env=env)
+        try:
+            wait_until_ready(port, process)
+            asyncio.run(drive(port, context, args.workers, 1))  # warm up every worker
+            idle = tree_rss_mb(process.pid)
+
+            for level in levels:
+                peak = [idle]
+                sampling = threading.Event()
+
+                def sample():
+                    while not sampling.wait(0.2):
+                        peak[0] = max(peak[0], tree_rss_mb(process.pid))
+
+                sampler = threading.Thread(target=sample)
+                sampler.start()
+                latencies, errors, elapsed = asyncio.run(drive(port, context, level, args.duration))
+                sampling.set()
+                sampler.join()
+
+                latencies.sort()
+                per_connection = (peak[0] - idle) * 1024 / level
+                print(f"  {name:<14} {level:>7} {len(latencies) / elapsed:>8.1f} "
+                      f"{percentile_ms(latencies, 0.5):>7.1f}ms {percentile_ms(latencies, 0.95):>7.1f}ms "
+                      f"{errors:>7} {idle:>7.1f}MB {peak[0]:>7.1f}MB {per_connection:>7.1f}KB")
+        finally:
+            process.terminate()
+            process.wait(timeout=30)
+
+
+if __name__ == '__main__':
+    main()
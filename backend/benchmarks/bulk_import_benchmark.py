@@ -0,0 +1,81 @@
+"""Measure POST /api/books/bulk ingestion throughput in rows per second.
+
+Run from the backend directory. Uses a throwaway SQLite file by default;
+pass --database-url to measure against Postgres (the tables are created if
+missing and the benchmark's rows are deleted afterwards):
+
+    python -m benchmarks.bulk_import_benchmark --rows 20000
+    python -m benchmarks.bulk_import_benchmark --database-url postgresql://localhost/library_bench
+"""
+import argparse
+import os
+import tempfile
+import time
+
+
+def make_rows(count, prefix):
+    return [
+        {
+            'title': f"Benchmark Title {i}",
+            'author': f"Author {i % 500}",
+            'genre': ['Fiction', 'Fantasy', 'Dystopian', 'Romance'][i % 4],
+            'year': 1900 + i % 120,
+            'isbn': f"{prefix}{i}",
+            'description': 'A book generated for the bulk import benchmark. ' * 4,
+            'room_number': f"Room {100 + i % 40}",
+        }
+        for i in range(count)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=20000)
+    parser.add_argument('--chunk-sizes', default='100,500,1000,5000')
+    parser.add_argument('--database-url')
+    args = parser.parse_args()
+
+    if args.database_url:
+        os.environ['DATABASE_URL'] = args.database_url
+    else:
+        workdir = tempfile.mkdtemp(prefix='bulk-bench-')
+        os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+
+    # Keep benchmark runs out of Sentry and free of its per-request overhead
+    os.environ['SENTRY_DSN'] = ''
+    os.environ['SENTRY_TRACES_SAMPLE_RATE'] = '0'
+    os.environ['SENTRY_PROFILE_SAMPLE_RATE'] = '0'
+
+    from app import app, init_db
+    from models import db, Book
+    from book_import import BookImport
+
+    init_db(app)
+
+    with app.app_context():
+        print(f"Backend: {db.engine.dialect.name}, rows per run: {args.rows}")
+        for chunk_size in [int(size) for size in args.chunk_sizes.split(',')]:
+            prefix = f"bench{chunk_size}-"
+            rows = make_rows(args.rows, prefix)
+
+            start = time.perf_counter()
+            book_import = BookImport(chunk_size=chunk_size).run(rows)
+            insert_elapsed = time.perf_counter() - start
+
+            # A second pass measures the dedupe path: every ISBN already exists
+            start = time.perf_counter()
+            BookImport(chunk_size=chunk_size).run(rows)
+            dedupe_elapsed = time.perf_counter() - start
+
+            print(
+                f"  chunk={chunk_size:<5} insert {args.rows / insert_elapsed:>9,.0f} rows/s"
+                f"   dedupe {args.rows / dedupe_elapsed:>9,.0f} rows/s"
+                f"   ({book_import.summary['created']} created)"
+            )
+
+            Book.query.filter(Book.isbn.like(f"{prefix}%")).delete(synchronize_session=False)
+            db.session.commit()
+
+
+if __name__ == '__main__':
+    main()
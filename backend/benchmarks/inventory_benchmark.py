@@ -0,0 +1,196 @@
+"""Reserve, cancel, return, delete and expire in parallel, then check the copy counters.
+
+Every student thread loops over a few multi-copy books: reserve one, then
+pick it up and return it, cancel it or delete it. A teacher thread cancels
+and returns reservations at random, racing the students for the same rows,
+and a sweeper thread backdates pending reservations and runs the expiry
+sweep. Afterwards every book must satisfy
+
+    available_copies == total_copies - reservations holding a copy (pending or picked up)
+
+with 0 <= available_copies <= total_copies. Reports operations per second
+and exits non-zero on any drift. Run from the backend directory:
+
+    python -m benchmarks.inventory_benchmark --books 5 --copies 3 --levels 4,16 --duration 5
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--books', type=int, default=5)
+    parser.add_argument('--copies', type=int, default=3, help='copies of each book')
+    parser.add_argument('--duration', type=float, default=5, help='seconds per level')
+    parser.add_argument('--levels', default='4,16', help='concurrent student threads')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='inventory-bench-')
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    os.environ['CATALOG_VERSION_FILE'] = os.path.join(workdir, 'catalog_version')
+    os.environ.setdefault('ADMISSION_CONTROL_ENABLED', 'false')
+    # Keep benchmark runs out of Sentry and free of its per-request overhead
+    os.environ['SENTRY_DSN'] = ''
+    os.environ['SENTRY_TRACES_SAMPLE_RATE'] = '0'
+    os.environ['SENTRY_PROFILE_SAMPLE_RATE'] = '0'
+
+    from flask_jwt_extended import create_access_token
+    from app import app, expire_old_reservations, init_db
+    from models import db, Book, Reservation, User
+    import passwords
+
+    init_db(app)
+
+    levels = [int(level) for level in args.levels.split(',')]
+
+    with app.app_context():
+        password_hash = passwords.hash_password('password123', rounds=4)
+        db.session.execute(db.insert(User), [
+            {'username': f'student{i}', 'email': f'student{i}@example.com', 'full_name': f'Student {i}',
+             'role': 'student', 'password_hash': password_hash, 'active': True}
+            for i in range(max(levels))
+        ] + [{'username': 'teacher', 'email': 'teacher@example.com', 'full_name': 'Teacher',
+              'role': 'teacher', 'password_hash': password_hash, 'active': True}])
+        db.session.commit()
+        users = User.query.order_by(User.id).all()
+        tokens = [create_access_token(identity=str(user.id)) for user in users if user.role == 'student']
+        teacher_token = next(create_access_token(identity=str(user.id)) for user in users if user.role == 'teacher')
+
+    def drift():
+        """Books whose counters disagree with the reservations holding their copies"""
+        with app.app_context():
+            held = Counter(dict(
+                db.session.query(Reservation.book_id, db.func.count())
+                .filter(Reservation.status.in_(Reservation.HOLDS_COPY))
+                .group_by(Reservation.book_id)
+            ))
+            return [
+                (book.id, book.total_copies, book.available_copies, held[book.id])
+                for book in Book.query.order_by(Book.id)
+                if book.available_copies != book.total_copies - held[book.id]
+                or not 0 <= book.available_copies <= book.total_copies
+            ]
+
+    print(f"{args.books} books x {args.copies} copies, {args.duration:g}s per level")
+    failed = False
+
+    for level in levels:
+        with app.app_context():
+            Reservation.query.delete()
+            Book.query.delete()
+            db.session.execute(db.insert(Book), [
+                {'title': f'Book {i}', 'author': 'Author', 'genre': 'Fiction', 'year': 2000,
+                 'isbn': f'inventory-{i}', 'description': 'x',
+                 'total_copies': args.copies, 'available_copies': args.copies}
+                for i in range(args.books)
+            ])
+            db.session.commit()
+            book_ids = [book_id for (book_id,) in db.session.query(Book.id)]
+
+        outcomes = Counter()
+        lock = threading.Lock()
+        reservation_ids = []
+        deadline = time.perf_counter() + args.duration
+
+        def record(operation, status):
+            with lock:
+                outcomes[operation, status] += 1
+
+        def student(token, seed):
+            client = app.test_client()
+            headers = {'Authorization': f'Bearer {token}'}
+            rng = random.Random(seed)
+            while time.perf_counter() < deadline:
+                response = client.post('/api/reservations', headers=headers, json={'book_id': rng.choice(book_ids)})
+                record('reserve', response.status_code)
+                if response.status_code != 201:
+                    continue
+                reservation_id = response.get_json()['id']
+                with lock:
+                    reservation_ids.append(reservation_id)
+
+                path = f'/api/reservations/{reservation_id}'
+                action = rng.random()
+                if action < 0.5:
+                    response = client.put(path, headers=headers, json={'status': 'picked_up'})
+                    record('pick up', response.status_code)
+                    response = client.put(path, headers=headers, json={'status': 'returned'})
+                    record('return', response.status_code)
+                elif action < 0.8:
+                    response = client.put(path, headers=headers, json={'status': 'cancelled'})
+                    record('cancel', response.status_code)
+                else:
+                    response = client.delete(path, headers=headers)
+                    record('delete', response.status_code)
+
+        def teacher():
+            client = app.test_client()
+            headers = {'Authorization': f'Bearer {teacher_token}'}
+            rng = random.Random(0)
+            while time.perf_counter() < deadline:
+                with lock:
+                    recent = reservation_ids[-20:]
+                if not recent:
+                    time.sleep(0.001)
+                    continue
+                status = rng.choice(['cancelled', 'returned', 'picked_up', 'pending'])
+                response = client.put(f'/api/reservations/{rng.choice(recent)}', headers=headers,
+                                      json={'status': status})
+                record(f'teacher {status}', response.status_code)
+
+        def sweeper():
+            rng = random.Random(1)
+            while time.perf_counter() < deadline:
+                with app.app_context():
+                    # Age a few pending reservations past the expiry window, then sweep
+                    cutoff = datetime.utcnow() - timedelta(days=app.config['RESERVATION_EXPIRY_DAYS'] + 1)
+                    pending = db.session.scalars(
+                        db.select(Reservation.id).where(Reservation.status == 'pending')
+                    ).all()
+                    if pending:
+                        db.session.execute(
+                            db.update(Reservation)
+                            .where(Reservation.id.in_(rng.sample(pending, max(1, len(pending) // 3))))
+                            .values(reservation_date=cutoff)
+                        )
+                        db.session.commit()
+                    record('sweep', expire_old_reservations())
+                time.sleep(0.005)
+
+        threads = [threading.Thread(target=student, args=(tokens[i], i)) for i in range(level)]
+        threads += [threading.Thread(target=teacher), threading.Thread(target=sweeper)]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+
+        expired = sum(count * swept for (operation, swept), count in outcomes.items() if operation == 'sweep')
+        requests = sum(count for (operation, _), count in outcomes.items() if operation != 'sweep')
+        errors = sum(count for (operation, status), count in outcomes.items()
+                     if operation != 'sweep' and status >= 500)
+        bad = drift()
+        failed = failed or bool(bad) or bool(errors)
+
+        print(f"  threads={level:<3} {requests / elapsed:>7.1f} requests/s   expired={expired}   "
+              f"errors={errors}   drifted-books={len(bad)}")
+        for operation in sorted({operation for operation, _ in outcomes if operation != 'sweep'}):
+            statuses = ' '.join(f"{status}={count}" for (op, status), count in sorted(outcomes.items())
+                                if op == operation)
+            print(f"      {operation:<18} {statuses}")
+        for book_id, total, available, held in bad:
+            print(f"      book {book_id}: total={total} available={available} held={held}")
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,324 @@
+"""Load test the API with concurrent clients and check for regressions.
+
+Boots the app on a local threaded server against a generated dataset, then
+drives each scenario with --clients concurrent HTTP clients for --duration
+seconds. It reports throughput and p50/p95/p99 latency per scenario and
+writes the results as JSON. Given --baseline, it exits non-zero when a
+scenario's p95 latency rises, or its throughput falls, by more than
+--max-regression (and when a scenario starts failing).
+
+Runs against a fresh SQLite file by default. Pass --database-url (or set
+LOADTEST_DATABASE_URL) to use PostgreSQL. Point it at a throwaway database:
+the dataset is generated into it unless --reuse-data is given. Run from the
+backend directory:
+
+    python -m benchmarks.load_test --books 100000 --clients 8 --duration 10
+    python -m benchmarks.load_test --books 100000 --output run.json --baseline baseline.json
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+PASSWORD = 'loadtest-password'
+
+SCENARIOS = [
+    'books_page', 'books_search', 'books_filter', 'book_search_ranked', 'genres',
+    'reservations_student', 'reservations_teacher', 'login', 'create_reservation',
+]
+
+
+class Client:
+    """One simulated user: an HTTP session and the tokens it acts with"""
+
+    def __init__(self, base_url, context, index):
+        import requests
+        from generate_data import GENRES, THEMES
+
+        self.base_url = base_url
+        self.context = context
+        self.rng = random.Random(index)
+        self.session = requests.Session()
+        # Students without a seeded pending reservation, one per client, so
+        # create_reservation clients never trip over each other's limit
+        self.student = context['free_students'][index % len(context['free_students'])]
+        self.student_headers = {'Authorization': f"Bearer {self.student['token']}"}
+        self.teacher_headers = {'Authorization': f"Bearer {context['teacher_token']}"}
+        self.cleanup = None
+        self.genre_names = [genre for genre, _ in GENRES]
+        self.words = THEMES
+
+    def get(self, path, **kwargs):
+        return self.session.get(self.base_url + path, **kwargs)
+
+    def post(self, path, **kwargs):
+        return self.session.post(self.base_url + path, **kwargs)
+
+    def books_page(self):
+        return self.get('/api/books', params={'limit': 50})
+
+    def books_search(self):
+        return self.get('/api/books', params={'search': self.rng.choice(self.words), 'limit': 50})
+
+    def books_filter(self):
+        return self.get('/api/books', params={'genre': self.rng.choice(self.genre_names), 'available': 'true', 'limit': 50})
+
+    def book_search_ranked(self):
+        return self.get('/api/books/search', params={'q': ' '.join(self.rng.sample(self.words, 2))})
+
+    def genres(self):
+        return self.get('/api/genres')
+
+    def reservations_student(self):
+        return self.get('/api/reservations', headers=self.student_headers)
+
+    def reservations_teacher(self):
+        book_id = self.rng.randint(1, self.context['books'])
+        return self.get('/api/reservations', params={'book_id': book_id}, headers=self.teacher_headers)
+
+    def login(self):
+        return self.post('/api/auth/login', json={'username': self.student['username'], 'password': PASSWORD})
+
+    def create_reservation(self):
+        book_id = self.rng.randint(1, self.context['books'])
+        response = self.post('/api/reservations', json={'book_id': book_id}, headers=self.student_headers)
+        if response.status_code == 201:
+            self.cleanup = lambda: self.session.put(
+                f"{self.base_url}/api/reservations/{response.json()['id']}",
+                json={'status': 'cancelled'}, headers=self.student_headers
+            )
+        return response
+
+    def run_cleanup(self):
+        # Cancel a reservation just made (untimed) so the next attempt is not
+        # refused by the one-pending-reservation rule
+        cleanup, self.cleanup = self.cleanup, None
+        if cleanup:
+            cleanup()
+
+
+# Statuses a scenario produces in normal operation (a book already taken is a
+# legitimate 400 for create_reservation)
+EXPECTED_STATUSES = {'create_reservation': {201, 400}}
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, round(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def run_scenario(name, clients, duration):
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+    expected = EXPECTED_STATUSES.get(name, {200})
+    deadline = time.perf_counter() + duration
+    barrier = threading.Barrier(len(clients))
+
+    def worker(client):
+        action = getattr(client, name)
+        local_latencies = []
+        local_errors = 0
+        barrier.wait()
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            try:
+                status = action().status_code
+            except Exception:
+                status = None
+            local_latencies.append((time.perf_counter() - start) * 1000)
+            if status not in expected:
+                local_errors += 1
+            client.run_cleanup()
+        with lock:
+            latencies.extend(local_latencies)
+            errors[0] += local_errors
+
+    threads = [threading.Thread(target=worker, args=(client,)) for client in clients]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        'requests': len(latencies),
+        'errors': errors[0],
+        'error_rate': round(errors[0] / len(latencies), 4) if latencies else 0,
+        'throughput_rps': round(len(latencies) / elapsed, 1),
+        'mean_ms': round(statistics.fmean(latencies), 2) if latencies else None,
+        'p50_ms': round(percentile(latencies, 0.50), 2) if latencies else None,
+        'p95_ms': round(percentile(latencies, 0.95), 2) if latencies else None,
+        'p99_ms': round(percentile(latencies, 0.99), 2) if latencies else None,
+    }
+
+
+def compare(results, baseline, max_regression):
+    """Return a list of human-readable regressions of `results` against `baseline`"""
+    regressions = []
+    for name, base in baseline['scenarios'].items():
+        current = results['scenarios'].get(name)
+        if current is None or not base.get('p95_ms'):
+            continue
+        if current['p95_ms'] > base['p95_ms'] * (1 + max_regression):
+            regressions.append(f"{name}: p95 {base['p95_ms']}ms -> {current['p95_ms']}ms")
+        if current['throughput_rps'] < base['throughput_rps'] * (1 - max_regression):
+            regressions.append(f"{name}: throughput {base['throughput_rps']} -> {current['throughput_rps']} req/s")
+        if current['error_rate'] > base['error_rate'] + 0.01:
+            regressions.append(f"{name}: error rate {base['error_rate']} -> {current['error_rate']}")
+    return regressions
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--books', type=int, default=1000)
+    parser.add_argument('--reservations', type=int, help='historical reservations (default: same as --books)')
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--clients', type=int, default=8)
+    parser.add_argument('--duration', type=float, default=10, help='seconds per scenario')
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS))
+    parser.add_argument('--database-url', default=os.environ.get('LOADTEST_DATABASE_URL'))
+    parser.add_argument('--reuse-data', action='store_true', help='use the data already in --database-url')
+    parser.add_argument('--bcrypt-rounds', type=int, default=4,
+                        help='cost of the generated password hashes; login time is dominated by it')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help='write results JSON here')
+    parser.add_argument('--baseline', help='results JSON from an earlier run to compare against')
+    parser.add_argument('--max-regression', type=float, default=0.25,
+                        help='allowed relative p95/throughput regression (default 0.25)')
+    args = parser.parse_args()
+
+    scenarios = [name.strip() for name in args.scenarios.split(',') if name.strip()]
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenario(s): {', '.join(sorted(unknown))}")
+    reservations = args.books if args.reservations is None else args.reservations
+
+    if args.database_url:
+        os.environ['DATABASE_URL'] = args.database_url
+    else:
+        workdir = tempfile.mkdtemp(prefix='load-test-')
+        os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(workdir, 'load.db')}"
+    # Keep login comparable across runs: no rehash-on-login to the app default
+    os.environ['BCRYPT_LOG_ROUNDS'] = str(args.bcrypt_rounds)
+    # Measure the app, not Sentry's tracing and profiling
+    os.environ.setdefault('SENTRY_TRACES_SAMPLE_RATE', '0')
+    os.environ.setdefault('SENTRY_PROFILE_SAMPLE_RATE', '0')
+    # Every simulated client shares one address, which the per-IP limits would throttle
+    os.environ.setdefault('ADMISSION_CONTROL_ENABLED', 'false')
+
+    from flask_jwt_extended import create_access_token
+    from werkzeug.serving import make_server
+    from app import app, init_db
+    from models import db, Book, User, Reservation
+    import generate_data
+
+    init_db(app)
+
+    with app.app_context():
+        existing = db.session.query(Book.id).limit(1).count()
+        if not args.reuse_data:
+            if existing:
+                sys.exit("The database already has books; pass --reuse-data or point --database-url at an empty one")
+            started = time.perf_counter()
+            with db.engine.connect() as conn:
+                generate_data.generate(
+                    conn, args.books, args.users, teachers=max(1, args.users // 40),
+                    reservations=reservations, pending=args.users // 5, years=2, seed=args.seed,
+                    anchor=datetime.utcnow(), password=PASSWORD, rounds=args.bcrypt_rounds,
+                    batch_size=20000
+                )
+            print(f"Generated {args.books} books, {reservations} reservations and {args.users} users "
+                  f"in {time.perf_counter() - started:.1f}s")
+
+        teacher = User.query.filter_by(role='teacher').order_by(User.id).first()
+        busy = db.select(Reservation.user_id).where(Reservation.status == 'pending')
+        free_students = User.query.filter(User.role == 'student', User.id.not_in(busy)).order_by(User.id).all()
+        if teacher is None or not free_students:
+            sys.exit("The dataset needs a teacher and at least one student without a pending reservation")
+
+        context = {
+            'books': db.session.query(db.func.max(Book.id)).scalar(),
+            'teacher_token': create_access_token(identity=str(teacher.id)),
+            'free_students': [
+                {'username': user.username, 'token': create_access_token(identity=str(user.id))}
+                for user in free_students[:args.clients]
+            ],
+        }
+        backend = db.engine.dialect.name
+
+    # One access-log line per request would dominate the run
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_port}"
+
+    results = {
+        'meta': {
+            'timestamp': datetime.utcnow().isoformat(timespec='seconds') + 'Z',
+            'git_revision': git_revision(),
+            'database': backend,
+            'books': args.books,
+            'reservations': reservations,
+            'users': args.users,
+            'clients': args.clients,
+            'duration_s': args.duration,
+            'python': platform.python_version(),
+            'cpus': os.cpu_count(),
+        },
+        'scenarios': {},
+    }
+
+    print(f"{backend}, {args.clients} clients, {args.duration:g}s per scenario")
+    print(f"  {'scenario':<24} {'req/s':>8} {'p50':>8} {'p95':>8} {'p99':>8} {'errors':>7}")
+    try:
+        for name in scenarios:
+            clients = [Client(base_url, context, i) for i in range(args.clients)]
+            stats = run_scenario(name, clients, args.duration)
+            results['scenarios'][name] = stats
+            print(f"  {name:<24} {stats['throughput_rps']:>8.1f} {stats['p50_ms']:>6.1f}ms "
+                  f"{stats['p95_ms']:>6.1f}ms {stats['p99_ms']:>6.1f}ms {stats['errors']:>7}")
+    finally:
+        server.shutdown()
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.max_regression)
+        if regressions:
+            print(f"\nRegressions beyond {args.max_regression:.0%} against {args.baseline}:")
+            for regression in regressions:
+                print(f"  {regression}")
+            sys.exit(1)
+        print(f"\nNo regressions beyond {args.max_regression:.0%} against {args.baseline}")
+
+
+if __name__ == '__main__':
+    main()
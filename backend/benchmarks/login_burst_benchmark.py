@@ -0,0 +1,191 @@
+"""Measure /api/books latency while a burst of logins hits gunicorn sync workers.
+
+Each scenario starts gunicorn with the shipped gunicorn.conf.py (sync
+workers, one request each) against the same SQLite file. Reader threads
+request /api/books?limit=20 while the logins run, and the benchmark reports
+p50/p99 read latency with no logins, with no bcrypt limit
+(BCRYPT_MAX_CONCURRENT=0), with the host-wide limit, and with the limit
+behind admission control (logins shed with 429/503 are counted). Run from
+the backend directory:
+
+    python -m benchmarks.login_burst_benchmark --logins 30 --readers 4 --workers 4
+"""
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import Counter
+
+HOST = '127.0.0.1'
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind((HOST, 0))
+        return sock.getsockname()[1]
+
+
+def wait_until_ready(url, process, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            sys.exit(f"gunicorn exited with status {process.returncode}")
+        try:
+            with urllib.request.urlopen(url, timeout=5):
+                return
+        except OSError:
+            time.sleep(0.05)
+    sys.exit('gunicorn did not become ready')
+
+
+def post_json(url, body):
+    request = urllib.request.Request(url, data=json.dumps(body).encode(),
+                                     headers={'Content-Type': 'application/json'})
+    try:
+        with urllib.request.urlopen(request) as response:
+            return response.status
+    except urllib.error.HTTPError as e:
+        return e.code
+
+
+def run_scenario(base, logins, readers, read_seconds):
+    stop = threading.Event()
+    latencies = []
+    statuses = Counter()
+    lock = threading.Lock()
+
+    def reader():
+        while not stop.is_set():
+            start = time.perf_counter()
+            with urllib.request.urlopen(f'{base}/api/books?limit=20') as response:
+                response.read()
+            elapsed = (time.perf_counter() - start) * 1000
+            with lock:
+                latencies.append(elapsed)
+
+    def login(index):
+        status = post_json(f'{base}/api/auth/login', {'username': f'burst{index}', 'password': 'password123'})
+        # 429/503 when admission control sheds the login
+        assert status in (200, 429, 503), status
+        with lock:
+            statuses[status] += 1
+
+    reader_threads = [threading.Thread(target=reader) for _ in range(readers)]
+    for thread in reader_threads:
+        thread.start()
+
+    start = time.perf_counter()
+    if logins:
+        login_threads = [threading.Thread(target=login, args=(i,)) for i in range(logins)]
+        for thread in login_threads:
+            thread.start()
+        for thread in login_threads:
+            thread.join()
+    else:
+        time.sleep(read_seconds)
+    burst_seconds = time.perf_counter() - start
+
+    stop.set()
+    for thread in reader_threads:
+        thread.join()
+
+    return {
+        'reads': len(latencies),
+        'p50_ms': round(statistics.median(latencies), 2),
+        'p99_ms': round(percentile(latencies, 99), 2),
+        'burst_s': round(burst_seconds, 2),
+        'logins': dict(sorted(statuses.items())),
+    }
+
+
+def serve(env, workers, logins, readers, read_seconds):
+    """Run one scenario against a fresh gunicorn"""
+    port = free_port()
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', '--workers', str(workers),
+         '--bind', f'{HOST}:{port}'],
+        env=dict(env, ADMISSION_WORKERS=str(workers)), stderr=subprocess.DEVNULL
+    )
+    try:
+        base = f'http://{HOST}:{port}'
+        wait_until_ready(f'{base}/api/health', process)
+        return run_scenario(base, logins, readers, read_seconds)
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--logins', type=int, default=30)
+    parser.add_argument('--readers', type=int, default=4)
+    parser.add_argument('--workers', type=int, default=2 * (os.cpu_count() or 1) + 1,
+                        help='gunicorn sync workers (default: as gunicorn.conf.py)')
+    parser.add_argument('--max-concurrent', type=int, default=max(1, (os.cpu_count() or 2) // 2),
+                        help='BCRYPT_MAX_CONCURRENT for the limited scenarios')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='login-bench-')
+    env = dict(
+        os.environ,
+        DATABASE_URL=f"sqlite:///{os.path.join(workdir, 'bench.db')}",
+        CATALOG_VERSION_FILE=os.path.join(workdir, 'catalog_version'),
+        BCRYPT_LOCK_DIR=os.path.join(workdir, 'bcrypt'),
+        PROMETHEUS_MULTIPROC_DIR=os.path.join(workdir, 'metrics'),
+        SENTRY_DSN='',
+        SENTRY_TRACES_SAMPLE_RATE='0',
+        SENTRY_PROFILE_SAMPLE_RATE='0',
+    )
+    os.makedirs(env['PROMETHEUS_MULTIPROC_DIR'])
+    os.environ.update(env)
+
+    from app import app, init_db
+    from models import db, Book, User
+    import passwords
+
+    init_db(app)
+
+    with app.app_context():
+        password_hash = passwords.hash_password('password123')
+        db.session.execute(db.insert(User), [
+            {'username': f'burst{i}', 'email': f'burst{i}@example.com', 'full_name': f'Burst {i}',
+             'role': 'student', 'password_hash': password_hash, 'active': True}
+            for i in range(args.logins)
+        ])
+        db.session.execute(db.insert(Book), [
+            {'title': f'Book {i}', 'author': 'Author', 'genre': 'Fiction', 'year': 2000,
+             'isbn': f'burst-{i}', 'description': 'x' * 200}
+            for i in range(500)
+        ])
+        db.session.commit()
+
+    print(f"bcrypt cost {app.config['BCRYPT_LOG_ROUNDS']}, {args.logins} logins, {args.readers} reader threads, "
+          f"{args.workers} gunicorn sync workers, {os.cpu_count()} CPUs")
+
+    limited = {'BCRYPT_MAX_CONCURRENT': str(args.max_concurrent)}
+    scenarios = [
+        ('no logins', {}, 0),
+        ('no bcrypt limit', {'BCRYPT_MAX_CONCURRENT': '0', 'ADMISSION_CONTROL_ENABLED': 'false'}, args.logins),
+        (f'limit={args.max_concurrent}', dict(limited, ADMISSION_CONTROL_ENABLED='false'), args.logins),
+        ('limit + admission', dict(limited, ADMISSION_CONTROL_ENABLED='true'), args.logins),
+    ]
+    for label, settings, logins in scenarios:
+        result = serve(dict(env, **settings), args.workers, logins, args.readers, read_seconds=2)
+        print(f"  {label:<19} {result}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,219 @@
+"""Measure catalog read throughput while reservations are being written.
+
+Reader and writer processes (like gunicorn workers) share one database.
+Readers run the catalog listing query. Each writer reserves a random book
+and then cancels it, in two short transactions, like the reservation
+endpoints. Every engine profile runs twice: once with readers alone, then
+with the writers as well. The report shows reads/s, read p95, writes/s and
+"database is locked" failures.
+
+On SQLite, Config's tuned settings (WAL, synchronous=NORMAL, busy_timeout,
+mmap, cache) are compared with SQLite's defaults (rollback journal,
+synchronous=FULL). Against another database only the Config profile runs.
+Run from the backend directory:
+
+    python -m benchmarks.read_write_benchmark --books 50000 --readers 4 --writers 2 --duration 5
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import tempfile
+import time
+from datetime import datetime
+
+# SQLite's own defaults, with pysqlite's 5 second lock timeout
+PROFILES = {
+    'sqlite-defaults': {
+        'SQLITE_JOURNAL_MODE': 'DELETE', 'SQLITE_SYNCHRONOUS': 'FULL', 'SQLITE_BUSY_TIMEOUT_MS': 5000,
+        'SQLITE_MMAP_SIZE': 0, 'SQLITE_CACHE_SIZE_KB': 2000,
+    },
+    'config': {},
+}
+
+
+def make_engine(url, config):
+    from sqlalchemy import create_engine
+    from database import engine_options, init_engine
+
+    config = dict(config, SQLALCHEMY_DATABASE_URI=url)
+    engine = create_engine(url, **engine_options(config))
+    init_engine(engine, config)
+    return engine
+
+
+def is_locked(exc):
+    return 'locked' in str(exc) or 'busy' in str(exc)
+
+
+def reader(url, config, genres, duration, seed, start, results):
+    from sqlalchemy import select
+    from sqlalchemy.exc import OperationalError
+    from models import Book
+
+    engine = make_engine(url, config)
+    rng = random.Random(seed)
+    latencies = []
+    errors = 0
+    start.wait()
+    deadline = time.perf_counter() + duration
+    while time.perf_counter() < deadline:
+        query = (select(Book.__table__).where(Book.genre == rng.choice(genres), Book.available)
+                 .order_by(Book.title, Book.id).limit(50))
+        began = time.perf_counter()
+        try:
+            with engine.connect() as conn:
+                conn.execute(query).all()
+        except OperationalError as exc:
+            if not is_locked(exc):
+                raise
+            errors += 1
+            continue
+        latencies.append(time.perf_counter() - began)
+    results.put(('read', latencies, errors))
+
+
+def writer(url, config, student, book_count, duration, seed, start, results):
+    from sqlalchemy import insert, update
+    from sqlalchemy.exc import OperationalError
+    from models import Book, Reservation
+
+    engine = make_engine(url, config)
+    rng = random.Random(seed)
+    user_id, name, email = student
+    latencies = []
+    errors = 0
+    start.wait()
+    deadline = time.perf_counter() + duration
+    while time.perf_counter() < deadline:
+        book_id = rng.randint(1, book_count)
+        began = time.perf_counter()
+        try:
+            with engine.begin() as conn:
+                taken = conn.execute(
+                    update(Book).where(Book.id == book_id, Book.available_copies > 0)
+                    .values(available_copies=Book.available_copies - 1)
+                ).rowcount
+                if not taken:
+                    continue
+                now = datetime.utcnow()
+                reservation_id = conn.execute(insert(Reservation).values(
+                    book_id=book_id, user_id=user_id, user_name=name, user_email=email, user_role='student',
+                    status='pending', reservation_date=now, created_at=now
+                )).inserted_primary_key[0]
+            with engine.begin() as conn:
+                conn.execute(update(Reservation).where(Reservation.id == reservation_id).values(status='cancelled'))
+                conn.execute(update(Book).where(Book.id == book_id)
+                             .values(available_copies=Book.available_copies + 1))
+        except OperationalError as exc:
+            if not is_locked(exc):
+                raise
+            errors += 1
+            continue
+        latencies.append(time.perf_counter() - began)
+    results.put(('write', latencies, errors))
+
+
+def run(url, config, readers, writers, students, genres, book_count, duration):
+    context = multiprocessing.get_context('spawn')
+    start = context.Event()
+    results = context.Queue()
+    processes = [
+        context.Process(target=reader, args=(url, config, genres, duration, i, start, results))
+        for i in range(readers)
+    ] + [
+        context.Process(target=writer, args=(url, config, students[i], book_count, duration, 1000 + i, start, results))
+        for i in range(writers)
+    ]
+    for process in processes:
+        process.start()
+    # Let every process import and connect before the clock starts
+    time.sleep(2)
+    start.set()
+
+    totals = {'read': ([], 0), 'write': ([], 0)}
+    for _ in processes:
+        kind, latencies, errors = results.get()
+        all_latencies, all_errors = totals[kind]
+        totals[kind] = (all_latencies + latencies, all_errors + errors)
+    for process in processes:
+        process.join()
+    return totals
+
+
+def p95_ms(latencies):
+    if not latencies:
+        return 0.0
+    latencies = sorted(latencies)
+    return latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--books', type=int, default=50000)
+    parser.add_argument('--readers', type=int, default=4)
+    parser.add_argument('--writers', type=int, default=2)
+    parser.add_argument('--duration', type=float, default=5, help='seconds per run')
+    parser.add_argument('--database-url', help='an empty, throwaway database (default: a temporary SQLite file)')
+    args = parser.parse_args()
+
+    if args.database_url:
+        url = args.database_url
+    else:
+        workdir = tempfile.mkdtemp(prefix='read-write-bench-')
+        url = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    os.environ['DATABASE_URL'] = url
+    os.environ.setdefault('SENTRY_TRACES_SAMPLE_RATE', '0')
+    os.environ.setdefault('SENTRY_PROFILE_SAMPLE_RATE', '0')
+
+    from app import app, init_db
+    from models import db, Book, Reservation, User
+    import generate_data
+
+    init_db(app)
+
+    with app.app_context():
+        with db.engine.connect() as conn:
+            generate_data.generate(
+                conn, args.books, users=max(100, args.writers), teachers=1, reservations=args.books,
+                pending=0, years=1, seed=42, anchor=datetime.utcnow(), password='password123', rounds=4,
+                batch_size=20000
+            )
+        busy = db.select(Reservation.user_id).where(Reservation.status == 'pending')
+        students = db.session.execute(
+            db.select(User.id, User.full_name, User.email)
+            .where(User.role == 'student', User.id.not_in(busy)).order_by(User.id).limit(args.writers)
+        ).all()
+        students = [tuple(student) for student in students]
+        book_count = db.session.query(db.func.max(Book.id)).scalar()
+        config = {key: value for key, value in app.config.items() if key.isupper()}
+        backend = db.engine.dialect.name
+        db.session.remove()
+        db.engine.dispose()
+
+    genres = [genre for genre, _ in generate_data.GENRES]
+    profiles = PROFILES if backend == 'sqlite' else {'config': {}}
+
+    print(f"{backend}, {args.books} books, {args.readers} readers, {args.writers} writers, "
+          f"{args.duration:g}s per run, {os.cpu_count()} CPUs")
+    print(f"  {'profile':<16} {'writers':>7} {'reads/s':>9} {'read p95':>9} {'writes/s':>9} "
+          f"{'write p95':>10} {'locked':>7}")
+    for name, overrides in profiles.items():
+        profile = dict(config, **overrides)
+        if backend == 'sqlite':
+            # Switch the file's journal mode up front, not in a race between workers
+            engine = make_engine(url, profile)
+            with engine.connect():
+                pass
+            engine.dispose()
+
+        for writers in (0, args.writers):
+            totals = run(url, profile, args.readers, writers, students, genres, book_count, args.duration)
+            reads, read_errors = totals['read']
+            writes, write_errors = totals['write']
+            print(f"  {name:<16} {writers:>7} {len(reads) / args.duration:>9.1f} {p95_ms(reads):>7.1f}ms "
+                  f"{len(writes) / args.duration:>9.1f} {p95_ms(writes):>8.1f}ms {read_errors + write_errors:>7}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+"""Hammer POST /api/reservations from many threads and check for double-booking.
+
+For each concurrency level, every thread plays a different student who tries
+to reserve random books from a small shared pool (so most attempts collide)
+and then a second book (which the one-pending-per-student rule must reject).
+Reports successful reservations per second and verifies afterwards that no
+book has more than one pending reservation and no student has more than one.
+Run from the backend directory:
+
+    python -m benchmarks.reservation_contention_benchmark --books 20 --levels 1,2,4,8,16
+"""
+import argparse
+import os
+import random
+import tempfile
+import threading
+import time
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--books', type=int, default=20)
+    parser.add_argument('--attempts', type=int, default=10, help='reservation attempts per thread')
+    parser.add_argument('--levels', default='1,2,4,8,16')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='reservation-bench-')
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    # Measure the reservation path itself, not the burst limits in front of it
+    os.environ.setdefault('ADMISSION_CONTROL_ENABLED', 'false')
+    # Keep benchmark runs out of Sentry and free of its per-request overhead
+    os.environ['SENTRY_DSN'] = ''
+    os.environ['SENTRY_TRACES_SAMPLE_RATE'] = '0'
+    os.environ['SENTRY_PROFILE_SAMPLE_RATE'] = '0'
+
+    from flask_jwt_extended import create_access_token
+    from app import app, init_db
+    from models import db, Book, Reservation, User
+    import passwords
+
+    init_db(app)
+
+    levels = [int(level) for level in args.levels.split(',')]
+
+    with app.app_context():
+        password_hash = passwords.hash_password('password123', rounds=4)
+        db.session.execute(db.insert(User), [
+            {'username': f'student{i}', 'email': f'student{i}@example.com', 'full_name': f'Student {i}',
+             'role': 'student', 'password_hash': password_hash, 'active': True}
+            for i in range(max(levels))
+        ])
+        db.session.commit()
+        tokens = [create_access_token(identity=str(user.id)) for user in User.query.order_by(User.id)]
+
+    print(f"{args.books} books, {args.attempts} attempts per thread")
+
+    for level in levels:
+        with app.app_context():
+            Reservation.query.delete()
+            Book.query.delete()
+            db.session.execute(db.insert(Book), [
+                {'title': f'Book {i}', 'author': 'Author', 'genre': 'Fiction', 'year': 2000,
+                 'isbn': f'contention-{i}', 'description': 'x', 'total_copies': 1, 'available_copies': 1}
+                for i in range(args.books)
+            ])
+            db.session.commit()
+            book_ids = [book_id for (book_id,) in db.session.query(Book.id)]
+
+        counts = {'created': 0, 'conflict': 0, 'error': 0}
+        lock = threading.Lock()
+        barrier = threading.Barrier(level)
+
+        def student(token):
+            client = app.test_client()
+            headers = {'Authorization': f'Bearer {token}'}
+            rng = random.Random(token)
+            barrier.wait()
+            for _ in range(args.attempts):
+                response = client.post('/api/reservations', headers=headers,
+                                       json={'book_id': rng.choice(book_ids)})
+                key = {201: 'created', 400: 'conflict'}.get(response.status_code, 'error')
+                with lock:
+                    counts[key] += 1
+
+        threads = [threading.Thread(target=student, args=(tokens[i],)) for i in range(level)]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+
+        with app.app_context():
+            pending = Reservation.query.filter_by(status='pending').all()
+            per_book = {}
+            per_student = {}
+            for reservation in pending:
+                per_book[reservation.book_id] = per_book.get(reservation.book_id, 0) + 1
+                per_student[reservation.user_id] = per_student.get(reservation.user_id, 0) + 1
+            unavailable = Book.query.filter(~Book.available).count()
+
+        double_booked = sum(1 for count in per_book.values() if count > 1)
+        over_limit = sum(1 for count in per_student.values() if count > 1)
+        consistent = unavailable == len(pending)
+
+        print(
+            f"  threads={level:<3} {counts['created'] / elapsed:>7.1f} reservations/s"
+            f"   {(counts['created'] + counts['conflict']) / elapsed:>7.1f} requests/s"
+            f"   created={counts['created']} rejected={counts['conflict']} errors={counts['error']}"
+            f"   double-booked={double_booked} students-over-limit={over_limit}"
+            f"   availability-consistent={consistent}"
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+"""Compare catalog search latency: ILIKE '%term%' scan vs. the full-text index.
+
+Run from the backend directory:
+
+    python -m benchmarks.search_benchmark --books 100000
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+
+WORDS = (
+    'dragon wizard river mountain shadow garden winter summer secret journey '
+    'kingdom ocean forest empire silver golden crown storm island letter '
+    'memory promise stranger mirror lantern harbor orchard station voyage echo'
+).split()
+AUTHORS = ['Tolkien', 'Austen', 'Orwell', 'Lewis', 'Rowling', 'Huxley', 'Wilde', 'Melville']
+QUERIES = ['dragon', 'tolk', 'silver crown', 'harbor', 'winter journey', 'zzzz']
+
+
+def build_vocabulary(rng, size):
+    """Themed words plus pronounceable filler so each term matches a realistic fraction of rows"""
+    syllables = ['ka', 'lo', 'mi', 'ren', 'tha', 'vor', 'es', 'qui', 'dun', 'sel', 'an', 'bri']
+    vocabulary = set(WORDS)
+    while len(vocabulary) < size:
+        vocabulary.add(''.join(rng.choice(syllables) for _ in range(rng.randint(2, 4))))
+    return sorted(vocabulary)
+
+
+def build_dataset(db, Book, count, seed=42):
+    rng = random.Random(seed)
+    vocabulary = build_vocabulary(rng, 20000)
+    rows = []
+    for i in range(count):
+        rows.append({
+            'title': ' '.join(rng.choice(vocabulary) for _ in range(3)).title(),
+            'author': f"{rng.choice(AUTHORS)} {i % 997}",
+            'genre': rng.choice(['Fiction', 'Fantasy', 'Dystopian', 'Romance']),
+            'year': rng.randint(1800, 2024),
+            'isbn': f"bench-{i}",
+            'description': ' '.join(rng.choice(vocabulary) for _ in range(40)),
+            'available_copies': 1 if rng.random() < 0.8 else 0,
+        })
+        if len(rows) == 5000:
+            db.session.execute(db.insert(Book), rows)
+            rows = []
+    if rows:
+        db.session.execute(db.insert(Book), rows)
+    db.session.commit()
+
+
+def time_queries(fn, repeats):
+    timings = []
+    for _ in range(repeats):
+        for term in QUERIES:
+            start = time.perf_counter()
+            fn(term)
+            timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    return {
+        'p50_ms': round(statistics.median(timings), 2),
+        'p95_ms': round(timings[int(len(timings) * 0.95) - 1], 2),
+        'max_ms': round(timings[-1], 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--books', type=int, default=100000)
+    parser.add_argument('--repeats', type=int, default=5)
+    parser.add_argument('--limit', type=int, default=50)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='search-bench-')
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    # Keep benchmark runs out of Sentry and free of its per-request overhead
+    os.environ['SENTRY_DSN'] = ''
+    os.environ['SENTRY_TRACES_SAMPLE_RATE'] = '0'
+    os.environ['SENTRY_PROFILE_SAMPLE_RATE'] = '0'
+
+    from app import app, init_db
+    from models import db, Book
+    from search import search_books, search_filter
+
+    init_db(app)
+
+    backend = app.extensions['search_backend']
+
+    with app.app_context():
+        start = time.perf_counter()
+        build_dataset(db, Book, args.books)
+        print(f"Inserted {args.books} books in {time.perf_counter() - start:.1f}s (search backend: {backend})")
+
+        def ilike(term):
+            Book.query.filter(search_filter('ilike', term)).order_by(Book.title, Book.id).limit(args.limit).all()
+
+        def fulltext(term):
+            Book.query.filter(search_filter(backend, term)).order_by(Book.title, Book.id).limit(args.limit).all()
+
+        def ranked(term):
+            search_books(backend, term, args.limit)
+
+        for name, fn in [('ilike', ilike), ('fulltext filter', fulltext), ('fulltext ranked', ranked)]:
+            fn(QUERIES[0])  # warm caches
+            print(f"  {name:<16} {time_queries(fn, args.repeats)}")
+
+
+if __name__ == '__main__':
+    main()
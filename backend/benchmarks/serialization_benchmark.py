@@ -0,0 +1,115 @@
+"""Payload size and serialization time of GET /api/books with and without sparse fieldsets.
+
+Compares, at the same row count:
+  * the old path: every column, per-object isoformat() and the stdlib encoder
+  * every column through the fast JSON provider
+  * a card-grid projection (fields=title,author,cover,available) through it
+
+Load time is the ORM query alone (load_only applies to the sparse case);
+serialize time is to_dict() plus encoding. Run from the backend directory:
+
+    python -m benchmarks.serialization_benchmark --books 10000
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+
+CARD_FIELDS = ['id', 'title', 'author', 'cover', 'available']
+
+
+def median_ms(fn, repeats):
+    timings = []
+    result = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--books', type=int, default=10000)
+    parser.add_argument('--repeats', type=int, default=5)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='serialization-bench-')
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    # Keep benchmark runs out of Sentry and free of its per-request overhead
+    os.environ['SENTRY_DSN'] = ''
+    os.environ['SENTRY_TRACES_SAMPLE_RATE'] = '0'
+    os.environ['SENTRY_PROFILE_SAMPLE_RATE'] = '0'
+
+    from flask.json.provider import DefaultJSONProvider
+    from app import app, init_db
+    from models import db, Book
+    from sparse_fields import load_only_fields
+    import json_provider
+
+    init_db(app)
+
+    rng = random.Random(42)
+    words = ['dragon', 'river', 'shadow', 'garden', 'winter', 'journey', 'kingdom', 'ocean', 'letter', 'echo']
+
+    with app.app_context():
+        db.session.execute(db.insert(Book), [
+            {
+                'title': ' '.join(rng.choice(words) for _ in range(3)).title(),
+                'author': f'Author {i % 500}',
+                'genre': rng.choice(['Fiction', 'Fantasy', 'Romance']),
+                'year': rng.randint(1800, 2024),
+                'isbn': f'bench-{i}',
+                # Book blurbs run to a few hundred words
+                'description': ' '.join(rng.choice(words) for _ in range(150)),
+                'cover': f'https://covers.example.com/{i}.jpg',
+                'available_copies': 1 if rng.random() < 0.8 else 0,
+            }
+            for i in range(args.books)
+        ])
+        db.session.commit()
+
+        stdlib = DefaultJSONProvider(app)
+        fast = app.json
+        if not fast.use_orjson:
+            print("orjson is not installed; the fast provider is using the stdlib encoder")
+
+        def load(options=None):
+            db.session.expunge_all()
+            query = Book.query.order_by(Book.title, Book.id)
+            if options is not None:
+                query = query.options(options)
+            return query.all()
+
+        def old_to_dict(book):
+            data = book.to_dict()
+            data['created_at'] = data['created_at'].isoformat() if data['created_at'] else None
+            return data
+
+        full_load_ms, books = median_ms(load, args.repeats)
+        sparse_load_ms, sparse_books = median_ms(
+            lambda: load(load_only_fields(Book, CARD_FIELDS)), args.repeats
+        )
+
+        cases = [
+            ('all fields, stdlib json', full_load_ms,
+             lambda: stdlib.dumps([old_to_dict(book) for book in books], separators=(',', ':'))),
+            ('all fields, fast provider', full_load_ms,
+             lambda: fast.dumps([book.to_dict() for book in books])),
+            ('fields=title,author,cover,available', sparse_load_ms,
+             lambda: fast.dumps([book.to_dict(CARD_FIELDS) for book in sparse_books])),
+        ]
+
+        print(f"{args.books} books, median of {args.repeats} runs "
+              f"(JSON_PROVIDER={'orjson' if json_provider.orjson and fast.use_orjson else 'json'})")
+        print(f"  {'case':<38} {'payload':>10} {'load':>10} {'serialize':>10}")
+        for name, load_ms, serialize in cases:
+            serialize_ms, body = median_ms(serialize, args.repeats)
+            print(f"  {name:<38} {len(body.encode('utf-8')) / 1024:>8.0f}KB "
+                  f"{load_ms:>8.1f}ms {serialize_ms:>8.1f}ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,154 @@
+"""Measure cold-start time and per-worker memory of the app under gunicorn.
+
+Cold start: fresh interpreters that import the app and build it with
+create_app(), then serve a first request in-process, with Sentry on (the
+default DSN, which never connects here) and off. Workers: gunicorn with and
+without preload_app, where each worker serves a few requests before its
+memory is read. RSS counts pages shared with the master, so the report also
+gives each worker's private (unshared) memory and the proportional set size
+of the whole process tree, which is what the host actually pays. Linux only,
+because memory is read from /proc. Run from the backend directory:
+
+    python -m benchmarks.startup_benchmark --runs 5 --workers 4
+"""
+import argparse
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+HOST = '127.0.0.1'
+
+COLD_START = """
+import time
+started = time.perf_counter()
+from app import create_app
+app = create_app()
+ready = time.perf_counter()
+with app.test_client() as client:
+    assert client.get('/api/books/1').status_code == 200
+served = time.perf_counter()
+print(ready - started, served - ready)
+"""
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind((HOST, 0))
+        return sock.getsockname()[1]
+
+
+def children(pid):
+    pids = []
+    for task in os.listdir(f'/proc/{pid}/task'):
+        with open(f'/proc/{pid}/task/{task}/children') as f:
+            pids.extend(int(child) for child in f.read().split())
+    return pids
+
+
+def memory_mb(pid):
+    """(RSS, private, PSS) of one process, in MiB"""
+    fields = {}
+    with open(f'/proc/{pid}/smaps_rollup') as f:
+        for line in f:
+            name, _, value = line.partition(':')
+            if value.strip().endswith('kB'):
+                fields[name] = int(value.split()[0])
+    private = fields['Private_Clean'] + fields['Private_Dirty']
+    return fields['Rss'] / 1024, private / 1024, fields['Pss'] / 1024
+
+
+def cold_start(env, runs):
+    timings = []
+    for _ in range(runs):
+        began = time.perf_counter()
+        output = subprocess.run([sys.executable, '-c', COLD_START], env=env, check=True,
+                                capture_output=True, text=True).stdout
+        total = time.perf_counter() - began
+        ready, first_request = (float(value) for value in output.split()[-2:])
+        timings.append((total, ready, first_request))
+    return [statistics.median(column) for column in zip(*timings)]
+
+
+def wait_until_ready(port, process, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            sys.exit(f"gunicorn exited with status {process.returncode}")
+        try:
+            with urllib.request.urlopen(f'http://{HOST}:{port}/api/books/1', timeout=5) as response:
+                if response.status == 200:
+                    return
+        except OSError:
+            pass
+        time.sleep(0.05)
+    sys.exit('gunicorn did not become ready')
+
+
+def workers(env, count, preload):
+    port = free_port()
+    command = [sys.executable, '-m', 'gunicorn', '--workers', str(count), '--bind', f'{HOST}:{port}',
+               'app:create_app()']
+    env = dict(env, GUNICORN_PRELOAD='true' if preload else 'false')
+    began = time.perf_counter()
+    process = subprocess.Popen(command, env=env, stderr=subprocess.DEVNULL)
+    try:
+        wait_until_ready(port, process)
+        ready = time.perf_counter() - began
+        # Sync workers close every connection, so these spread over all workers
+        for i in range(count * 25):
+            with urllib.request.urlopen(f'http://{HOST}:{port}/api/books/{i % 50 + 1}') as response:
+                response.read()
+        master = memory_mb(process.pid)
+        worker_memory = [memory_mb(pid) for pid in children(process.pid)]
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+
+    total_pss = master[2] + sum(pss for _, _, pss in worker_memory)
+    return (ready, master[0], statistics.mean(rss for rss, _, _ in worker_memory),
+            statistics.mean(private for _, private, _ in worker_memory), total_pss)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5, help='cold starts to take the median of')
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--books', type=int, default=1000)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='startup-bench-')
+    env = dict(
+        os.environ,
+        DATABASE_URL=f"sqlite:///{os.path.join(workdir, 'bench.db')}",
+        CATALOG_VERSION_FILE=os.path.join(workdir, 'catalog_version'),
+        PROMETHEUS_MULTIPROC_DIR=os.path.join(workdir, 'metrics'),
+        SENTRY_TRACES_SAMPLE_RATE='0',
+        SENTRY_PROFILE_SAMPLE_RATE='0',
+        BCRYPT_MAX_CONCURRENT='0',
+    )
+    os.makedirs(env['PROMETHEUS_MULTIPROC_DIR'])
+    subprocess.run([sys.executable, '-m', 'generate_data', '--books', str(args.books), '--users', '50',
+                    '--teachers', '5', '--reservations', '100', '--pending', '0', '--bcrypt-rounds', '4'],
+                   env=env, check=True, stdout=subprocess.DEVNULL)
+
+    print(f"Cold start (median of {args.runs}, {os.cpu_count()} CPUs)")
+    print(f"  {'sentry':<10} {'import + create_app':>20} {'first request':>14} {'process total':>14}")
+    for name, sentry_env in (('on', {}), ('off', {'SENTRY_DSN': ''})):
+        total, ready, first_request = cold_start(dict(env, **sentry_env), args.runs)
+        print(f"  {name:<10} {ready * 1000:>18.0f}ms {first_request * 1000:>12.0f}ms {total * 1000:>12.0f}ms")
+
+    print(f"\ngunicorn, {args.workers} sync workers")
+    print(f"  {'mode':<10} {'ready':>8} {'master RSS':>11} {'worker RSS':>11} {'private':>9} {'total PSS':>10}")
+    for preload in (False, True):
+        ready, master, rss, private, pss = workers(env, args.workers, preload)
+        print(f"  {'preload' if preload else 'no preload':<10} {ready * 1000:>6.0f}ms {master:>9.1f}MB "
+              f"{rss:>9.1f}MB {private:>7.1f}MB {pss:>8.1f}MB")
+
+
+if __name__ == '__main__':
+    main()
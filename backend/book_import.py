@@ -0,0 +1,266 @@
+import json
+from sqlalchemy.exc import IntegrityError
+from models import db, Book
+from enrichment import cached_metadata, enqueue_enrichment, fill_from_metadata, missing_fields, with_placeholders
+from google_books import clean_isbn
+
+REQUIRED_FIELDS = ['title', 'author', 'genre', 'year', 'isbn', 'description']
+
+# Mirrors the String lengths declared on Book
+MAX_LENGTHS = {
+    'title': 200,
+    'author': 100,
+    'genre': 50,
+    'isbn': 20,
+    'cover': 500,
+    'room_number': 20,
+}
+
+
+def isbn_error(isbn):
+    """Why `isbn` (a value from a request body) cannot be used, or None"""
+    if isbn is None:
+        return 'Missing required field: isbn'
+    if not isinstance(isbn, str):
+        # Numbers would lose leading zeros and cannot carry a check digit of X
+        return 'isbn must be a string'
+    if not isbn.strip():
+        return 'isbn must not be empty'
+    return None
+
+
+def normalize_isbn(isbn):
+    """`isbn` as stored and compared: a valid ISBN (see isbn_error) without surrounding whitespace"""
+    return isbn.strip()
+
+
+def validate_book_row(row):
+    """Validate one incoming book. Returns (values, error); exactly one is None."""
+    if not isinstance(row, dict):
+        return None, 'Row must be a JSON object'
+
+    # First, so a bad ISBN is reported as such rather than as the fields it would have filled
+    error = isbn_error(row.get('isbn'))
+    if error:
+        return None, error
+
+    for field in REQUIRED_FIELDS:
+        if row.get(field) is None:
+            return None, f'Missing required field: {field}'
+
+    try:
+        year = int(row['year'])
+    except (TypeError, ValueError):
+        return None, 'year must be an integer'
+
+    total_copies = row.get('total_copies', 1)
+    if isinstance(total_copies, bool) or not isinstance(total_copies, int) or total_copies < 1:
+        return None, 'total_copies must be a positive integer'
+
+    values = {
+        'title': str(row['title']),
+        'author': str(row['author']),
+        'genre': str(row['genre']),
+        'year': year,
+        'isbn': normalize_isbn(row['isbn']),
+        'description': str(row['description']),
+        'cover': str(row.get('cover') or ''),
+        'room_number': str(row.get('room_number') or ''),
+        'total_copies': total_copies,
+        'available_copies': total_copies,
+        'metadata_status': None,
+    }
+
+    for field, max_length in MAX_LENGTHS.items():
+        if len(values[field]) > max_length:
+            return None, f'{field} must be at most {max_length} characters'
+
+    return values, None
+
+
+def parse_ndjson(stream):
+    """Yield one parsed row per non-blank line; undecodable lines yield an exception instance"""
+    for line in stream:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError as e:
+            yield ValueError(f'Invalid JSON: {e}')
+
+
+def limit_rows(rows, max_rows):
+    """Pass through the first max_rows rows and reject the rest"""
+    for count, row in enumerate(rows):
+        yield row if count < max_rows else ValueError(f'Row limit of {max_rows} exceeded')
+
+
+def chunked(iterable, size):
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+class BookImport:
+    """Validates and ingests books in chunks, collecting a per-row report.
+
+    Each chunk costs one IN (...) lookup for existing ISBNs, one executemany
+    INSERT for new rows, one executemany UPDATE for upserts, and one commit.
+    Rows that carry only an ISBN are filled from isbn_metadata (one more IN
+    query); cache misses are inserted as 'pending' and looked up upstream in
+    the background after the commit.
+    """
+
+    def __init__(self, upsert=False, chunk_size=1000):
+        self.upsert = upsert
+        self.chunk_size = chunk_size
+        self.results = []
+        self.summary = {'created': 0, 'updated': 0, 'skipped_duplicate': 0, 'invalid': 0, 'failed': 0}
+        self._seen_isbns = set()
+
+    def _record(self, index, status, isbn=None, book_id=None, error=None, metadata_status=None):
+        result = {'index': index, 'status': status}
+        if isbn is not None:
+            result['isbn'] = isbn
+        if book_id is not None:
+            result['id'] = book_id
+        if error is not None:
+            result['error'] = error
+        if metadata_status is not None:
+            result['metadata_status'] = metadata_status
+        self.results.append(result)
+        self.summary[status] += 1
+
+    def _enrich_rows(self, chunk):
+        """Fill ISBN-only rows from isbn_metadata.
+
+        Returns {index: (row, fields still to look up upstream, fields provided)};
+        rows that are invalid for lookup purposes are passed through untouched.
+        """
+        incomplete = [
+            row['isbn'] for _, row in chunk
+            if isinstance(row, dict) and isbn_error(row.get('isbn')) is None and missing_fields(row)
+        ]
+        metadata = cached_metadata(incomplete) if incomplete else {}
+
+        prepared = {}
+        for index, row in chunk:
+            if not isinstance(row, dict) or isbn_error(row.get('isbn')) is not None or not missing_fields(row):
+                prepared[index] = (row, [], None)
+                continue
+
+            provided = set(row)
+            # Normalized before the placeholders are built from it
+            row = dict(row, isbn=normalize_isbn(row['isbn']))
+            cached = metadata.get(clean_isbn(row['isbn']))
+            if cached is not None and not cached.found:
+                prepared[index] = (ValueError(f"No metadata found for ISBN {row['isbn']}"), [], provided)
+            elif cached is not None:
+                prepared[index] = (fill_from_metadata(row, cached), [], provided)
+            else:
+                fields = missing_fields(row, include_optional=True)
+                prepared[index] = (with_placeholders(row), fields, provided)
+        return prepared
+
+    def run(self, rows):
+        """Ingest an iterable of raw rows (dicts, or exceptions from parse_ndjson)"""
+        for chunk in chunked(enumerate(rows), self.chunk_size):
+            self._ingest_chunk(chunk)
+        self.results.sort(key=lambda result: result['index'])
+        return self
+
+    def _ingest_chunk(self, chunk):
+        prepared = self._enrich_rows(chunk)
+        enrich = {}
+        provided_fields = {}
+
+        pending = []
+        for index, _ in chunk:
+            row, fields, provided = prepared[index]
+            if isinstance(row, Exception):
+                self._record(index, 'invalid', error=str(row))
+                continue
+
+            values, error = validate_book_row(row)
+            if error:
+                self._record(index, 'invalid', isbn=row.get('isbn') if isinstance(row, dict) else None, error=error)
+                continue
+
+            if values['isbn'] in self._seen_isbns:
+                self._record(index, 'skipped_duplicate', isbn=values['isbn'], error='Duplicate ISBN earlier in request')
+                continue
+
+            self._seen_isbns.add(values['isbn'])
+            if fields:
+                values['metadata_status'] = 'pending'
+                enrich[index] = fields
+            if provided is not None:
+                provided_fields[index] = provided
+            pending.append((index, values))
+
+        if not pending:
+            return
+
+        existing = dict(db.session.execute(
+            db.select(Book.isbn, Book.id).where(Book.isbn.in_([values['isbn'] for _, values in pending]))
+        ).all())
+
+        to_insert = [(index, values) for index, values in pending if values['isbn'] not in existing]
+        to_update = [(index, values) for index, values in pending if values['isbn'] in existing]
+
+        try:
+            created_ids = {}
+            if to_insert:
+                inserted = db.session.execute(
+                    db.insert(Book).returning(Book.id, Book.isbn),
+                    [values for _, values in to_insert]
+                )
+                created_ids = {isbn: book_id for book_id, isbn in inserted}
+
+            if to_update and self.upsert:
+                # Copy counts belong to the reservation flow and PUT /api/books, so
+                # upserts leave them alone, and ISBN-only rows only overwrite the
+                # fields they sent
+                db.session.execute(
+                    db.update(Book),
+                    [
+                        {
+                            **{
+                                k: v for k, v in values.items()
+                                if k not in ('total_copies', 'available_copies', 'metadata_status')
+                                and (index not in provided_fields or k in provided_fields[index])
+                            },
+                            'id': existing[values['isbn']]
+                        }
+                        for index, values in to_update
+                    ]
+                )
+
+            db.session.commit()
+        except IntegrityError as e:
+            # Another writer inserted one of these ISBNs between the lookup and the insert
+            db.session.rollback()
+            for index, values in pending:
+                self._record(index, 'failed', isbn=values['isbn'], error=f'Conflict while writing chunk: {e.orig}')
+            return
+
+        for index, values in to_insert:
+            book_id = created_ids.get(values['isbn'])
+            if index in enrich:
+                enqueue_enrichment(book_id, values['isbn'], enrich[index])
+            self._record(index, 'created', isbn=values['isbn'], book_id=book_id,
+                         metadata_status=values.get('metadata_status'))
+
+        for index, values in to_update:
+            book_id = existing[values['isbn']]
+            if self.upsert:
+                self._record(index, 'updated', isbn=values['isbn'], book_id=book_id)
+            else:
+                self._record(index, 'skipped_duplicate', isbn=values['isbn'], book_id=book_id,
+                             error='Book with this ISBN already exists')
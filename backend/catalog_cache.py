@@ -0,0 +1,226 @@
+import gzip
+import hashlib
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from flask import Response, current_app, request
+from replicas import served_from_replica
+
+try:
+    import fcntl
+except ImportError:  # Windows: single-process development server only
+    fcntl = None
+
+
+class CatalogVersion:
+    """Catalog version counter shared by every worker through a small file.
+
+    Readers only read the file, so a revalidation never touches the database.
+    Writers bump it under an exclusive lock and swap the file in atomically,
+    so readers never observe a partial write. The counter starts from the
+    current time so a deleted file can never resurrect an old version.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.lock_path = f"{path}.lock"
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+    def current(self):
+        try:
+            with open(self.path) as f:
+                return int(f.read())
+        except (FileNotFoundError, ValueError):
+            return self.bump()
+
+    def bump(self):
+        with open(self.lock_path, 'a') as lock:
+            if fcntl:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                try:
+                    with open(self.path) as f:
+                        version = int(f.read()) + 1
+                except (FileNotFoundError, ValueError):
+                    version = time.time_ns() // 1000
+
+                fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(self.path)))
+                with os.fdopen(fd, 'w') as f:
+                    f.write(str(version))
+                os.replace(tmp_path, self.path)
+                return version
+            finally:
+                if fcntl:
+                    fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def age(self):
+        """Seconds since the version was last bumped"""
+        try:
+            return time.time() - os.stat(self.path).st_mtime
+        except FileNotFoundError:
+            return 0.0
+
+
+class CachedBody:
+    """A serialized response body with a lazily computed gzip variant"""
+
+    def __init__(self, body, mimetype):
+        self.body = body
+        self.mimetype = mimetype
+        self._gzipped = None
+
+    def gzipped(self):
+        if self._gzipped is None:
+            self._gzipped = gzip.compress(self.body, compresslevel=6)
+        return self._gzipped
+
+
+class ResponseCache:
+    """Bounded, thread-safe LRU of serialized responses with hit/miss counters"""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key, entry):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def record_not_modified(self):
+        with self._lock:
+            self.not_modified += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses,
+                'not_modified': self.not_modified,
+            }
+
+
+def init_catalog_cache(app):
+    """Attach the catalog version source and response cache to `app`"""
+    path = app.config.get('CATALOG_VERSION_FILE') or os.path.join(app.instance_path, 'catalog_version')
+    app.extensions['catalog_version'] = CatalogVersion(path)
+    app.extensions['catalog_cache'] = ResponseCache(app.config.get('CATALOG_CACHE_SIZE', 256))
+
+
+def bump_catalog_version():
+    """Invalidate every cached catalog response. Call after committing a catalog change."""
+    return current_app.extensions['catalog_version'].bump()
+
+
+def catalog_cache_stats():
+    return current_app.extensions['catalog_cache'].stats()
+
+
+def _make_etag(version, key, encoding):
+    digest = hashlib.sha1(repr(key).encode('utf-8')).hexdigest()[:16]
+    suffix = '-gz' if encoding == 'gzip' else ''
+    return f"{version:x}-{digest}{suffix}"
+
+
+def _lookup():
+    """Start serving the current catalog request from the cache.
+
+    Returns (version, key, headers, response); the response is a 304 or a
+    cache hit, or None when the view has to render it.
+    """
+    cache = current_app.extensions['catalog_cache']
+    version = current_app.extensions['catalog_version'].current()
+
+    key = (request.path, tuple(sorted(request.args.items(multi=True))))
+    headers = {
+        'ETag': f'"{_make_etag(version, key, None)}"',
+        'Cache-Control': 'no-cache',
+        'Vary': 'Accept-Encoding',
+    }
+
+    # Either encoding of the same version and query is still current
+    for candidate in (_make_etag(version, key, None), _make_etag(version, key, 'gzip')):
+        if request.if_none_match.contains(candidate):
+            cache.record_not_modified()
+            headers['ETag'] = f'"{candidate}"'
+            return version, key, headers, Response(status=304, headers=headers)
+
+    entry = cache.get((version,) + key)
+    return version, key, headers, _serve(version, key, headers, entry) if entry is not None else None
+
+
+def _store(version, key, headers, response):
+    """Cache a response the view rendered on a miss and return what to send"""
+    if response.status_code != 200:
+        return response
+    if (served_from_replica()
+            and current_app.extensions['catalog_version'].age() < current_app.config.get('REPLICA_STICKY_SECONDS', 5)):
+        # A lagging replica may not have this version's writes yet: serve
+        # the body, but neither cache it nor let a client revalidate against it
+        del headers['ETag']
+        return Response(response.get_data(), mimetype=response.mimetype, headers=headers)
+    entry = CachedBody(response.get_data(), response.mimetype)
+    current_app.extensions['catalog_cache'].put((version,) + key, entry)
+    return _serve(version, key, headers, entry)
+
+
+def _serve(version, key, headers, entry):
+    body = entry.body
+    if ('gzip' in request.accept_encodings
+            and len(body) >= current_app.config.get('CATALOG_CACHE_GZIP_MIN_BYTES', 1024)):
+        body = entry.gzipped()
+        headers['Content-Encoding'] = 'gzip'
+        headers['ETag'] = f'"{_make_etag(version, key, "gzip")}"'
+
+    return Response(body, mimetype=entry.mimetype, headers=headers)
+
+
+def catalog_cached(fn):
+    """Serve a catalog GET endpoint from the versioned response cache.
+
+    Responses carry a strong ETag built from the catalog version, the path and
+    the query string, so a matching If-None-Match is answered with 304 before
+    the view (and the database) is reached. Only 200 responses are cached, and
+    not those read from a replica within REPLICA_STICKY_SECONDS of a catalog write.
+    """
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        version, key, headers, response = _lookup()
+        if response is None:
+            response = _store(version, key, headers, current_app.make_response(fn(*args, **kwargs)))
+        return response
+
+    return wrapper
+
+
+def async_catalog_cached(fn):
+    """catalog_cached for a coroutine view returning a Flask response (asgi.py)"""
+    @wraps(fn)
+    async def wrapper(*args, **kwargs):
+        version, key, headers, response = _lookup()
+        if response is None:
+            response = _store(version, key, headers, await fn(*args, **kwargs))
+        return response
+
+    return wrapper
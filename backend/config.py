@@ -9,6 +9,35 @@ class Config:
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or 'sqlite:///library.db'
     SQLALCHEMY_TRACK_MODIFICATIONS = False
 
+    # SQLite: PRAGMAs applied to every new connection. WAL lets readers run
+    # alongside a writer; busy_timeout makes writers queue instead of failing
+    # with "database is locked".
+    SQLITE_JOURNAL_MODE = os.environ.get('SQLITE_JOURNAL_MODE', 'WAL')
+    SQLITE_SYNCHRONOUS = os.environ.get('SQLITE_SYNCHRONOUS', 'NORMAL')
+    SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', 5000))
+    SQLITE_MMAP_SIZE = int(os.environ.get('SQLITE_MMAP_SIZE', 256 * 1024 * 1024))
+    SQLITE_CACHE_SIZE_KB = int(os.environ.get('SQLITE_CACHE_SIZE_KB', 65536))
+
+    # PostgreSQL/MySQL connection pool, per worker process. Pre-ping and
+    # recycle drop connections the server or a proxy has closed. Statements
+    # running longer than DB_STATEMENT_TIMEOUT_MS are cancelled (Postgres; 0 = off).
+    DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 10))
+    DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW', 20))
+    DB_POOL_TIMEOUT = int(os.environ.get('DB_POOL_TIMEOUT', 30))
+    DB_POOL_RECYCLE = int(os.environ.get('DB_POOL_RECYCLE', 1800))
+    DB_POOL_PRE_PING = os.environ.get('DB_POOL_PRE_PING', 'true').lower() == 'true'
+    DB_STATEMENT_TIMEOUT_MS = int(os.environ.get('DB_STATEMENT_TIMEOUT_MS', 30000))
+
+    # Comma-separated read replicas for the catalog GET routes. A user reads
+    # from the primary for REPLICA_STICKY_SECONDS after their own write (keep
+    # it above the replication lag); a failing replica is skipped for
+    # REPLICA_RETRY_SECONDS. The per-user pins must be shared by every worker;
+    # REPLICA_STICKY_DIR defaults to the Flask instance folder.
+    DATABASE_REPLICA_URLS = [url.strip() for url in os.environ.get('DATABASE_REPLICA_URLS', '').split(',') if url.strip()]
+    REPLICA_STICKY_SECONDS = int(os.environ.get('REPLICA_STICKY_SECONDS', 5))
+    REPLICA_STICKY_DIR = os.environ.get('REPLICA_STICKY_DIR')
+    REPLICA_RETRY_SECONDS = int(os.environ.get('REPLICA_RETRY_SECONDS', 30))
+
     # JWT Configuration
     JWT_SECRET_KEY = os.environ.get('JWT_SECRET_KEY') or 'jwt-secret-key-change-in-production'
     JWT_ACCESS_TOKEN_EXPIRES = timedelta(hours=1)
@@ -16,3 +45,106 @@ class Config:
     JWT_TOKEN_LOCATION = ['headers']
     JWT_HEADER_NAME = 'Authorization'
     JWT_HEADER_TYPE = 'Bearer'
+
+    # Keyset pagination for GET /api/books (opt-in via ?limit= / ?cursor=)
+    BOOKS_PAGE_DEFAULT_LIMIT = int(os.environ.get('BOOKS_PAGE_DEFAULT_LIMIT', 50))
+    BOOKS_PAGE_MAX_LIMIT = int(os.environ.get('BOOKS_PAGE_MAX_LIMIT', 200))
+
+    # 'fulltext' uses SQLite FTS5 / Postgres tsvector; 'ilike' keeps the substring scan
+    SEARCH_BACKEND = os.environ.get('SEARCH_BACKEND', 'fulltext')
+
+    # Pending reservations not picked up within this many days are expired
+    RESERVATION_EXPIRY_DAYS = int(os.environ.get('RESERVATION_EXPIRY_DAYS', 3))
+    # How often the in-process sweep expires them and releases their copies
+    # (0 = off, e.g. when `flask expire-reservations` runs from cron). The lock
+    # file, shared by every worker, defaults to the Flask instance folder.
+    RESERVATION_SWEEP_SECONDS = float(os.environ.get('RESERVATION_SWEEP_SECONDS', 60))
+    RESERVATION_SWEEP_LOCK_FILE = os.environ.get('RESERVATION_SWEEP_LOCK_FILE')
+
+    # How long each worker reuses a GET /api/reservations/stats result; any
+    # reservation write invalidates it sooner
+    RESERVATION_STATS_CACHE_SECONDS = float(os.environ.get('RESERVATION_STATS_CACHE_SECONDS', 30))
+
+    # Catalog response cache. The version file must be shared by every worker;
+    # it defaults to the Flask instance folder.
+    CATALOG_VERSION_FILE = os.environ.get('CATALOG_VERSION_FILE')
+    CATALOG_CACHE_SIZE = int(os.environ.get('CATALOG_CACHE_SIZE', 256))
+    CATALOG_CACHE_GZIP_MIN_BYTES = int(os.environ.get('CATALOG_CACHE_GZIP_MIN_BYTES', 1024))
+
+    # POST /api/books/bulk
+    BULK_IMPORT_CHUNK_SIZE = int(os.environ.get('BULK_IMPORT_CHUNK_SIZE', 1000))
+    BULK_IMPORT_MAX_ROWS = int(os.environ.get('BULK_IMPORT_MAX_ROWS', 50000))
+
+    # Request latency, status, SQL and pool metrics at /api/metrics. Set
+    # PROMETHEUS_MULTIPROC_DIR (gunicorn.conf.py does) to aggregate across workers.
+    METRICS_ENABLED = os.environ.get('METRICS_ENABLED', 'true').lower() == 'true'
+
+    # Sentry error reporting, tracing and profiling; an empty SENTRY_DSN turns it off
+    SENTRY_DSN = os.environ.get(
+        'SENTRY_DSN',
+        'https://84bc426841bfd59d35d8790e6955fd00@o4510743534829568.ingest.us.sentry.io/4510743813816320'
+    )
+    SENTRY_TRACES_SAMPLE_RATE = float(os.environ.get('SENTRY_TRACES_SAMPLE_RATE', 1.0))
+    SENTRY_PROFILE_SAMPLE_RATE = float(os.environ.get('SENTRY_PROFILE_SAMPLE_RATE', 1.0))
+
+    # Debug/staging: record each request's SQL, warn about statements repeated
+    # QUERY_REPEAT_THRESHOLD+ times (N+1) and check @query_budget limits.
+    # QUERY_BUDGET_ENFORCE raises QueryBudgetExceeded instead of only logging.
+    QUERY_DEBUG = os.environ.get('QUERY_DEBUG', 'false').lower() == 'true'
+    QUERY_BUDGET_ENFORCE = os.environ.get('QUERY_BUDGET_ENFORCE', 'false').lower() == 'true'
+    QUERY_REPEAT_THRESHOLD = int(os.environ.get('QUERY_REPEAT_THRESHOLD', 3))
+
+    # 'orjson' (when installed) or 'json' for the stdlib encoder
+    JSON_PROVIDER = os.environ.get('JSON_PROVIDER', 'orjson')
+
+    # /api/export/*: rows fetched per server-side cursor batch (and per response chunk)
+    EXPORT_BATCH_SIZE = int(os.environ.get('EXPORT_BATCH_SIZE', 500))
+
+    # Google Books ISBN lookups (seed.py). Point GOOGLE_BOOKS_API_URL at a local
+    # stub in tests; responses are cached per ISBN in GOOGLE_BOOKS_CACHE_DIR.
+    GOOGLE_BOOKS_API_URL = os.environ.get('GOOGLE_BOOKS_API_URL', 'https://www.googleapis.com/books/v1/volumes')
+    GOOGLE_BOOKS_API_KEY = os.environ.get('GOOGLE_BOOKS_API_KEY', '')
+    GOOGLE_BOOKS_RATE_LIMIT = float(os.environ.get('GOOGLE_BOOKS_RATE_LIMIT', 5))
+    GOOGLE_BOOKS_MAX_WORKERS = int(os.environ.get('GOOGLE_BOOKS_MAX_WORKERS', 8))
+    GOOGLE_BOOKS_CACHE_DIR = os.environ.get(
+        'GOOGLE_BOOKS_CACHE_DIR',
+        os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache', 'google_books')
+    )
+
+    # ISBN enrichment for create_book / bulk import: isbn_metadata rows are
+    # trusted for this long before the upstream source is asked again
+    ISBN_METADATA_TTL_DAYS = int(os.environ.get('ISBN_METADATA_TTL_DAYS', 30))
+    ISBN_ENRICHMENT_WORKERS = int(os.environ.get('ISBN_ENRICHMENT_WORKERS', 2))
+
+    # Admission control for login/register ('login') and POST /api/reservations
+    # ('reservations'): requests running at once, how many more may wait (up to
+    # ADMISSION_QUEUE_TIMEOUT_SECONDS) before 503, and token buckets per client
+    # IP and per user (tokens per second and burst; rate 0 = no limit) before
+    # 429. ADMISSION_REDIS_URL shares the state across workers; without it
+    # each of ADMISSION_WORKERS processes (gunicorn.conf.py sets it) gets its
+    # share of the limits, and the concurrency caps and queues only engage in
+    # threaded or async servers.
+    ADMISSION_CONTROL_ENABLED = os.environ.get('ADMISSION_CONTROL_ENABLED', 'true').lower() == 'true'
+    ADMISSION_REDIS_URL = os.environ.get('ADMISSION_REDIS_URL', '')
+    ADMISSION_WORKERS = int(os.environ.get('ADMISSION_WORKERS', 1))
+    ADMISSION_QUEUE_TIMEOUT_SECONDS = float(os.environ.get('ADMISSION_QUEUE_TIMEOUT_SECONDS', 5))
+    ADMISSION_LOGIN_CONCURRENCY = int(os.environ.get('ADMISSION_LOGIN_CONCURRENCY', max(1, (os.cpu_count() or 2) // 2)))
+    ADMISSION_LOGIN_QUEUE = int(os.environ.get('ADMISSION_LOGIN_QUEUE', 20))
+    # A whole class can log in from one school address
+    ADMISSION_LOGIN_IP_RATE = float(os.environ.get('ADMISSION_LOGIN_IP_RATE', 2))
+    ADMISSION_LOGIN_IP_BURST = int(os.environ.get('ADMISSION_LOGIN_IP_BURST', 60))
+    ADMISSION_LOGIN_USER_RATE = float(os.environ.get('ADMISSION_LOGIN_USER_RATE', 0.2))
+    ADMISSION_LOGIN_USER_BURST = int(os.environ.get('ADMISSION_LOGIN_USER_BURST', 5))
+    ADMISSION_RESERVATIONS_CONCURRENCY = int(os.environ.get('ADMISSION_RESERVATIONS_CONCURRENCY', 4))
+    ADMISSION_RESERVATIONS_QUEUE = int(os.environ.get('ADMISSION_RESERVATIONS_QUEUE', 32))
+    ADMISSION_RESERVATIONS_IP_RATE = float(os.environ.get('ADMISSION_RESERVATIONS_IP_RATE', 5))
+    ADMISSION_RESERVATIONS_IP_BURST = int(os.environ.get('ADMISSION_RESERVATIONS_IP_BURST', 100))
+    ADMISSION_RESERVATIONS_USER_RATE = float(os.environ.get('ADMISSION_RESERVATIONS_USER_RATE', 1))
+    ADMISSION_RESERVATIONS_USER_BURST = int(os.environ.get('ADMISSION_RESERVATIONS_USER_BURST', 5))
+
+    # bcrypt cost factor; stored hashes with a different cost are upgraded on login
+    BCRYPT_LOG_ROUNDS = int(os.environ.get('BCRYPT_LOG_ROUNDS', 12))
+    # bcrypt hashes and checks running at once on the whole host, across every
+    # worker (0 = no limit). The slot lock files default to the instance folder.
+    BCRYPT_MAX_CONCURRENT = int(os.environ.get('BCRYPT_MAX_CONCURRENT', max(1, (os.cpu_count() or 2) // 2)))
+    BCRYPT_LOCK_DIR = os.environ.get('BCRYPT_LOCK_DIR')
@@ -0,0 +1,91 @@
+import os
+import weakref
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+
+# Engine settings per backend. SQLite gets its tuning as PRAGMAs on every new
+# DBAPI connection (most of them are per-connection, and journal_mode=WAL is
+# persisted in the file but re-asserting it is free). Server databases get
+# QueuePool sizing and, on PostgreSQL, a server-side statement timeout.
+#
+# Engines are created when the app is built but connect only when first
+# used. If the app is built before a fork (gunicorn --preload) and something
+# did connect, each child starts with a fresh pool: sharing the parent's
+# sockets or SQLite handles between processes corrupts them.
+
+SQLITE_JOURNAL_MODES = {'DELETE', 'TRUNCATE', 'PERSIST', 'MEMORY', 'WAL', 'OFF'}
+SQLITE_SYNCHRONOUS_MODES = {'OFF', 'NORMAL', 'FULL', 'EXTRA'}
+
+_engines = weakref.WeakSet()
+
+
+def _reset_pools_after_fork():
+    for engine in list(_engines):
+        # close=False leaves the parent's connections alone; the child just forgets them
+        engine.dispose(close=False)
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_pools_after_fork)
+
+
+def backend_name(config):
+    return make_url(config['SQLALCHEMY_DATABASE_URI']).get_backend_name()
+
+
+def engine_options(config):
+    """Keyword arguments for create_engine() (SQLALCHEMY_ENGINE_OPTIONS) from Config"""
+    backend = backend_name(config)
+    if backend == 'sqlite':
+        # The default pool suits SQLite; tuning happens in sqlite_pragmas()
+        return {}
+
+    options = {
+        'pool_size': config['DB_POOL_SIZE'],
+        'max_overflow': config['DB_MAX_OVERFLOW'],
+        'pool_timeout': config['DB_POOL_TIMEOUT'],
+        'pool_recycle': config['DB_POOL_RECYCLE'],
+        'pool_pre_ping': config['DB_POOL_PRE_PING'],
+    }
+    if backend == 'postgresql' and config['DB_STATEMENT_TIMEOUT_MS'] > 0:
+        # Passed to libpq at connect time, so it costs no extra round trip
+        options['connect_args'] = {'options': f"-c statement_timeout={config['DB_STATEMENT_TIMEOUT_MS']}"}
+    return options
+
+
+def sqlite_pragmas(config):
+    """PRAGMA statements run on each new SQLite connection, in order"""
+    journal_mode = config['SQLITE_JOURNAL_MODE'].upper()
+    if journal_mode not in SQLITE_JOURNAL_MODES:
+        raise ValueError(f"SQLITE_JOURNAL_MODE must be one of {', '.join(sorted(SQLITE_JOURNAL_MODES))}")
+    synchronous = config['SQLITE_SYNCHRONOUS'].upper()
+    if synchronous not in SQLITE_SYNCHRONOUS_MODES:
+        raise ValueError(f"SQLITE_SYNCHRONOUS must be one of {', '.join(sorted(SQLITE_SYNCHRONOUS_MODES))}")
+
+    return [
+        # First, so switching the journal mode waits out other connections' locks
+        f"PRAGMA busy_timeout = {int(config['SQLITE_BUSY_TIMEOUT_MS'])}",
+        f"PRAGMA journal_mode = {journal_mode}",
+        f"PRAGMA synchronous = {synchronous}",
+        f"PRAGMA mmap_size = {int(config['SQLITE_MMAP_SIZE'])}",
+        # Negative means KiB rather than pages
+        f"PRAGMA cache_size = -{int(config['SQLITE_CACHE_SIZE_KB'])}",
+    ]
+
+
+def init_engine(engine, config):
+    """Apply the per-connection settings engine_options() cannot express and reset the pool after a fork"""
+    _engines.add(engine)
+    if engine.dialect.name != 'sqlite':
+        return
+
+    pragmas = sqlite_pragmas(config)
+
+    @event.listens_for(engine, 'connect')
+    def _set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for pragma in pragmas:
+                cursor.execute(pragma)
+        finally:
+            cursor.close()
@@ -0,0 +1,145 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from flask import current_app
+from models import db, Book, IsbnMetadata
+from google_books import GoogleBooksClient, clean_isbn
+from catalog_cache import bump_catalog_version
+
+# Fields an ISBN lookup can fill in when a teacher leaves them out
+ENRICHED_FIELDS = ['title', 'author', 'genre', 'year', 'description', 'cover']
+
+# Stand-ins for NOT NULL columns while an upstream lookup is still in flight
+PLACEHOLDERS = {
+    'author': '',
+    'genre': 'Unknown',
+    'year': 0,
+    'description': '',
+    'cover': '',
+}
+
+
+def init_enrichment(app):
+    """Attach the upstream client and the background lookup pool to `app`"""
+    app.extensions['isbn_client'] = GoogleBooksClient(
+        base_url=app.config['GOOGLE_BOOKS_API_URL'],
+        api_key=app.config['GOOGLE_BOOKS_API_KEY'],
+        rate_limit=app.config['GOOGLE_BOOKS_RATE_LIMIT'],
+        # isbn_metadata is the persistent store for the API
+        cache_dir=None,
+        max_workers=app.config['ISBN_ENRICHMENT_WORKERS'],
+    )
+    app.extensions['isbn_enrichment_pool'] = ThreadPoolExecutor(
+        max_workers=app.config['ISBN_ENRICHMENT_WORKERS'],
+        thread_name_prefix='isbn-enrichment'
+    )
+
+
+def cached_metadata(isbns):
+    """Fresh isbn_metadata rows for `isbns` in one query, keyed by cleaned ISBN"""
+    ttl = timedelta(days=current_app.config['ISBN_METADATA_TTL_DAYS'])
+    keys = {clean_isbn(isbn) for isbn in isbns}
+    if not keys:
+        return {}
+
+    rows = IsbnMetadata.query.filter(
+        IsbnMetadata.isbn.in_(keys),
+        IsbnMetadata.fetched_at >= datetime.utcnow() - ttl
+    ).all()
+    return {row.isbn: row for row in rows}
+
+
+def missing_fields(data, include_optional=False):
+    """Required book fields absent from `data` (plus cover with include_optional)"""
+    return [
+        field for field in ENRICHED_FIELDS
+        if data.get(field) is None and (include_optional or field != 'cover')
+    ]
+
+
+def fill_from_metadata(data, metadata):
+    """Copy looked-up values into the fields `data` left out"""
+    filled = dict(data)
+    for field in missing_fields(data, include_optional=True):
+        value = getattr(metadata, field)
+        if value is not None:
+            filled[field] = value
+    return filled
+
+
+def with_placeholders(data):
+    """Fill NOT NULL columns so a book can be stored before its lookup completes"""
+    filled = dict(data)
+    for field in missing_fields(data, include_optional=True):
+        filled[field] = f"ISBN {data['isbn']}" if field == 'title' else PLACEHOLDERS[field]
+    return filled
+
+
+def store_metadata(isbn, fields):
+    """Write an upstream result (None for no match) through to isbn_metadata"""
+    fields = fields or {}
+    db.session.merge(IsbnMetadata(
+        isbn=clean_isbn(isbn),
+        found=bool(fields),
+        fetched_at=datetime.utcnow(),
+        **{field: fields.get(field) for field in ENRICHED_FIELDS}
+    ))
+
+
+def enqueue_enrichment(book_id, isbn, fields):
+    """Look `isbn` up upstream in the background and fill `fields` on the book"""
+    app = current_app._get_current_object()
+    app.extensions['isbn_enrichment_pool'].submit(_enrich_book, app, book_id, isbn, fields)
+
+
+def _mark_failed(book_id):
+    # retry_pending_enrichment picks failed books up again
+    db.session.execute(
+        db.update(Book).where(Book.id == book_id).values(metadata_status='failed')
+    )
+    db.session.commit()
+    bump_catalog_version()
+
+
+def _enrich_book(app, book_id, isbn, fields):
+    with app.app_context():
+        try:
+            result = app.extensions['isbn_client'].lookup(isbn)
+        except Exception as e:
+            print(f"WARNING: ISBN lookup failed for {isbn}: {e}")
+            _mark_failed(book_id)
+            return
+
+        try:
+            store_metadata(isbn, result)
+
+            book = db.session.get(Book, book_id)
+            if book is not None:
+                if result:
+                    for field in fields:
+                        if result.get(field) not in (None, ''):
+                            setattr(book, field, result[field])
+                book.metadata_status = 'complete' if result else 'not_found'
+
+            db.session.commit()
+            bump_catalog_version()
+        except Exception as e:
+            db.session.rollback()
+            print(f"ERROR: Could not store ISBN metadata for {isbn}: {e}")
+            _mark_failed(book_id)
+
+
+def retry_pending_enrichment():
+    """Re-enqueue books whose lookup never finished (e.g. after a restart) or failed"""
+    books = Book.query.filter(Book.metadata_status.in_(['pending', 'failed'])).all()
+    for book in books:
+        book.metadata_status = 'pending'
+    db.session.commit()
+
+    for book in books:
+        # Placeholders mark the fields the lookup still has to fill
+        fields = [
+            field for field in ENRICHED_FIELDS
+            if getattr(book, field) in (None, '', PLACEHOLDERS.get(field), f"ISBN {book.isbn}")
+        ]
+        enqueue_enrichment(book.id, book.isbn, fields)
+    return len(books)
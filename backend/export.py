@@ -0,0 +1,87 @@
+import csv
+import io
+from datetime import datetime, timezone
+from flask import current_app
+
+# Columns of the CSV exports, in order. NDJSON rows carry the same keys.
+BOOK_EXPORT_FIELDS = [
+    'id', 'title', 'author', 'genre', 'year', 'isbn', 'description', 'cover',
+    'room_number', 'available', 'total_copies', 'available_copies', 'metadata_status', 'created_at',
+]
+RESERVATION_EXPORT_FIELDS = [
+    'id', 'book_id', 'book_title', 'book_isbn', 'user_id', 'user_name', 'user_email',
+    'user_phone', 'reservation_date', 'pickup_date', 'status', 'notes', 'created_at',
+]
+
+# A spreadsheet reads a cell starting with one of these as a formula
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+EXPORT_FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+
+
+def parse_since(value):
+    """Parse an ISO 8601 `since` timestamp (None passes through); raises ValueError"""
+    if not value:
+        return None
+    try:
+        since = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        raise ValueError('since must be an ISO 8601 timestamp, e.g. 2024-09-01T00:00:00')
+    # Stored timestamps are naive UTC; a value without an offset is taken as UTC already
+    if since.tzinfo is not None:
+        since = since.astimezone(timezone.utc).replace(tzinfo=None)
+    return since
+
+
+def csv_cell(value):
+    """`value` as written to a CSV export, with user-entered formulas defused"""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+def reservation_export_row(reservation):
+    row = reservation.to_dict(include_book=False)
+    row['book_title'] = reservation.book.title if reservation.book else None
+    row['book_isbn'] = reservation.book.isbn if reservation.book else None
+    return row
+
+
+def stream_export(rows, fields, fmt, batch_size):
+    """Encode dict rows as NDJSON or CSV, yielding one chunk per `batch_size` rows.
+
+    Only the current batch is ever held in memory, so when `rows` is backed by
+    a server-side cursor the export runs in constant memory. The CSV header is
+    yielded before the first row is fetched so clients see bytes immediately.
+    """
+    dumps = current_app.json.dumps
+    buffer = io.StringIO()
+    writer = None
+    if fmt == 'csv':
+        writer = csv.DictWriter(buffer, fieldnames=fields, extrasaction='ignore')
+        writer.writeheader()
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+
+    count = 0
+    for row in rows:
+        if writer:
+            writer.writerow({field: csv_cell(value) for field, value in row.items()})
+        else:
+            buffer.write(dumps({field: row.get(field) for field in fields}))
+            buffer.write('\n')
+
+        count += 1
+        if count % batch_size == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+
+    if buffer.tell():
+        yield buffer.getvalue()
@@ -0,0 +1,292 @@
+"""Generate a large synthetic library: books, users and years of reservations.
+
+Rows are written with Core executemany INSERTs in large batches, every user
+shares one precomputed password hash, and the output depends only on --seed
+and --anchor. A million books and a million reservations take a few minutes
+on SQLite, most of it building the full-text index once at the end.
+
+    python generate_data.py --books 1000000 --users 5000 --reservations 2000000 --reset
+"""
+import argparse
+import itertools
+import random
+import sys
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+from app import app, db, init_db
+from models import Book, Reservation, User
+from catalog_cache import bump_catalog_version
+from passwords import hash_password
+from search import deferred_search_index, drop_search_index
+
+# Weighted so a few genres and rooms hold most of the collection, as in a real library
+GENRES = [
+    ('Fiction', 30), ('Fantasy', 14), ('Mystery', 12), ('Science Fiction', 9), ('Romance', 8),
+    ('History', 7), ('Biography', 5), ('Science', 4), ('Poetry', 3), ('Dystopian', 3),
+    ('Horror', 2), ('Graphic Novel', 2), ('Philosophy', 1),
+]
+ROOMS = [(f'Room {number}', weight) for number, weight in [
+    (101, 25), (102, 18), (105, 12), (201, 10), (203, 8), (301, 6), (302, 5),
+]] + [('Library Wing A', 10), ('Library Wing B', 6)]
+
+FIRST_NAMES = (
+    'James Mary Robert Patricia John Jennifer Michael Linda David Elizabeth William Barbara '
+    'Richard Susan Joseph Jessica Thomas Sarah Charles Karen Chris Nancy Daniel Lisa Matthew '
+    'Betty Anthony Sandra Mark Ashley Donald Emily Steven Kimberly Paul Donna Andrew Michelle'
+).split()
+LAST_NAMES = (
+    'Smith Johnson Williams Brown Jones Garcia Miller Davis Rodriguez Martinez Hernandez Lopez '
+    'Gonzalez Wilson Anderson Thomas Taylor Moore Jackson Martin Lee Perez Thompson White '
+    'Harris Sanchez Clark Ramirez Lewis Robinson Walker Young Allen King Wright Scott Torres'
+).split()
+THEMES = (
+    'dragon wizard river mountain shadow garden winter summer secret journey kingdom ocean '
+    'forest empire silver golden crown storm island letter memory promise stranger mirror '
+    'lantern harbor orchard station voyage echo night city house daughter war peace glass'
+).split()
+SYLLABLES = ['ka', 'lo', 'mi', 'ren', 'tha', 'vor', 'es', 'qui', 'dun', 'sel', 'an', 'bri', 'tor', 'el']
+
+# Share of historical reservations by outcome; live pending ones are added separately
+HISTORY_STATUSES = [('returned', 70), ('cancelled', 18), ('expired', 12)]
+# Copies held per title: mostly one, a class set for a few
+COPIES = [(1, 80), (2, 10), (3, 5), (5, 3), (25, 2)]
+
+
+def weighted_picker(rng, choices):
+    values = [value for value, _ in choices]
+    cum_weights = list(itertools.accumulate(weight for _, weight in choices))
+    return lambda: rng.choices(values, cum_weights=cum_weights)[0]
+
+
+def skewed_index(rng, size, alpha, share):
+    """An index into `size` items: Pareto-distributed (favouring the first items) for `share` of draws, uniform otherwise"""
+    if rng.random() < share:
+        return min(int(rng.paretovariate(alpha)) - 1, size - 1)
+    return rng.randrange(size)
+
+
+def isbn13(number):
+    """A valid ISBN-13 in the 979-8 range for a unique serial `number`"""
+    digits = f"9798{number:09d}"
+    check = (10 - sum(int(d) * (3 if i % 2 else 1) for i, d in enumerate(digits)) % 10) % 10
+    return f"{digits}{check}"
+
+
+def vocabulary(rng, size):
+    words = set(THEMES)
+    while len(words) < size:
+        words.add(''.join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))))
+    return sorted(words)
+
+
+def book_rows(rng, count, anchor):
+    words = vocabulary(rng, 20000)
+    # Popular authors write many books: Zipf-like author ranks
+    authors = [f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}" for _ in range(max(10, count // 8))]
+    genre = weighted_picker(rng, GENRES)
+    room = weighted_picker(rng, ROOMS)
+    copies = weighted_picker(rng, COPIES)
+    # Spread serials over the ISBN range so they are not sequential
+    stride = 7919
+    for i in range(count):
+        total_copies = copies()
+        yield {
+            # rng.choices(k=...) draws a whole phrase in one call, which keeps
+            # row generation from dominating the run
+            'title': ' '.join(rng.choices(words, k=rng.randint(1, 5))).title(),
+            'author': authors[skewed_index(rng, len(authors), 1.2, 1.0)],
+            'genre': genre(),
+            # Most of the collection is recent
+            'year': max(1600, 2024 - int(rng.expovariate(1 / 25))),
+            'isbn': isbn13((i * stride) % 10 ** 9),
+            'description': ' '.join(rng.choices(words, k=rng.randint(20, 80))),
+            'cover': f"https://covers.example.com/{i}.jpg",
+            'room_number': room(),
+            'total_copies': total_copies,
+            'available_copies': total_copies,
+            'created_at': anchor - timedelta(days=rng.uniform(0, 5 * 365)),
+            'metadata_status': None,
+        }
+
+
+def user_rows(count, teachers, password_hash, anchor):
+    for i in range(count):
+        role = 'teacher' if i < teachers else 'student'
+        yield {
+            'username': f"{role}{i}",
+            'email': f"{role}{i}@school.example.com",
+            'password_hash': password_hash,
+            'role': role,
+            'full_name': f"{FIRST_NAMES[i % len(FIRST_NAMES)]} {LAST_NAMES[(i // len(FIRST_NAMES)) % len(LAST_NAMES)]}",
+            'created_at': anchor - timedelta(days=i % 1000),
+            'active': True,
+        }
+
+
+def reservation_rows(rng, count, students, book_count, first_book_id, years, anchor, expiry_days):
+    """Historical reservations spread over `years`, with borrower and book popularity skew"""
+    status = weighted_picker(rng, HISTORY_STATUSES)
+    span = years * 365 * 86400
+    for _ in range(count):
+        user_id, name, email = students[skewed_index(rng, len(students), 1.5, 0.5)]
+        reserved = anchor - timedelta(seconds=rng.uniform((expiry_days + 1) * 86400, span))
+        outcome = status()
+        yield {
+            # A few bestsellers account for a large share of loans
+            'book_id': first_book_id + skewed_index(rng, book_count, 0.8, 0.3),
+            'user_id': user_id,
+            'user_name': name,
+            'user_email': email,
+            'user_role': 'student',
+            'user_phone': None,
+            'reservation_date': reserved,
+            'pickup_date': reserved + timedelta(hours=rng.uniform(2, 72)) if outcome == 'returned' else None,
+            'status': outcome,
+            'notes': None,
+            'created_at': reserved,
+        }
+
+
+@contextmanager
+def deferred_indexes(conn, *tables):
+    """Drop the tables' secondary indexes for a bulk load and build each once at the end.
+
+    One sort per index afterwards is much cheaper than a B-tree insert per
+    row per index during the load. Unique column constraints stay in place.
+    """
+    indexes = [index for table in tables for index in table.indexes]
+    for index in indexes:
+        index.drop(conn, checkfirst=True)
+    conn.commit()
+
+    yield
+
+    started = time.perf_counter()
+    for index in indexes:
+        index.create(conn, checkfirst=True)
+    conn.commit()
+    print(f"  indexes: {len(indexes)} built in {time.perf_counter() - started:.1f}s")
+
+
+def insert_batches(conn, table, rows, batch_size, label, total):
+    """executemany INSERT `rows` in batches of `batch_size`, one transaction per batch"""
+    started = time.perf_counter()
+    batch = []
+    written = 0
+    for row in rows:
+        batch.append(row)
+        if len(batch) == batch_size:
+            conn.execute(table.insert(), batch)
+            conn.commit()
+            written += len(batch)
+            batch = []
+            elapsed = time.perf_counter() - started
+            print(f"\r  {label}: {written:,}/{total:,} ({written / elapsed:,.0f} rows/s)", end='', flush=True)
+    if batch:
+        conn.execute(table.insert(), batch)
+        conn.commit()
+        written += len(batch)
+
+    elapsed = time.perf_counter() - started
+    print(f"\r  {label}: {written:,} rows in {elapsed:.1f}s ({written / max(elapsed, 1e-9):,.0f} rows/s)   ")
+
+
+def generate(conn, books, users, teachers, reservations, pending, years, seed, anchor, password, rounds, batch_size):
+    rng = random.Random(seed)
+    expiry_days = app.config['RESERVATION_EXPIRY_DAYS']
+
+    print(f"Hashing the shared password (bcrypt cost {rounds or app.config['BCRYPT_LOG_ROUNDS']})...")
+    password_hash = hash_password(password, rounds=rounds)
+
+    with deferred_indexes(conn, Book.__table__, Reservation.__table__):
+        with deferred_search_index(app):
+            insert_batches(conn, Book.__table__, book_rows(rng, books, anchor), batch_size, 'books', books)
+            started = time.perf_counter()
+        print(f"  search index: built in {time.perf_counter() - started:.1f}s")
+
+        insert_batches(conn, User.__table__, user_rows(users, teachers, password_hash, anchor), batch_size, 'users', users)
+
+        first_book_id = conn.execute(db.select(db.func.min(Book.id))).scalar()
+        students = conn.execute(
+            db.select(User.id, User.full_name, User.email).where(User.role == 'student').order_by(User.id)
+        ).all()
+        if not students:
+            sys.exit('At least one student is needed for reservations')
+
+        insert_batches(
+            conn, Reservation.__table__,
+            reservation_rows(rng, reservations, students, books, first_book_id, years, anchor, expiry_days),
+            batch_size, 'reservations', reservations
+        )
+
+        # Live state: at most one pending reservation per student (the partial
+        # unique index enforces it), each holding a copy of a distinct book,
+        # with some already past the expiry window
+        pending = min(pending, len(students), books)
+        pending_books = rng.sample(range(first_book_id, first_book_id + books), pending)
+        rows = []
+        for (user_id, name, email), book_id in zip(rng.sample(students, pending), pending_books):
+            reserved = anchor - timedelta(hours=rng.uniform(0, (expiry_days + 2) * 24))
+            rows.append({
+                'book_id': book_id, 'user_id': user_id, 'user_name': name, 'user_email': email,
+                'user_role': 'student', 'user_phone': None, 'reservation_date': reserved,
+                'pickup_date': None, 'status': 'pending', 'notes': None, 'created_at': reserved,
+            })
+        insert_batches(conn, Reservation.__table__, iter(rows), batch_size, 'pending reservations', pending)
+
+        for start in range(0, len(pending_books), batch_size):
+            conn.execute(
+                db.update(Book).where(Book.id.in_(pending_books[start:start + batch_size]))
+                .values(available_copies=Book.available_copies - 1)
+            )
+        conn.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--books', type=int, default=100000)
+    parser.add_argument('--users', type=int, default=2000)
+    parser.add_argument('--teachers', type=int, default=50, help='how many of --users are teachers')
+    parser.add_argument('--reservations', type=int, help='historical reservations (default: 2x --books)')
+    parser.add_argument('--pending', type=int, help='live pending reservations (default: 20%% of students)')
+    parser.add_argument('--years', type=float, default=3, help='how far back the reservation history goes')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--anchor', help="ISO date the history ends at (default: today); fixes output across days")
+    parser.add_argument('--password', default='password123', help='password of every generated user')
+    parser.add_argument('--bcrypt-rounds', type=int, help='cost of the shared hash (default: BCRYPT_LOG_ROUNDS)')
+    parser.add_argument('--batch-size', type=int, default=20000)
+    parser.add_argument('--reset', action='store_true', help='drop and recreate all tables first')
+    args = parser.parse_args()
+
+    teachers = min(args.teachers, args.users)
+    reservations = 2 * args.books if args.reservations is None else args.reservations
+    pending = (args.users - teachers) // 5 if args.pending is None else args.pending
+    anchor = (datetime.fromisoformat(args.anchor) if args.anchor
+              else datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0))
+
+    with app.app_context():
+        if args.reset:
+            print("Dropping and recreating all tables...")
+            db.drop_all()
+            drop_search_index()
+        init_db(app)
+        if Book.query.first() is not None or User.query.first() is not None:
+            sys.exit("The database is not empty; pass --reset to replace its contents")
+
+        print(f"Generating {args.books:,} books, {args.users:,} users and "
+              f"{reservations + pending:,} reservations (seed {args.seed}, anchor {anchor.date()})")
+        started = time.perf_counter()
+        with db.engine.connect() as conn:
+            if db.engine.dialect.name == 'sqlite':
+                # Nothing to lose if the machine dies halfway through a generated load
+                conn.exec_driver_sql('PRAGMA synchronous = OFF')
+            generate(conn, args.books, args.users, teachers, reservations, pending, args.years, args.seed,
+                     anchor, args.password, args.bcrypt_rounds, args.batch_size)
+        bump_catalog_version()
+        print(f"Done in {time.perf_counter() - started:.1f}s. Every user's password is '{args.password}'.")
+
+
+if __name__ == '__main__':
+    main()
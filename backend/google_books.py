@@ -0,0 +1,181 @@
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+# Mirrors the String lengths declared on Book and IsbnMetadata. Upstream
+# values can be longer, and Postgres rejects an over-long string.
+FIELD_LENGTHS = {
+    'title': 200,
+    'author': 100,
+    'genre': 50,
+    'cover': 500,
+}
+
+
+def clean_isbn(isbn):
+    """Strip hyphens and spaces so equivalent ISBNs share one cache entry"""
+    return isbn.replace('-', '').replace(' ', '')
+
+
+class TokenBucket:
+    """Thread-safe token bucket: `rate` requests per second with bursts up to `capacity`"""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity or max(1, rate))
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a token is available, then take it"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+def parse_volume(data):
+    """Extract our book fields from a Google Books volumes response, or None if there is no match"""
+    if data.get('totalItems', 0) == 0 or not data.get('items'):
+        return None
+
+    book = data['items'][0]['volumeInfo']
+
+    # Extract information
+    genre = book.get('categories', ['Unknown'])[0] if book.get('categories') else 'Unknown'
+    year = book.get('publishedDate', '').split('-')[0] if book.get('publishedDate') else ''
+
+    # Get the best quality cover image
+    cover_image = ''
+    if book.get('imageLinks'):
+        cover_image = (book['imageLinks'].get('large') or
+                      book['imageLinks'].get('medium') or
+                      book['imageLinks'].get('thumbnail') or
+                      book['imageLinks'].get('smallThumbnail') or '')
+
+    # A cut-off URL is useless, so an over-long cover is dropped rather than truncated
+    if len(cover_image) > FIELD_LENGTHS['cover']:
+        cover_image = ''
+
+    return {
+        'title': book.get('title', '')[:FIELD_LENGTHS['title']],
+        'author': (', '.join(book.get('authors', [])) if book.get('authors') else '')[:FIELD_LENGTHS['author']],
+        'genre': genre[:FIELD_LENGTHS['genre']],
+        'year': int(year) if year.isdigit() else 0,
+        'description': book.get('description', ''),
+        'cover': cover_image
+    }
+
+
+class GoogleBooksClient:
+    """Google Books ISBN lookups over one pooled session.
+
+    Requests are rate limited by a shared token bucket and successful
+    responses (including "no match") are cached on disk per cleaned ISBN, so
+    reruns are served locally and work offline. `base_url` can point at a
+    local stub server.
+    """
+
+    def __init__(self, base_url, api_key='', rate_limit=5, cache_dir=None, timeout=5, max_workers=8):
+        self.base_url = base_url
+        self.api_key = api_key
+        self.cache_dir = cache_dir
+        self.timeout = timeout
+        self.max_workers = max_workers
+        self.rate_limiter = TokenBucket(rate_limit)
+        self._session = None
+        self._session_lock = threading.Lock()
+
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    @property
+    def session(self):
+        # requests (with urllib3 and certifi) is imported by the first lookup
+        # rather than when the app starts, which rarely needs it
+        with self._session_lock:
+            if self._session is None:
+                import requests
+                from requests.adapters import HTTPAdapter
+
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.max_workers)
+                session.mount('http://', adapter)
+                session.mount('https://', adapter)
+                self._session = session
+            return self._session
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(
+            base_url=config['GOOGLE_BOOKS_API_URL'],
+            api_key=config['GOOGLE_BOOKS_API_KEY'],
+            rate_limit=config['GOOGLE_BOOKS_RATE_LIMIT'],
+            cache_dir=config['GOOGLE_BOOKS_CACHE_DIR'],
+            max_workers=config['GOOGLE_BOOKS_MAX_WORKERS'],
+        )
+
+    def _cache_path(self, isbn):
+        return os.path.join(self.cache_dir, f"{isbn}.json")
+
+    def _read_cache(self, isbn):
+        if not self.cache_dir:
+            return None
+        try:
+            with open(self._cache_path(isbn)) as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def _write_cache(self, isbn, data):
+        if not self.cache_dir:
+            return
+        tmp_path = f"{self._cache_path(isbn)}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(data, f)
+        os.replace(tmp_path, self._cache_path(isbn))
+
+    def lookup(self, isbn):
+        """Fetch book information for one ISBN.
+
+        Returns None when the source has no match and raises on request
+        failures, so callers can tell "unknown ISBN" from "try again later".
+        """
+        clean = clean_isbn(isbn)
+        data = self._read_cache(clean)
+        if data is None:
+            params = {'q': f"isbn:{clean}"}
+            if self.api_key:
+                params['key'] = self.api_key
+
+            self.rate_limiter.acquire()
+            response = self.session.get(self.base_url, params=params, timeout=self.timeout)
+            response.raise_for_status()
+
+            data = response.json()
+            self._write_cache(clean, data)
+
+        return parse_volume(data)
+
+    def fetch(self, isbn):
+        """Fetch book information for one ISBN; None if unknown or the request failed"""
+        try:
+            return self.lookup(isbn)
+        except Exception as e:
+            print(f"  Warning: Could not fetch data for ISBN {isbn}: {str(e)}")
+            return None
+
+    def fetch_many(self, isbns):
+        """Fetch several ISBNs concurrently; returns {isbn: data or None} in input order"""
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            return dict(zip(isbns, pool.map(self.fetch, isbns)))
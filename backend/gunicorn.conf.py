@@ -0,0 +1,35 @@
+import os
+import shutil
+import tempfile
+
+# Let prometheus_client aggregate metrics across workers. This has to be in
+# the environment before the app (and so prometheus_client) is imported.
+metrics_dir = os.environ.setdefault(
+    'PROMETHEUS_MULTIPROC_DIR', os.path.join(tempfile.gettempdir(), 'virtual-library-metrics')
+)
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:5000')
+workers = int(os.environ.get('WEB_CONCURRENCY', 2 * (os.cpu_count() or 1) + 1))
+# Per-process admission limits are divided among the workers (admission.py).
+# Set WEB_CONCURRENCY rather than passing --workers, which this file cannot see.
+os.environ.setdefault('ADMISSION_WORKERS', str(workers))
+wsgi_app = 'app:create_app()'
+
+# Build the app once in the master and fork it into the workers, which then
+# share its memory pages and skip the import. Building the app opens no
+# database connections, so nothing is shared across the fork. Run
+# `flask --app app init-db` before the first start. GUNICORN_PRELOAD=false
+# imports the app in every worker instead, which `kill -HUP` needs to pick
+# up new code.
+preload_app = os.environ.get('GUNICORN_PRELOAD', 'true').lower() == 'true'
+
+
+def on_starting(server):
+    # Samples from a previous run would otherwise be summed into this one
+    shutil.rmtree(metrics_dir, ignore_errors=True)
+    os.makedirs(metrics_dir, exist_ok=True)
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,180 @@
+import os
+import time
+from contextvars import ContextVar
+from flask import Response, g, request
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from prometheus_client import (CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Histogram, REGISTRY,
+                               generate_latest, multiprocess)
+
+# Metrics are process-local unless PROMETHEUS_MULTIPROC_DIR is set before this
+# module is imported (gunicorn.conf.py does that). Each worker then writes its
+# samples to mmap'd files in that directory and /api/metrics sums them, so
+# whichever worker answers the scrape reports totals for all of them.
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STATEMENT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 250)
+WAIT_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+
+REQUEST_LATENCY = Histogram(
+    'http_request_duration_seconds', 'Time spent in the view and middleware, per route',
+    ['method', 'route'], buckets=LATENCY_BUCKETS
+)
+REQUEST_COUNT = Counter(
+    'http_requests_total', 'Requests by route and response status',
+    ['method', 'route', 'status']
+)
+REQUEST_SQL_STATEMENTS = Histogram(
+    'http_request_sql_statements', 'SQL statements executed per request',
+    ['method', 'route'], buckets=STATEMENT_BUCKETS
+)
+REQUEST_SQL_TIME = Histogram(
+    'http_request_sql_duration_seconds', 'Cumulative SQL execution time per request',
+    ['method', 'route'], buckets=LATENCY_BUCKETS
+)
+SQL_STATEMENTS = Counter(
+    'db_statements_total', 'SQL statements executed, including outside requests'
+)
+SQL_TIME = Counter(
+    'db_statement_duration_seconds_total', 'Cumulative SQL execution time, including outside requests'
+)
+POOL_CHECKOUT_WAIT = Histogram(
+    'db_pool_checkout_wait_seconds', 'Time a session waited to obtain a pooled connection',
+    buckets=WAIT_BUCKETS
+)
+ADMISSION_DECISIONS = Counter(
+    'admission_decisions_total', 'Admission control decisions by policy and outcome',
+    ['policy', 'outcome']
+)
+ADMISSION_QUEUE_WAIT = Histogram(
+    'admission_queue_wait_seconds', 'Time admitted requests waited for a concurrency slot',
+    ['policy'], buckets=WAIT_BUCKETS
+)
+
+
+class _RequestStats:
+    __slots__ = ('start', 'statements', 'sql_time')
+
+    def __init__(self, start):
+        self.start = start
+        self.statements = 0
+        self.sql_time = 0.0
+
+
+# A ContextVar rather than flask.g: the cursor hooks run for every statement
+# and a contextvar lookup is far cheaper than going through the g proxy
+_request_stats = ContextVar('metrics_request_stats', default=None)
+
+
+def _route():
+    # The URL rule, not the path, so /api/books/1 and /api/books/2 share a series
+    return request.url_rule.rule if request.url_rule is not None else 'unmatched'
+
+
+def _before_request():
+    _request_stats.set(_RequestStats(time.perf_counter()))
+
+
+# (method, route, status) -> labelled children; .labels() takes a lock and
+# builds a key on every call, which dominated the per-request cost
+_children = {}
+
+
+def _series(method, route, status):
+    key = (method, route, status)
+    series = _children.get(key)
+    if series is None:
+        series = _children[key] = (
+            REQUEST_LATENCY.labels(method, route),
+            REQUEST_COUNT.labels(method, route, status),
+            REQUEST_SQL_STATEMENTS.labels(method, route),
+            REQUEST_SQL_TIME.labels(method, route),
+        )
+    return series
+
+
+def _after_request(response):
+    stats = _request_stats.get()
+    if stats is None:
+        return response
+
+    latency, count, sql_statements, sql_time = _series(request.method, _route(), str(response.status_code))
+    latency.observe(time.perf_counter() - stats.start)
+    count.inc()
+    sql_statements.observe(stats.statements)
+    sql_time.observe(stats.sql_time)
+
+    admission = g.get('admission')
+    if admission is not None:
+        policy, outcome, waited = admission
+        ADMISSION_DECISIONS.labels(policy, outcome).inc()
+        if waited is not None:
+            ADMISSION_QUEUE_WAIT.labels(policy).observe(waited)
+    return response
+
+
+def _teardown_request(exc):
+    # Runs after a streamed body is exhausted, so its statements are counted too
+    stats = _request_stats.get()
+    if stats is not None:
+        SQL_STATEMENTS.inc(stats.statements)
+        SQL_TIME.inc(stats.sql_time)
+        _request_stats.set(None)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('metrics_query_start', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info['metrics_query_start'].pop()
+    stats = _request_stats.get()
+    if stats is not None:
+        stats.statements += 1
+        stats.sql_time += elapsed
+    else:
+        # Background threads (ISBN enrichment, CLI commands)
+        SQL_STATEMENTS.inc()
+        SQL_TIME.inc(elapsed)
+
+
+def _after_transaction_create(session, transaction):
+    # A root transaction is created right before the session asks the pool
+    # for a connection; after_begin fires once it has one
+    if transaction.parent is None:
+        session.info['metrics_checkout_start'] = time.perf_counter()
+
+
+def _after_begin(session, transaction, connection):
+    start = session.info.pop('metrics_checkout_start', None)
+    if start is not None:
+        POOL_CHECKOUT_WAIT.observe(time.perf_counter() - start)
+
+
+def init_metrics(app, *engines):
+    """Record request, SQL and pool metrics for `app` and its database `engines`"""
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+    app.teardown_request(_teardown_request)
+
+    for engine in engines:
+        instrument_engine(engine)
+    if not event.contains(Session, 'after_transaction_create', _after_transaction_create):
+        event.listen(Session, 'after_transaction_create', _after_transaction_create)
+        event.listen(Session, 'after_begin', _after_begin)
+
+
+def instrument_engine(engine):
+    """Count `engine`'s statements and SQL time; init_metrics does this for the app's engines"""
+    event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+    event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
+
+
+def metrics_response():
+    """Prometheus text exposition of every worker's metrics"""
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return Response(generate_latest(registry), content_type=CONTENT_TYPE_LATEST)
@@ -0,0 +1,73 @@
+from app import app, db
+from models import Book
+
+# Indexes on the old boolean, replaced by the ones declared on Book
+OLD_INDEXES = ['ix_books_genre_available', 'ix_books_available_title_id']
+
+def add_book_copies():
+    """Replace books.available with total_copies / available_copies counters"""
+    with app.app_context():
+        for column in ('total_copies', 'available_copies'):
+            try:
+                with db.engine.connect() as conn:
+                    conn.execute(db.text(f'ALTER TABLE books ADD COLUMN {column} INTEGER NOT NULL DEFAULT 1'))
+                    conn.commit()
+                print(f"✓ Successfully added {column} column to books table")
+            except Exception as e:
+                if 'duplicate column name' in str(e).lower() or 'already exists' in str(e).lower():
+                    print(f"✓ {column} column already exists")
+                else:
+                    print(f"Error: {e}")
+                    raise
+
+        columns = [column['name'] for column in db.inspect(db.engine).get_columns('books')]
+        if 'available' in columns:
+            # One transaction, so the counters and statuses never disagree
+            with db.engine.begin() as conn:
+                # Each book was one copy, held by its latest reservation while the
+                # book was unavailable. Any other picked-up reservation was brought
+                # back (the book was flagged available again by hand), so it no
+                # longer holds a copy.
+                conn.execute(db.text(
+                    "UPDATE reservations SET status = 'returned' "
+                    "WHERE status = 'picked_up' AND ("
+                    "  EXISTS (SELECT 1 FROM books WHERE books.id = reservations.book_id AND books.available)"
+                    "  OR id < (SELECT max(latest.id) FROM reservations AS latest"
+                    "           WHERE latest.book_id = reservations.book_id))"
+                ))
+                # A copy is on the shelf if the book was available and nothing holds it
+                conn.execute(db.text(
+                    "UPDATE books SET total_copies = 1, available_copies = CASE WHEN available AND NOT EXISTS ("
+                    "  SELECT 1 FROM reservations WHERE reservations.book_id = books.id"
+                    "  AND reservations.status IN ('pending', 'picked_up')"
+                    ") THEN 1 ELSE 0 END"
+                ))
+                for name in OLD_INDEXES:
+                    conn.execute(db.text(f'DROP INDEX IF EXISTS {name}'))
+                # Needs SQLite 3.35 or later
+                conn.execute(db.text('ALTER TABLE books DROP COLUMN available'))
+            print("✓ Copied availability into the counters, marked finished loans returned and dropped available")
+        else:
+            print("✓ available column already dropped")
+
+        for index in Book.__table__.indexes:
+            index.create(bind=db.engine, checkfirst=True)
+            print(f"✓ {index.name}")
+
+        if db.engine.dialect.name == 'postgresql':
+            with db.engine.begin() as conn:
+                exists = conn.execute(db.text(
+                    "SELECT 1 FROM pg_constraint WHERE conname = 'ck_books_available_copies'"
+                )).first()
+                if not exists:
+                    conn.execute(db.text(
+                        'ALTER TABLE books ADD CONSTRAINT ck_books_available_copies '
+                        'CHECK (available_copies >= 0 AND available_copies <= total_copies)'
+                    ))
+            print("✓ ck_books_available_copies")
+        else:
+            # SQLite cannot add a constraint to an existing table
+            print("⚠ ck_books_available_copies is only created with new SQLite databases")
+
+if __name__ == '__main__':
+    add_book_copies()
@@ -0,0 +1,26 @@
+from app import app, db
+from models import Book, Reservation
+
+def add_indexes():
+    """Create the secondary indexes declared on the models in an existing database"""
+    with app.app_context():
+        for model in (Book, Reservation):
+            for index in model.__table__.indexes:
+                # checkfirst skips indexes that already exist
+                index.create(bind=db.engine, checkfirst=True)
+                print(f"✓ {index.name}")
+
+        if db.engine.dialect.name == 'sqlite':
+            with db.engine.connect() as conn:
+                conn.execute(db.text('ANALYZE'))
+                conn.commit()
+        elif db.engine.dialect.name == 'postgresql':
+            with db.engine.connect() as conn:
+                conn.execute(db.text('ANALYZE books'))
+                conn.execute(db.text('ANALYZE reservations'))
+                conn.commit()
+
+        print("✓ Successfully applied indexes")
+
+if __name__ == '__main__':
+    add_indexes()
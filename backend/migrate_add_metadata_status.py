@@ -0,0 +1,21 @@
+from app import app, db
+from models import Book
+
+def add_metadata_status_column():
+    """Add metadata_status column to existing books"""
+    with app.app_context():
+        try:
+            # Try to add the column using raw SQL
+            with db.engine.connect() as conn:
+                conn.execute(db.text('ALTER TABLE books ADD COLUMN metadata_status VARCHAR(20)'))
+                conn.commit()
+            print("✓ Successfully added metadata_status column to books table")
+        except Exception as e:
+            if 'duplicate column name' in str(e).lower() or 'already exists' in str(e).lower():
+                print("✓ metadata_status column already exists")
+            else:
+                print(f"Error: {e}")
+                raise
+
+if __name__ == '__main__':
+    add_metadata_status_column()
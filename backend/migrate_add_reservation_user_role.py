@@ -0,0 +1,37 @@
+from app import app, db
+from models import Reservation
+
+def add_user_role_column():
+    """Add user_role to existing reservations and the one-pending-per-student index"""
+    with app.app_context():
+        try:
+            # Try to add the column using raw SQL
+            with db.engine.connect() as conn:
+                conn.execute(db.text('ALTER TABLE reservations ADD COLUMN user_role VARCHAR(20)'))
+                conn.commit()
+            print("✓ Successfully added user_role column to reservations table")
+        except Exception as e:
+            if 'duplicate column name' in str(e).lower() or 'already exists' in str(e).lower():
+                print("✓ user_role column already exists")
+            else:
+                print(f"Error: {e}")
+                raise
+
+        with db.engine.connect() as conn:
+            conn.execute(db.text(
+                'UPDATE reservations SET user_role = '
+                '(SELECT role FROM users WHERE users.id = reservations.user_id) '
+                'WHERE user_role IS NULL'
+            ))
+            conn.commit()
+        print("✓ Backfilled user_role from users")
+
+        # Fails if a student already holds several pending reservations;
+        # cancel or expire the extras and rerun
+        for index in Reservation.__table__.indexes:
+            if index.name == 'uq_reservations_one_pending_per_student':
+                index.create(bind=db.engine, checkfirst=True)
+                print(f"✓ {index.name}")
+
+if __name__ == '__main__':
+    add_user_role_column()
@@ -1,8 +1,12 @@
-from datetime import datetime
+from datetime import datetime, timedelta
+from flask import current_app
 from flask_sqlalchemy import SQLAlchemy
 from flask_bcrypt import Bcrypt
+from sqlalchemy.ext.hybrid import hybrid_property
+from passwords import hash_password, needs_rehash, verify_password
+from replicas import RoutingSession
 
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 bcrypt = Bcrypt()
 
 
@@ -23,11 +27,15 @@ class User(db.Model):
 
     def set_password(self, password):
         """Hash and set the user's password"""
-        self.password_hash = bcrypt.generate_password_hash(password).decode('utf-8')
+        self.password_hash = hash_password(password)
 
     def check_password(self, password):
         """Check if provided password matches the hash"""
-        return bcrypt.check_password_hash(self.password_hash, password)
+        return verify_password(self.password_hash, password)
+
+    def password_needs_rehash(self):
+        """True when the stored hash uses an outdated bcrypt cost"""
+        return needs_rehash(self.password_hash)
 
     def to_dict(self):
         """Convert user to dictionary (excluding password_hash)"""
@@ -37,14 +45,31 @@ class User(db.Model):
             'email': self.email,
             'role': self.role,
             'full_name': self.full_name,
-            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'created_at': self.created_at,
             'active': self.active
         }
 
 
 class Book(db.Model):
     __tablename__ = 'books'
-    
+    __table_args__ = (
+        # Backs the (title, id) keyset used to paginate GET /api/books
+        db.Index('ix_books_title_id', 'title', 'id'),
+        # ?genre= (alone or with ?available=) and SELECT DISTINCT genre
+        db.Index('ix_books_genre_copies', 'genre', 'available_copies'),
+        # ?available=true listings in catalog order
+        db.Index(
+            'ix_books_in_stock_title_id', 'title', 'id',
+            sqlite_where=db.text('available_copies > 0'),
+            postgresql_where=db.text('available_copies > 0')
+        ),
+        # /api/export/books?since=
+        db.Index('ix_books_created_at', 'created_at'),
+        # Counters only move through guarded UPDATEs; this catches any that would drift
+        db.CheckConstraint('available_copies >= 0 AND available_copies <= total_copies',
+                           name='ck_books_available_copies'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(200), nullable=False)
     author = db.Column(db.String(100), nullable=False)
@@ -54,64 +79,150 @@ class Book(db.Model):
     description = db.Column(db.Text, nullable=False)
     cover = db.Column(db.String(500))
     room_number = db.Column(db.String(20))
-    available = db.Column(db.Boolean, default=True)
+    # Copies on the shelf; each pending or picked-up reservation holds one of
+    # the total. Changed only by atomic UPDATEs (see app.claim_book).
+    total_copies = db.Column(db.Integer, nullable=False, default=1, server_default='1')
+    available_copies = db.Column(db.Integer, nullable=False, default=1, server_default='1')
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    
+    # None when entered by hand; 'pending', 'complete', 'not_found' or 'failed' for ISBN enrichment
+    metadata_status = db.Column(db.String(20))
+
     # Relationship with reservations
     reservations = db.relationship('Reservation', backref='book', lazy=True, cascade='all, delete-orphan')
-    
-    def to_dict(self):
+
+    # Keys of to_dict(), in order
+    FIELDS = (
+        'id', 'title', 'author', 'genre', 'year', 'isbn', 'description', 'cover',
+        'room_number', 'available', 'total_copies', 'available_copies', 'created_at', 'metadata_status',
+    )
+    # Columns a key needs loaded when they are not just the column of that name
+    FIELD_COLUMNS = {'available': ('available_copies',)}
+
+    @hybrid_property
+    def available(self):
+        """Whether at least one copy is on the shelf"""
+        return self.available_copies > 0
+
+    @available.expression
+    def available(cls):
+        # A literal 0, so the query matches ix_books_in_stock_title_id's WHERE clause
+        return cls.available_copies > db.literal_column('0')
+
+    def to_dict(self, fields=None):
+        """Serialize the book, or only `fields` (a subset of FIELDS) for sparse fieldsets.
+
+        Datetimes are left as-is; the app's JSON provider renders them as ISO 8601.
+        """
+        return {field: getattr(self, field) for field in fields or self.FIELDS}
+
+
+class IsbnMetadata(db.Model):
+    """Cached upstream lookups keyed by cleaned ISBN, including misses (found=False)"""
+    __tablename__ = 'isbn_metadata'
+
+    isbn = db.Column(db.String(20), primary_key=True)
+    found = db.Column(db.Boolean, nullable=False, default=True)
+    title = db.Column(db.String(200))
+    author = db.Column(db.String(100))
+    genre = db.Column(db.String(50))
+    year = db.Column(db.Integer)
+    description = db.Column(db.Text)
+    cover = db.Column(db.String(500))
+    fetched_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    def to_fields(self):
+        """Book fields this lookup can fill in"""
         return {
-            'id': self.id,
             'title': self.title,
             'author': self.author,
             'genre': self.genre,
             'year': self.year,
-            'isbn': self.isbn,
             'description': self.description,
-            'cover': self.cover,
-            'room_number': self.room_number,
-            'available': self.available,
-            'created_at': self.created_at.isoformat() if self.created_at else None
+            'cover': self.cover
         }
 
 
 class Reservation(db.Model):
     __tablename__ = 'reservations'
+    __table_args__ = (
+        # Student listings and the one-active-reservation rule
+        db.Index('ix_reservations_user_status', 'user_id', 'status'),
+        # ?status= filters and the expiry sweep (status='pending' AND reservation_date < cutoff)
+        db.Index('ix_reservations_status_date', 'status', 'reservation_date'),
+        # ?book_id= filters and the book side of the expiry sweep
+        db.Index('ix_reservations_book_status', 'book_id', 'status'),
+        db.Index('ix_reservations_user_email', 'user_email'),
+        # Teacher listing ordered by newest first
+        db.Index('ix_reservations_reservation_date', 'reservation_date'),
+        # Enforces one pending reservation per student inside the database
+        db.Index(
+            'uq_reservations_one_pending_per_student', 'user_id', unique=True,
+            sqlite_where=db.text("status = 'pending' AND user_role = 'student'"),
+            postgresql_where=db.text("status = 'pending' AND user_role = 'student'")
+        ),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     book_id = db.Column(db.Integer, db.ForeignKey('books.id'), nullable=False)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=True)  # Nullable for backward compatibility
     user_name = db.Column(db.String(100), nullable=False)
     user_email = db.Column(db.String(120), nullable=False)
+    user_role = db.Column(db.String(20))  # Role at reservation time, for the one-pending-per-student index
     user_phone = db.Column(db.String(20))
     reservation_date = db.Column(db.DateTime, default=datetime.utcnow)
     pickup_date = db.Column(db.DateTime)
-    status = db.Column(db.String(20), default='pending')  # pending, picked_up, cancelled, expired
+    status = db.Column(db.String(20), default='pending')  # pending, picked_up, returned, cancelled, expired
     notes = db.Column(db.Text)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
-    def is_expired(self, days=3):
+    # Keys of to_dict() besides the embedded book, in order
+    FIELDS = (
+        'id', 'book_id', 'user_id', 'user_name', 'user_email', 'user_phone',
+        'reservation_date', 'pickup_date', 'status', 'notes', 'created_at',
+    )
+    # Columns a key needs loaded when they are not just the column of that name
+    FIELD_COLUMNS = {'status': ('status', 'reservation_date')}
+    STATUSES = ('pending', 'picked_up', 'returned', 'cancelled', 'expired')
+    # Statuses in which the reservation holds one of the book's copies
+    HOLDS_COPY = ('pending', 'picked_up')
+
+    @staticmethod
+    def expiry_cutoff(days=None):
+        """Pending reservations made before this moment are expired"""
+        if days is None:
+            days = current_app.config.get('RESERVATION_EXPIRY_DAYS', 3)
+        return datetime.utcnow() - timedelta(days=days)
+
+    @classmethod
+    def effectively_expired(cls, days=None):
+        """SQL condition for pending reservations past the expiry window"""
+        return (cls.status == 'pending') & (cls.reservation_date < cls.expiry_cutoff(days))
+
+    @classmethod
+    def effectively_pending(cls, days=None):
+        """SQL condition for pending reservations still inside the expiry window"""
+        return (cls.status == 'pending') & (cls.reservation_date >= cls.expiry_cutoff(days))
+
+    def is_expired(self, days=None):
         """Check if reservation has expired (not picked up after X days)"""
         if self.status != 'pending':
             return False
 
-        from datetime import timedelta
-        expiration_date = self.reservation_date + timedelta(days=days)
-        return datetime.utcnow() > expiration_date
+        return self.reservation_date < self.expiry_cutoff(days)
 
-    def to_dict(self):
-        return {
-            'id': self.id,
-            'book_id': self.book_id,
-            'book': self.book.to_dict() if self.book else None,
-            'user_id': self.user_id,
-            'user_name': self.user_name,
-            'user_email': self.user_email,
-            'user_phone': self.user_phone,
-            'reservation_date': self.reservation_date.isoformat() if self.reservation_date else None,
-            'pickup_date': self.pickup_date.isoformat() if self.pickup_date else None,
-            'status': self.status,
-            'notes': self.notes,
-            'created_at': self.created_at.isoformat() if self.created_at else None
+    def effective_status(self, days=None):
+        """Status as readers should see it, even before the expiry sweep has run"""
+        return 'expired' if self.is_expired(days) else self.status
+
+    def to_dict(self, include_book=True, fields=None):
+        """Serialize the reservation, or only `fields` (a subset of FIELDS).
+
+        Datetimes are left as-is; the app's JSON provider renders them as ISO 8601.
+        """
+        data = {
+            field: self.effective_status() if field == 'status' else getattr(self, field)
+            for field in fields or self.FIELDS
         }
+        if include_book:
+            data['book'] = self.book.to_dict() if self.book else None
+        return data
@@ -0,0 +1,53 @@
+import sys
+
+# Sentry is imported only when it is configured. Its auto-enabling
+# integrations import every supported library that happens to be installed
+# (httpx, asyncpg, starlette, ...) just to find out whether it is in use,
+# which was most of the app's startup time. The integrations for the
+# frameworks this app runs on are enabled explicitly instead.
+
+
+def init_sentry(config):
+    """Start Sentry for this process unless SENTRY_DSN is empty or it is already running"""
+    if not config['SENTRY_DSN']:
+        return
+
+    import sentry_sdk
+    from sentry_sdk.integrations.flask import FlaskIntegration
+    from sentry_sdk.integrations.sqlalchemy import SqlalchemyIntegration
+
+    if sentry_sdk.get_client().is_active():
+        return
+
+    integrations = [FlaskIntegration(), SqlalchemyIntegration()]
+    if 'starlette' in sys.modules:
+        # Serving through asgi.py
+        from sentry_sdk.integrations.starlette import StarletteIntegration
+        integrations.append(StarletteIntegration())
+
+    sentry_sdk.init(
+        dsn=config['SENTRY_DSN'],
+        integrations=integrations,
+        auto_enabling_integrations=False,
+        # Add data like request headers and IP for users,
+        # see https://docs.sentry.io/platforms/python/data-management/data-collected/ for more info
+        send_default_pii=True,
+        # Enable sending logs to Sentry
+        enable_logs=True,
+        # Set traces_sample_rate to 1.0 to capture 100%
+        # of transactions for tracing.
+        traces_sample_rate=config['SENTRY_TRACES_SAMPLE_RATE'],
+        # Set profile_session_sample_rate to 1.0 to profile 100%
+        # of profile sessions.
+        profile_session_sample_rate=config['SENTRY_PROFILE_SAMPLE_RATE'],
+        # Set profile_lifecycle to "trace" to automatically
+        # run the profiler on when there is an active transaction
+        profile_lifecycle="trace",
+    )
+
+
+def capture_exception(error):
+    """sentry_sdk.capture_exception(), without importing Sentry when it was never started"""
+    sentry_sdk = sys.modules.get('sentry_sdk')
+    if sentry_sdk is not None:
+        sentry_sdk.capture_exception(error)
@@ -0,0 +1,91 @@
+import base64
+import json
+from sqlalchemy import and_, or_
+
+
+class InvalidCursor(ValueError):
+    """Raised when a pagination cursor cannot be decoded"""
+
+
+def encode_cursor(values):
+    """Encode the sort key of the last row on a page into an opaque cursor"""
+    raw = json.dumps(list(values), separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor, columns):
+    """Decode a cursor produced by encode_cursor back into the sort key values of `columns`"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+    except (ValueError, TypeError) as e:
+        raise InvalidCursor(str(e))
+
+    if not isinstance(values, list) or len(values) != len(columns):
+        raise InvalidCursor('Cursor has the wrong shape')
+
+    # A crafted cursor must not reach the database as e.g. a string compared
+    # with an integer column, which Postgres rejects with an error
+    for column, value in zip(columns, values):
+        expected = column.type.python_type
+        if not isinstance(value, expected) or (isinstance(value, bool) and expected is not bool):
+            raise InvalidCursor(f'Cursor value for {column.key} must be of type {expected.__name__}')
+
+    return values
+
+
+def parse_limit(value, default, maximum):
+    """Parse a ?limit= query parameter, clamping it to [1, maximum]"""
+    if value is None or value == '':
+        return default
+    try:
+        limit = int(value)
+    except ValueError:
+        raise ValueError('limit must be an integer')
+    return max(1, min(limit, maximum))
+
+
+def keyset_filter(columns, values):
+    """Build a WHERE clause selecting rows strictly after `values` in (columns...) order.
+
+    Expanded into OR/AND terms rather than a row-value comparison so that the
+    same expression works on every backend and can still use a composite index.
+    """
+    clauses = []
+    for i, column in enumerate(columns):
+        terms = [columns[j] == values[j] for j in range(i)]
+        terms.append(column > values[i])
+        clauses.append(and_(*terms))
+    return or_(*clauses)
+
+
+def keyset_page(query, columns, limit, cursor=None):
+    """Restrict `query` (a Query or select()) to the page after `cursor`, plus one row.
+
+    The extra row tells split_page() whether another page exists without a COUNT.
+    """
+    if cursor:
+        values = decode_cursor(cursor, columns)
+        query = query.filter(keyset_filter(columns, values))
+
+    return query.order_by(*columns).limit(limit + 1)
+
+
+def split_page(rows, columns, limit):
+    """Split rows fetched by keyset_page() into (rows, next_cursor)"""
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor(getattr(last, column.key) for column in columns)
+
+    return rows, next_cursor
+
+
+def paginate(query, columns, limit, cursor=None):
+    """Fetch one page of `query` ordered by `columns` using keyset pagination.
+
+    Returns (rows, next_cursor). next_cursor is None on the last page.
+    """
+    rows = keyset_page(query, columns, limit, cursor).all()
+    return split_page(rows, columns, limit)
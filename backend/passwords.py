@@ -0,0 +1,108 @@
+import hmac
+import os
+import random
+import time
+from contextlib import contextmanager
+import bcrypt
+from flask import current_app
+
+try:
+    import fcntl
+except ImportError:  # Windows: single-process development server only
+    fcntl = None
+
+# bcrypt is deliberately CPU-heavy. It runs on the request's own worker, but
+# at most BCRYPT_MAX_CONCURRENT hashes or checks run at once on the whole
+# host: each holds an exclusive lock on one of that many slot files, which
+# every worker process shares. gunicorn's sync workers each serve one
+# request, so a burst of logins saturates at most that many cores however
+# many workers there are, and the rest of the workers keep serving reads.
+# Logins over the limit wait for a slot. BCRYPT_MAX_CONCURRENT=0 lifts it.
+
+SLOT_POLL_SECONDS = 0.01
+
+
+def _hash(password, rounds, prefix):
+    return bcrypt.hashpw(password, bcrypt.gensalt(rounds=rounds, prefix=prefix))
+
+
+def _check(pw_hash, password):
+    return hmac.compare_digest(bcrypt.hashpw(password, pw_hash), pw_hash)
+
+
+@contextmanager
+def _slot():
+    """Hold one of the host's BCRYPT_MAX_CONCURRENT bcrypt slots"""
+    limit = current_app.config.get('BCRYPT_MAX_CONCURRENT', 0)
+    if limit <= 0 or fcntl is None:
+        yield
+        return
+
+    directory = current_app.config.get('BCRYPT_LOCK_DIR') or os.path.join(current_app.instance_path, 'bcrypt')
+    os.makedirs(directory, exist_ok=True)
+    paths = [os.path.join(directory, f'slot{i}.lock') for i in range(limit)]
+    while True:
+        for path in random.sample(paths, limit):
+            lock = open(path, 'a')
+            try:
+                fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                lock.close()
+                continue
+            try:
+                yield
+            finally:
+                # Closing the file releases the lock, even if the process dies
+                lock.close()
+            return
+        time.sleep(SLOT_POLL_SECONDS * random.uniform(0.5, 1.5))
+
+
+def _run(fn, *args):
+    with _slot():
+        return fn(*args)
+
+
+def _to_bytes(value):
+    return value.encode('utf-8') if isinstance(value, str) else value
+
+
+def configured_rounds():
+    return current_app.config.get('BCRYPT_LOG_ROUNDS', 12)
+
+
+def hash_password(password, rounds=None):
+    """Return a bcrypt hash of `password` at the configured (or given) cost"""
+    if not password:
+        raise ValueError('Password must be non-empty.')
+
+    prefix = _to_bytes(current_app.config.get('BCRYPT_HASH_PREFIX', '2b'))
+    pw_hash = _run(_hash, _to_bytes(password), rounds or configured_rounds(), prefix)
+    return pw_hash.decode('utf-8')
+
+
+def verify_password(pw_hash, password):
+    """Check `password` against a stored bcrypt hash in constant time"""
+    try:
+        return _run(_check, _to_bytes(pw_hash), _to_bytes(password))
+    except ValueError:
+        # Malformed stored hash or a password bcrypt refuses (over 72 bytes)
+        return False
+
+
+def hash_cost(pw_hash):
+    """The log2 cost factor encoded in a bcrypt hash ("$2b$12$..." -> 12)"""
+    try:
+        return int(pw_hash.split('$')[2])
+    except (AttributeError, IndexError, ValueError):
+        return None
+
+
+def needs_rehash(pw_hash):
+    """True when a stored hash was made with a lower cost than Config asks for.
+
+    Stronger hashes are kept, so lowering BCRYPT_LOG_ROUNDS never weakens
+    existing passwords.
+    """
+    cost = hash_cost(pw_hash)
+    return cost is None or cost < configured_rounds()
@@ -0,0 +1,94 @@
+import re
+from collections import Counter
+from contextvars import ContextVar
+from flask import current_app, request
+from sqlalchemy import event
+
+# Debug/staging aid: with QUERY_DEBUG on, every SQL statement issued while
+# handling a request is recorded. Statements that differ only in their
+# parameters (the signature of an N+1 loop) are reported, and views can
+# declare a ceiling with @query_budget(n). QUERY_BUDGET_ENFORCE turns a blown
+# budget into an exception so test suites fail instead of just logging.
+
+_statements = ContextVar('query_budget_statements', default=None)
+
+# Expanded IN lists and multi-row VALUES vary in length with the data, not the shape
+_PLACEHOLDER_LIST = re.compile(r'(\?|%\([^)]*\)s|%s|:\w+)(\s*,\s*(\?|%\([^)]*\)s|%s|:\w+))+')
+_WHITESPACE = re.compile(r'\s+')
+
+
+class QueryBudgetExceeded(AssertionError):
+    """A view issued more SQL statements than its declared budget"""
+
+
+def query_budget(max_queries):
+    """Declare how many SQL statements a view may issue per request.
+
+    Only checked when QUERY_DEBUG is on. Attach it closest to the view or
+    anywhere above it; functools.wraps carries the attribute outward.
+    """
+    def decorator(fn):
+        fn.query_budget = max_queries
+        return fn
+    return decorator
+
+
+def statement_shape(statement):
+    """Normalize a statement so calls that differ only in parameters compare equal"""
+    shape = _PLACEHOLDER_LIST.sub(r'\1, ...', statement)
+    return _WHITESPACE.sub(' ', shape).strip()
+
+
+def _before_request():
+    _statements.set([])
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    statements = _statements.get()
+    if statements is not None:
+        statements.append(statement)
+
+
+def _after_request(response):
+    statements = _statements.get()
+    if statements is None:
+        return response
+    _statements.set(None)
+
+    app = current_app
+    route = f"{request.method} {request.url_rule.rule if request.url_rule else request.path}"
+    response.headers['X-Query-Count'] = str(len(statements))
+
+    threshold = app.config['QUERY_REPEAT_THRESHOLD']
+    for shape, count in Counter(map(statement_shape, statements)).most_common():
+        if count < threshold:
+            break
+        print(f"WARNING: {route} ran the same statement {count} times (possible N+1): {shape[:300]}")
+
+    view = app.view_functions.get(request.endpoint)
+    budget = getattr(view, 'query_budget', None)
+    if budget is not None and len(statements) > budget:
+        message = f"{route} issued {len(statements)} SQL statements, budget is {budget}"
+        print(f"WARNING: {message}")
+        for statement in statements:
+            print(f"    {_WHITESPACE.sub(' ', statement)[:300]}")
+        if app.config['QUERY_BUDGET_ENFORCE']:
+            raise QueryBudgetExceeded(message)
+
+    return response
+
+
+def init_query_budget(app, *engines):
+    """Record per-request SQL for `app` when QUERY_DEBUG is set"""
+    if not app.config['QUERY_DEBUG']:
+        return
+
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+    for engine in engines:
+        record_engine(engine)
+
+
+def record_engine(engine):
+    """Record `engine`'s statements per request; init_query_budget does this for the app's engines"""
+    event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
@@ -0,0 +1,63 @@
+import re
+from sqlalchemy import text
+
+# Tables whose hot-path queries must be answered from an index
+CHECKED_TABLES = ('books', 'reservations', 'users')
+
+SQLITE_FULL_SCAN = re.compile(r'^SCAN (\w+)$')
+POSTGRES_FULL_SCAN = re.compile(r'Seq Scan on (\w+)')
+
+
+def _compile(statement, dialect):
+    compiled = statement.compile(dialect=dialect, compile_kwargs={'render_postcompile': True})
+    params = compiled.params
+    if compiled.positional:
+        params = tuple(params[name] for name in compiled.positiontup)
+    return compiled.string, params
+
+
+def explain(engine, statement):
+    """Return the query plan for `statement` as a list of lines.
+
+    Uses EXPLAIN QUERY PLAN on SQLite and EXPLAIN on Postgres. On Postgres
+    sequential scans are disabled for the check so the plan reflects which
+    indexes exist rather than the planner's preference on a small table.
+    """
+    sql, params = _compile(statement, engine.dialect)
+
+    with engine.connect() as conn:
+        if engine.dialect.name == 'sqlite':
+            rows = conn.exec_driver_sql(f'EXPLAIN QUERY PLAN {sql}', params).all()
+            return [row[-1] for row in rows]
+
+        with conn.begin():
+            conn.execute(text('SET LOCAL enable_seqscan = off'))
+            rows = conn.exec_driver_sql(f'EXPLAIN {sql}', params).all()
+            return [row[0] for row in rows]
+
+
+def full_scans(engine, plan):
+    """Tables from CHECKED_TABLES that `plan` reads with a full table scan"""
+    pattern = SQLITE_FULL_SCAN if engine.dialect.name == 'sqlite' else POSTGRES_FULL_SCAN
+    tables = []
+    for line in plan:
+        match = pattern.search(line.strip())
+        if match and match.group(1) in CHECKED_TABLES:
+            tables.append(match.group(1))
+    return tables
+
+
+def check_query_plans(engine, queries, verbose=False):
+    """EXPLAIN each named query and return {name: [tables fully scanned]} for failures"""
+    failures = {}
+    for name, statement in queries:
+        plan = explain(engine, statement)
+        scanned = full_scans(engine, plan)
+        if scanned:
+            failures[name] = scanned
+        if verbose or scanned:
+            status = 'FULL SCAN' if scanned else 'ok'
+            print(f"[{status}] {name}")
+            for line in plan:
+                print(f"    {line}")
+    return failures
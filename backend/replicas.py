@@ -0,0 +1,175 @@
+import hashlib
+import os
+import random
+import time
+from contextvars import ContextVar
+from functools import wraps
+from flask import current_app, g, request
+from flask_jwt_extended import get_jwt_identity, verify_jwt_in_request
+from flask_sqlalchemy.session import Session
+from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import DBAPIError
+from database import engine_options, init_engine
+
+# Read-only catalog routes decorated with @read_replica run their queries on
+# one of DATABASE_REPLICA_URLS. Everything else, and every flush, stays on the
+# primary. A user who has just written reads from the primary until replicas
+# have caught up: the pin is kept server-side per JWT identity, since the
+# frontend calls the API cross-origin without cookies. A replica that errors
+# is skipped for REPLICA_RETRY_SECONDS and the request is retried on the primary.
+
+READ_METHODS = frozenset(('GET', 'HEAD', 'OPTIONS'))
+
+# The replica engine the current request reads from, if any
+_replica = ContextVar('read_replica', default=None)
+
+
+class RoutingSession(Session):
+    """Session that sends reads to the request's replica while one is selected"""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and not self._flushing:
+            replica = _replica.get()
+            if replica is not None:
+                return replica
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+class ReplicaSet:
+    """Replica engines with a per-engine "down until" time"""
+
+    def __init__(self, engines, retry_seconds):
+        self.engines = engines
+        self.retry_seconds = retry_seconds
+        self._down_until = {}
+
+    def choose(self):
+        now = time.monotonic()
+        healthy = [engine for engine in self.engines if self._down_until.get(engine, 0) <= now]
+        return random.choice(healthy) if healthy else None
+
+    def mark_down(self, engine, exc):
+        self._down_until[engine] = time.monotonic() + self.retry_seconds
+        url = engine.url.render_as_string(hide_password=True)
+        print(f"WARNING: read replica {url} failed, using the primary for "
+              f"{self.retry_seconds}s: {exc}")
+
+    def status(self):
+        now = time.monotonic()
+        return [
+            {'url': engine.url.render_as_string(hide_password=True),
+             'healthy': self._down_until.get(engine, 0) <= now}
+            for engine in self.engines
+        ]
+
+
+class PrimaryPins:
+    """Per-user "read from the primary until" times shared by every worker.
+
+    One empty file per identity whose mtime is the time the pin ends, so a
+    pin costs a utime() and a check costs a stat(), with no locking.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, identity):
+        return os.path.join(self.directory, hashlib.sha256(str(identity).encode()).hexdigest()[:32])
+
+    def pin(self, identity, seconds):
+        path = self._path(identity)
+        until = time.time() + seconds
+        open(path, 'a').close()
+        os.utime(path, (until, until))
+
+    def pinned(self, identity):
+        try:
+            return os.stat(self._path(identity)).st_mtime > time.time()
+        except FileNotFoundError:
+            return False
+
+
+def _identity():
+    """The request's JWT identity, or None when it has no valid token"""
+    try:
+        verify_jwt_in_request(optional=True)
+        return get_jwt_identity()
+    except Exception:
+        return None
+
+
+def pinned_to_primary():
+    """True while the requesting user must read their own writes from the primary"""
+    identity = _identity()
+    return identity is not None and current_app.extensions['primary_pins'].pinned(identity)
+
+
+def _after_request(response):
+    # Pin this user to the primary until their write has reached the replicas
+    if request.method not in READ_METHODS and response.status_code < 400:
+        identity = _identity()
+        if identity is not None:
+            current_app.extensions['primary_pins'].pin(identity, current_app.config['REPLICA_STICKY_SECONDS'])
+    return response
+
+
+def read_replica(fn):
+    """Run a read-only view against a read replica when one is configured and healthy"""
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        replicas = current_app.extensions.get('read_replicas')
+        if replicas is None or request.method not in READ_METHODS or pinned_to_primary():
+            return fn(*args, **kwargs)
+
+        engine = replicas.choose()
+        if engine is None:
+            return fn(*args, **kwargs)
+
+        db = current_app.extensions['sqlalchemy']
+        token = _replica.set(engine)
+        g.read_replica = True
+        try:
+            return fn(*args, **kwargs)
+        except DBAPIError as exc:
+            replicas.mark_down(engine, exc)
+        finally:
+            _replica.reset(token)
+
+        # Fail back: drop the replica connection and answer from the primary
+        db.session.rollback()
+        g.read_replica = False
+        return fn(*args, **kwargs)
+
+    return wrapper
+
+
+def served_from_replica():
+    """True when the current request's reads went to a replica"""
+    return g.get('read_replica', False)
+
+
+def init_replicas(app):
+    """Create engines for DATABASE_REPLICA_URLS and return them (empty when unset)"""
+    urls = app.config['DATABASE_REPLICA_URLS']
+    if not urls:
+        return []
+
+    engines = []
+    for url in urls:
+        url = make_url(url)
+        if url.get_backend_name() == 'sqlite' and url.database and not os.path.isabs(url.database):
+            # Relative SQLite paths live in the instance folder, as Flask-SQLAlchemy does for the primary
+            url = url.set(database=os.path.join(app.instance_path, url.database))
+        config = dict(app.config, SQLALCHEMY_DATABASE_URI=url)
+        engine = create_engine(url, **engine_options(config))
+        init_engine(engine, config)
+        engines.append(engine)
+
+    app.extensions['read_replicas'] = ReplicaSet(engines, app.config['REPLICA_RETRY_SECONDS'])
+    app.extensions['primary_pins'] = PrimaryPins(
+        app.config.get('REPLICA_STICKY_DIR') or os.path.join(app.instance_path, 'replica_pins')
+    )
+    app.after_request(_after_request)
+    return engines
@@ -0,0 +1,193 @@
+import threading
+import time
+from datetime import datetime, timedelta
+from flask import current_app
+from models import db, Book, Reservation
+from pagination import parse_limit
+
+# Summary of the reservation history for the teacher dashboard, computed with
+# a handful of aggregate queries instead of serializing every reservation.
+# Results are cached per worker for RESERVATION_STATS_CACHE_SECONDS and keyed
+# by the catalog version, which every reservation write bumps, so a change
+# shows up on the next request. The TTL only bounds how late a pending
+# reservation is reported as overdue once its expiry window passes.
+
+DEFAULT_DAYS = 30
+MAX_DAYS = 365
+DEFAULT_TOP = 10
+MAX_TOP = 50
+# Rows listed under checked_out and overdue_pickups; the counts cover all of them
+LIST_LIMIT = 20
+
+
+class StatsCache:
+    """Thread-safe map of key -> (expires_at, value) with a fixed TTL"""
+
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] <= now:
+                return None
+            return entry[1]
+
+    def put(self, key, value):
+        now = time.monotonic()
+        with self._lock:
+            # Entries for older catalog versions are never read again
+            self._entries = {k: entry for k, entry in self._entries.items() if entry[0] > now and k[0] == key[0]}
+            self._entries[key] = (now + self.ttl, value)
+
+
+def parse_stats_args(args):
+    """(days, top) from the query string; raises ValueError"""
+    try:
+        days = parse_limit(args.get('days'), DEFAULT_DAYS, MAX_DAYS)
+    except ValueError:
+        raise ValueError('days must be an integer')
+    try:
+        top = parse_limit(args.get('top'), DEFAULT_TOP, MAX_TOP)
+    except ValueError:
+        raise ValueError('top must be an integer')
+    return days, top
+
+
+def status_counts_query():
+    """Reservations per stored status, split on whether a pending one is past the expiry window"""
+    return (
+        db.select(
+            Reservation.status,
+            db.case((Reservation.effectively_expired(), 1), else_=0).label('overdue'),
+            db.func.count()
+        )
+        .group_by(Reservation.status, 'overdue')
+    )
+
+
+def status_counts():
+    """Reservations per effective status, and how many pending ones are overdue for pickup"""
+    rows = db.session.execute(status_counts_query()).all()
+
+    counts = dict.fromkeys(Reservation.STATUSES, 0)
+    overdue_count = 0
+    for status, is_overdue, count in rows:
+        if is_overdue:
+            overdue_count += count
+            status = 'expired'
+        counts[status] = counts.get(status, 0) + count
+    return counts, overdue_count
+
+
+def checked_out_query():
+    """Copies picked up and not yet returned, most recent first"""
+    return (
+        db.select(
+            Reservation.id, Reservation.book_id, Book.title, Reservation.user_name,
+            Reservation.reservation_date, db.func.count().over().label('total')
+        )
+        .join(Book, Book.id == Reservation.book_id)
+        .where(Reservation.status == 'picked_up')
+        .order_by(Reservation.reservation_date.desc())
+        .limit(LIST_LIMIT)
+    )
+
+
+def overdue_query():
+    """Pending reservations past the expiry window, oldest first"""
+    return (
+        db.select(Reservation.id, Reservation.book_id, Book.title, Reservation.user_name,
+                  Reservation.user_email, Reservation.reservation_date)
+        .join(Book, Book.id == Reservation.book_id)
+        .where(Reservation.effectively_expired())
+        .order_by(Reservation.reservation_date)
+        .limit(LIST_LIMIT)
+    )
+
+
+def per_day_query(since):
+    day = db.func.date(Reservation.reservation_date)
+    return (
+        db.select(day.label('day'), db.func.count())
+        .where(Reservation.reservation_date >= since)
+        .group_by(day)
+    )
+
+
+def top_borrowers_query(since, top):
+    """Students with the most picked-up (including since returned) reservations since `since`.
+
+    Filtered on the role recorded with each reservation, so teachers' own
+    borrowing does not crowd students out of the list.
+    """
+    count = db.func.count()
+    return (
+        db.select(Reservation.user_email, db.func.max(Reservation.user_name),
+                  db.func.max(Reservation.user_id), count)
+        .where(Reservation.status.in_(('picked_up', 'returned')), Reservation.reservation_date >= since,
+               Reservation.user_role == 'student')
+        .group_by(Reservation.user_email)
+        .order_by(count.desc(), Reservation.user_email)
+        .limit(top)
+    )
+
+
+def compute_stats(days, top):
+    """The dashboard summary over the last `days` days, in five queries"""
+    now = datetime.utcnow()
+    since = (now - timedelta(days=days - 1)).replace(hour=0, minute=0, second=0, microsecond=0)
+
+    counts, overdue_count = status_counts()
+    checked_out = db.session.execute(checked_out_query()).all()
+    overdue = db.session.execute(overdue_query()).all()
+    per_day = {str(day)[:10]: count for day, count in db.session.execute(per_day_query(since))}
+    borrowers = db.session.execute(top_borrowers_query(since, top)).all()
+
+    dates = [(since + timedelta(days=i)).date().isoformat() for i in range(days)]
+    return {
+        'generated_at': now.isoformat(),
+        'window_days': days,
+        'total': sum(counts.values()),
+        'by_status': counts,
+        'checked_out': {
+            'count': checked_out[0].total if checked_out else 0,
+            'reservations': [
+                {'reservation_id': row.id, 'book_id': row.book_id, 'book_title': row.title,
+                 'user_name': row.user_name, 'reservation_date': row.reservation_date.isoformat()}
+                for row in checked_out
+            ],
+        },
+        'overdue_pickups': {
+            'count': overdue_count,
+            'reservations': [
+                {'reservation_id': row.id, 'book_id': row.book_id, 'book_title': row.title,
+                 'user_name': row.user_name, 'user_email': row.user_email,
+                 'reservation_date': row.reservation_date.isoformat()}
+                for row in overdue
+            ],
+        },
+        'per_day': [{'date': date, 'count': per_day.get(date, 0)} for date in dates],
+        'top_borrowers': [
+            {'user_id': user_id, 'user_name': user_name, 'user_email': user_email, 'count': count}
+            for user_email, user_name, user_id, count in borrowers
+        ],
+    }
+
+
+def reservation_stats(days, top):
+    """compute_stats(), served from this worker's cache while it is fresh"""
+    cache = current_app.extensions['reservation_stats_cache']
+    key = (current_app.extensions['catalog_version'].current(), days, top)
+    stats = cache.get(key)
+    if stats is None:
+        stats = compute_stats(days, top)
+        cache.put(key, stats)
+    return stats
+
+
+def init_reservation_stats(app):
+    app.extensions['reservation_stats_cache'] = StatsCache(app.config['RESERVATION_STATS_CACHE_SECONDS'])
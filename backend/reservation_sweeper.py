@@ -0,0 +1,89 @@
+import os
+import random
+import threading
+import time
+from monitoring import capture_exception
+
+try:
+    import fcntl
+except ImportError:  # Windows: single-process development server only
+    fcntl = None
+
+# Pending reservations past RESERVATION_EXPIRY_DAYS keep their copies off the
+# shelf until the expiry sweep runs. Every process runs it on a daemon thread
+# about every RESERVATION_SWEEP_SECONDS. The thread starts on the process's
+# first request, so under gunicorn --preload it lives in each worker rather
+# than in the master. Workers share a lock file recording the last sweep, so
+# the host sweeps roughly once per interval however many workers it runs.
+
+
+class ReservationSweeper:
+    def __init__(self, app, sweep, interval, lock_path):
+        self.app = app
+        self.sweep = sweep
+        self.interval = interval
+        self.lock_path = lock_path
+        self._pid = None
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(lock_path)), exist_ok=True)
+
+    def ensure_started(self):
+        """Start this process's sweep thread unless it is already running"""
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            # A forked worker inherits _pid from the master but not its threads
+            self._pid = os.getpid()
+            threading.Thread(target=self._run, name='reservation-sweeper', daemon=True).start()
+
+    def _run(self):
+        while True:
+            # Jittered, so workers started together do not all wake at once
+            time.sleep(self.interval * random.uniform(0.5, 1.5))
+            try:
+                self.run_once()
+            except Exception as e:
+                print(f"WARNING: reservation expiry sweep failed: {e}")
+                capture_exception(e)
+
+    def run_once(self):
+        """Sweep unless another process has within the last interval; returns the count or None"""
+        with open(self.lock_path, 'a+') as lock:
+            if fcntl:
+                try:
+                    fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    return None
+            try:
+                lock.seek(0)
+                try:
+                    last = float(lock.read())
+                except ValueError:
+                    last = 0.0
+                if time.time() - last < self.interval:
+                    return None
+
+                with self.app.app_context():
+                    count = self.sweep()
+                lock.seek(0)
+                lock.truncate()
+                lock.write(str(time.time()))
+                lock.flush()
+                return count
+            finally:
+                if fcntl:
+                    fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def init_reservation_sweeper(app, sweep):
+    """Run `sweep` periodically in every process serving `app`, unless RESERVATION_SWEEP_SECONDS is 0"""
+    interval = app.config['RESERVATION_SWEEP_SECONDS']
+    if interval <= 0:
+        return
+
+    lock_path = app.config.get('RESERVATION_SWEEP_LOCK_FILE') or os.path.join(app.instance_path, 'reservation_sweep')
+    sweeper = ReservationSweeper(app, sweep, interval, lock_path)
+    app.extensions['reservation_sweeper'] = sweeper
+    app.before_request(sweeper.ensure_started)
@@ -0,0 +1,274 @@
+import html
+import re
+from contextlib import contextmanager
+from sqlalchemy import Integer, column, text
+from database import backend_name
+from models import db, Book
+
+# Full-text search over title, author and description.
+#
+# SQLite uses an external-content FTS5 table kept in sync by triggers, and
+# Postgres uses a generated tsvector column with a GIN index. Both are
+# maintained by the database itself, so every write path (create_book,
+# update_book, delete_book, seed.py, cascades) stays in sync without extra
+# application code.
+
+# The database marks matches with control characters that cannot come from
+# HTML; the snippet text is escaped and only then are they turned into
+# <mark> tags, so a book description can never inject markup.
+SNIPPET_START = '\x02'
+SNIPPET_END = '\x03'
+
+SQLITE_DDL = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS books_fts USING fts5(
+        title, author, description,
+        content='books', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2',
+        prefix='2 3'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS books_fts_ai AFTER INSERT ON books BEGIN
+        INSERT INTO books_fts(rowid, title, author, description)
+        VALUES (new.id, new.title, new.author, new.description);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS books_fts_ad AFTER DELETE ON books BEGIN
+        INSERT INTO books_fts(books_fts, rowid, title, author, description)
+        VALUES ('delete', old.id, old.title, old.author, old.description);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS books_fts_au AFTER UPDATE OF title, author, description ON books BEGIN
+        INSERT INTO books_fts(books_fts, rowid, title, author, description)
+        VALUES ('delete', old.id, old.title, old.author, old.description);
+        INSERT INTO books_fts(rowid, title, author, description)
+        VALUES (new.id, new.title, new.author, new.description);
+    END
+    """,
+]
+
+POSTGRES_DDL = [
+    """
+    ALTER TABLE books ADD COLUMN IF NOT EXISTS search_vector tsvector
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('english', coalesce(title, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(author, '')), 'B') ||
+        setweight(to_tsvector('english', coalesce(description, '')), 'C')
+    ) STORED
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_books_search_vector ON books USING GIN (search_vector)",
+]
+
+
+def detect_search_backend(app):
+    """Record in app.extensions['search_backend'] the backend init_db sets up, without connecting.
+
+    Runs when the app is built, so workers know which query to run before
+    they touch the database. The index itself is created by ensure_search_index().
+    """
+    backend = 'ilike'
+    if app.config.get('SEARCH_BACKEND', 'fulltext') == 'fulltext':
+        dialect = backend_name(app.config)
+        if dialect == 'sqlite' and _sqlite_has_fts5():
+            backend = 'fts5'
+        elif dialect == 'postgresql':
+            backend = 'tsvector'
+
+    app.extensions['search_backend'] = backend
+    return backend
+
+
+def _sqlite_has_fts5():
+    import sqlite3
+    conn = sqlite3.connect(':memory:')
+    try:
+        conn.execute("CREATE VIRTUAL TABLE probe USING fts5(x)")
+        return True
+    except sqlite3.OperationalError:
+        return False
+    finally:
+        conn.close()
+
+
+def ensure_search_index(app):
+    """Create the full-text index for the configured database if it is missing.
+
+    Records the effective backend in app.extensions['search_backend']: 'fts5',
+    'tsvector' or 'ilike' (when disabled in Config or unsupported).
+    """
+    backend = 'ilike'
+
+    if app.config.get('SEARCH_BACKEND', 'fulltext') == 'fulltext':
+        dialect = db.engine.dialect.name
+        try:
+            if dialect == 'sqlite':
+                _create_sqlite_index()
+                backend = 'fts5'
+            elif dialect == 'postgresql':
+                with db.engine.begin() as conn:
+                    for statement in POSTGRES_DDL:
+                        conn.execute(text(statement))
+                backend = 'tsvector'
+        except Exception as e:
+            print(f"WARNING: Full-text search unavailable, falling back to ILIKE "
+                  f"(set SEARCH_BACKEND=ilike for the app as well): {e}")
+
+    app.extensions['search_backend'] = backend
+    return backend
+
+
+def _create_sqlite_index():
+    with db.engine.begin() as conn:
+        exists = conn.execute(text(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'books_fts'"
+        )).first()
+
+        for statement in SQLITE_DDL:
+            conn.execute(text(statement))
+
+        # Index rows that were written before the FTS table existed
+        if not exists:
+            conn.execute(text("INSERT INTO books_fts(books_fts) VALUES ('rebuild')"))
+
+
+@contextmanager
+def deferred_search_index(app):
+    """Bulk-load books without per-row FTS maintenance, then index them in one pass.
+
+    On SQLite the insert trigger is dropped for the duration and the FTS
+    table rebuilt afterwards, which is several times faster than updating it
+    row by row. Other backends maintain their index as usual.
+    """
+    if app.extensions.get('search_backend') != 'fts5':
+        yield
+        return
+
+    with db.engine.begin() as conn:
+        conn.execute(text("DROP TRIGGER IF EXISTS books_fts_ai"))
+    try:
+        yield
+    finally:
+        with db.engine.begin() as conn:
+            conn.execute(text("INSERT INTO books_fts(books_fts) VALUES ('rebuild')"))
+        _create_sqlite_index()
+
+
+def drop_search_index():
+    """Remove the SQLite FTS table (Postgres drops its column with books)"""
+    if db.engine.dialect.name == 'sqlite':
+        with db.engine.begin() as conn:
+            conn.execute(text("DROP TABLE IF EXISTS books_fts"))
+
+
+def _tokens(term):
+    return re.findall(r'\w+', term.lower())
+
+
+def _match_expression(backend, tokens):
+    """Turn search tokens into a prefix-matching full-text query"""
+    if backend == 'fts5':
+        return ' AND '.join(f'"{token}"*' for token in tokens)
+    return ' & '.join(f'{token}:*' for token in tokens)
+
+
+def _ilike_filter(term):
+    search_filter = f"%{term}%"
+    return (Book.title.ilike(search_filter)) | (Book.author.ilike(search_filter))
+
+
+def search_filter(backend, term):
+    """WHERE clause restricting a Book query to rows matching `term`"""
+    tokens = _tokens(term)
+    if backend == 'ilike' or not tokens:
+        return _ilike_filter(term)
+
+    match = _match_expression(backend, tokens)
+    if backend == 'fts5':
+        matching_ids = text(
+            "SELECT rowid FROM books_fts WHERE books_fts MATCH :match"
+        ).bindparams(match=match).columns(column('rowid', Integer))
+        return Book.id.in_(matching_ids)
+
+    return text(
+        "books.search_vector @@ to_tsquery('english', :match)"
+    ).bindparams(match=match)
+
+
+def render_snippet(snippet):
+    """HTML-escape a database snippet and wrap its marked matches in <mark> tags"""
+    if snippet is None:
+        return None
+    return html.escape(snippet).replace(SNIPPET_START, '<mark>').replace(SNIPPET_END, '</mark>')
+
+
+def search_books(backend, term, limit, genre=None, available_only=False):
+    """Relevance-ranked search.
+
+    Returns a list of (book, rank, snippet) tuples, best match first. Higher
+    rank is better; snippets are HTML-escaped text with matched terms
+    wrapped in <mark> tags.
+    """
+    tokens = _tokens(term)
+    if not tokens:
+        return []
+
+    if backend == 'ilike':
+        query = Book.query.filter(_ilike_filter(term))
+        if genre:
+            query = query.filter_by(genre=genre)
+        if available_only:
+            query = query.filter(Book.available)
+        books = query.order_by(Book.title, Book.id).limit(limit).all()
+        return [(book, None, None) for book in books]
+
+    filters = ''
+    params = {
+        'match': _match_expression(backend, tokens), 'limit': limit,
+        'start': SNIPPET_START, 'end': SNIPPET_END,
+        'headline_options': f'StartSel={SNIPPET_START}, StopSel={SNIPPET_END}, MaxWords=24, MinWords=8',
+    }
+    if genre:
+        filters += ' AND books.genre = :genre'
+        params['genre'] = genre
+    if available_only:
+        filters += ' AND books.available_copies > 0'
+
+    if backend == 'fts5':
+        # bm25() is lower-is-better; weights favour title over author over description
+        sql = f"""
+            SELECT books.id AS id,
+                   -bm25(books_fts, 10.0, 5.0, 1.0) AS rank,
+                   snippet(books_fts, -1, :start, :end, '…', 16) AS snippet
+            FROM books_fts
+            JOIN books ON books.id = books_fts.rowid
+            WHERE books_fts MATCH :match{filters}
+            ORDER BY bm25(books_fts, 10.0, 5.0, 1.0)
+            LIMIT :limit
+        """
+    else:
+        # Rank in the inner query so ts_headline only runs on the rows returned
+        sql = f"""
+            SELECT ranked.id AS id,
+                   ranked.rank AS rank,
+                   ts_headline('english', ranked.title || ' — ' || ranked.description, ranked.query,
+                               :headline_options) AS snippet
+            FROM (
+                SELECT books.id, books.title, books.description, query,
+                       ts_rank_cd(books.search_vector, query) AS rank
+                FROM books, to_tsquery('english', :match) AS query
+                WHERE books.search_vector @@ query{filters}
+                ORDER BY rank DESC, books.id
+                LIMIT :limit
+            ) AS ranked
+            ORDER BY ranked.rank DESC, ranked.id
+        """
+
+    rows = db.session.execute(text(sql), params).all()
+    if not rows:
+        return []
+
+    books = {book.id: book for book in Book.query.filter(Book.id.in_([row.id for row in rows]))}
+    return [(books[row.id], row.rank, render_snippet(row.snippet)) for row in rows if row.id in books]
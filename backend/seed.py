@@ -1,8 +1,8 @@
-import os
-from app import app, db
+from app import app, db, init_db
 from models import Book, User
-import requests
-import time
+from catalog_cache import bump_catalog_version
+from google_books import GoogleBooksClient
+from passwords import hash_password
 
 # Initial book data
 books_data = [
@@ -128,54 +128,6 @@ books_data = [
     }
 ]
 
-def fetch_book_from_google_api(isbn):
-    """Fetch book information from Google Books API"""
-    try:
-        # Clean ISBN
-        clean_isbn = isbn.replace('-', '').replace(' ', '')
-
-        # Call Google Books API
-        api_key = os.environ.get('GOOGLE_BOOKS_API_KEY', '')
-        url = f"https://www.googleapis.com/books/v1/volumes?q=isbn:{clean_isbn}"
-        if api_key:
-            url += f"&key={api_key}"
-        response = requests.get(url, timeout=5)
-
-        if response.status_code != 200:
-            return None
-
-        data = response.json()
-
-        if data.get('totalItems', 0) == 0:
-            return None
-
-        book = data['items'][0]['volumeInfo']
-
-        # Extract information
-        genre = book.get('categories', ['Unknown'])[0] if book.get('categories') else 'Unknown'
-        year = book.get('publishedDate', '').split('-')[0] if book.get('publishedDate') else ''
-
-        # Get the best quality cover image
-        cover_image = ''
-        if book.get('imageLinks'):
-            cover_image = (book['imageLinks'].get('large') or
-                          book['imageLinks'].get('medium') or
-                          book['imageLinks'].get('thumbnail') or
-                          book['imageLinks'].get('smallThumbnail') or '')
-
-        return {
-            'title': book.get('title', ''),
-            'author': ', '.join(book.get('authors', [])) if book.get('authors') else '',
-            'genre': genre,
-            'year': int(year) if year.isdigit() else 0,
-            'description': book.get('description', ''),
-            'cover': cover_image
-        }
-    except Exception as e:
-        print(f"  Warning: Could not fetch data for ISBN {isbn}: {str(e)}")
-        return None
-
-
 def seed_database():
     """Seed the database with initial book data"""
     with app.app_context():
@@ -183,16 +135,18 @@ def seed_database():
         print("Clearing existing data...")
         Book.query.delete()
 
-        # Add books
+        # Fetch every ISBN concurrently (rate limited, cached on disk)
         print("Adding books with data from Google Books API...")
+        client = GoogleBooksClient.from_config(app.config)
+        fetched = client.fetch_many([book_data['isbn'] for book_data in books_data])
+
         for book_data in books_data:
             isbn = book_data['isbn']
             room_number = book_data.get('room_number', '')
 
-            print(f"  Fetching data for ISBN {isbn}...")
+            print(f"  Fetched data for ISBN {isbn}...")
 
-            # Fetch from Google Books API
-            api_data = fetch_book_from_google_api(isbn)
+            api_data = fetched[isbn]
 
             if api_data and api_data.get('title'):
                 # Use API data, but keep room_number from our data
@@ -215,10 +169,8 @@ def seed_database():
             book = Book(**final_data)
             db.session.add(book)
 
-            # Small delay to avoid rate limiting
-            time.sleep(0.2)
-
         db.session.commit()
+        bump_catalog_version()
         print(f"\n✓ Successfully added {len(books_data)} books to the database!")
 
         # Print summary
@@ -237,23 +189,26 @@ def seed_users():
             print("Test users already exist. Skipping user seed.")
             return
 
+        # One hash for both accounts; bcrypt at full cost is the slow part
+        password_hash = hash_password('password123')
+
         # Create a test student
         student = User(
             username='student1',
             email='student@library.com',
             full_name='Test Student',
-            role='student'
+            role='student',
+            password_hash=password_hash
         )
-        student.set_password('password123')
 
         # Create a test teacher
         teacher = User(
             username='teacher1',
             email='teacher@library.com',
             full_name='Test Teacher',
-            role='teacher'
+            role='teacher',
+            password_hash=password_hash
         )
-        teacher.set_password('password123')
 
         db.session.add(student)
         db.session.add(teacher)
@@ -265,5 +220,6 @@ def seed_users():
 
 
 if __name__ == '__main__':
+    init_db(app)
     seed_database()
     seed_users()
@@ -0,0 +1,35 @@
+from sqlalchemy.orm import load_only
+
+
+def parse_fields(value, allowed):
+    """Parse a comma-separated ?fields= list against `allowed`.
+
+    Returns None when the parameter is absent (serialize everything), else the
+    requested fields in request order with 'id' always first. Raises
+    ValueError naming any unknown field.
+    """
+    if value is None:
+        return None
+
+    requested = [field.strip() for field in value.split(',') if field.strip()]
+    unknown = [field for field in requested if field not in allowed]
+    if unknown:
+        raise ValueError(f"Unknown field(s): {', '.join(unknown)}. Allowed: {', '.join(allowed)}")
+
+    fields = ['id']
+    for field in requested:
+        if field not in fields:
+            fields.append(field)
+    return fields
+
+
+def load_only_fields(model, fields, extra=()):
+    """A load_only() option that SELECTs just the columns `fields` serialize from.
+
+    `extra` names further columns the caller reads itself (e.g. a keyset
+    pagination cursor), so touching them does not trigger a lazy load per row.
+    """
+    columns = set(extra)
+    for field in fields:
+        columns.update(model.FIELD_COLUMNS.get(field, (field,)))
+    return load_only(*(getattr(model, column) for column in sorted(columns)))
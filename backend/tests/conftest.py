@@ -0,0 +1,99 @@
+import os
+import sys
+import tempfile
+
+# config.py reads the environment at import time. Keep Sentry and metrics
+# off, enforce query budgets and point anything that builds the default app
+# (asgi.py) at a throwaway database, before any backend module is imported.
+_workdir = tempfile.mkdtemp(prefix='virtual-library-tests-')
+os.environ.update({
+    'SENTRY_DSN': '',
+    'SENTRY_TRACES_SAMPLE_RATE': '0',
+    'SENTRY_PROFILE_SAMPLE_RATE': '0',
+    'METRICS_ENABLED': 'false',
+    'DATABASE_URL': f"sqlite:///{os.path.join(_workdir, 'default.db')}",
+    'CATALOG_VERSION_FILE': os.path.join(_workdir, 'catalog_version'),
+    'RESERVATION_SWEEP_SECONDS': '0',
+    'BCRYPT_MAX_CONCURRENT': '0',
+    'BCRYPT_LOG_ROUNDS': '4',
+    'QUERY_DEBUG': 'true',
+    'QUERY_BUDGET_ENFORCE': 'true',
+})
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+from flask_jwt_extended import create_access_token
+from app import create_app, init_db
+from config import Config
+from models import db, Book, Reservation, User
+
+
+def make_config(tmp_path, **overrides):
+    """Config for one test: its own SQLite file and catalog version, budgets enforced"""
+    settings = dict(
+        TESTING=True,
+        SQLALCHEMY_DATABASE_URI=f"sqlite:///{tmp_path / 'test.db'}",
+        CATALOG_VERSION_FILE=str(tmp_path / 'catalog_version'),
+        SENTRY_DSN='',
+        METRICS_ENABLED=False,
+        ADMISSION_CONTROL_ENABLED=False,
+        RESERVATION_SWEEP_SECONDS=0,
+        BCRYPT_MAX_CONCURRENT=0,
+        BCRYPT_LOG_ROUNDS=4,
+        QUERY_DEBUG=True,
+        QUERY_BUDGET_ENFORCE=True,
+    )
+    settings.update(overrides)
+    return type('TestConfig', (Config,), settings)
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = create_app(make_config(tmp_path))
+    init_db(app)
+    yield app
+    with app.app_context():
+        db.engine.dispose()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+def add_user(app, username, role='student', password=None):
+    """Insert a user and return (id, Authorization headers)"""
+    with app.app_context():
+        user = User(username=username, email=f'{username}@example.com', full_name=username.title(), role=role)
+        if password:
+            user.set_password(password)
+        else:
+            user.password_hash = 'unused'
+        db.session.add(user)
+        db.session.commit()
+        return user.id, {'Authorization': f'Bearer {create_access_token(identity=str(user.id))}'}
+
+
+def add_books(app, count, copies=1, genre='Fiction'):
+    """Insert `count` books with `copies` copies each and return their ids"""
+    with app.app_context():
+        books = [
+            Book(title=f'Book {i:04d}', author=f'Author {i % 7}', genre=genre, year=1990 + i % 30,
+                 isbn=f'isbn-{genre}-{i}', description='A book', total_copies=copies, available_copies=copies)
+            for i in range(count)
+        ]
+        db.session.add_all(books)
+        db.session.commit()
+        return [book.id for book in books]
+
+
+def add_reservations(app, user_id, book_ids, status='picked_up'):
+    """Insert one reservation of each book by `user_id`, taking a copy when the status holds one"""
+    with app.app_context():
+        user = db.session.get(User, user_id)
+        for book_id in book_ids:
+            db.session.add(Reservation(book_id=book_id, user_id=user.id, user_name=user.full_name,
+                                       user_email=user.email, user_role=user.role, status=status))
+            if status in Reservation.HOLDS_COPY:
+                db.session.get(Book, book_id).available_copies -= 1
+        db.session.commit()
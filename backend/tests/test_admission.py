@@ -0,0 +1,67 @@
+import pytest
+from admission import AdmissionControl, MemoryBackend, POLICIES, Policy
+from app import create_app, init_db
+from conftest import add_books, add_user, make_config
+
+
+def strict_admission(app, **limits):
+    """Replace `app`'s admission control with fresh state and only the given limits"""
+    config = dict(app.config)
+    for policy in POLICIES:
+        prefix = f'ADMISSION_{policy.upper()}_'
+        config.update({prefix + 'IP_RATE': 0, prefix + 'USER_RATE': 0, prefix + 'CONCURRENCY': 8})
+    config.update(limits)
+    app.extensions['admission'] = AdmissionControl(
+        MemoryBackend(), {name: Policy(name, config) for name in POLICIES}
+    )
+
+
+def test_failed_logins_only_lock_out_their_own_address(app, client):
+    add_user(app, 'student', password='password123')
+    strict_admission(app, ADMISSION_LOGIN_USER_RATE=0.001, ADMISSION_LOGIN_USER_BURST=2)
+
+    def login(password, address):
+        return client.post('/api/auth/login', json={'username': 'student', 'password': password},
+                           environ_base={'REMOTE_ADDR': address})
+
+    assert [login('wrong-password', '10.0.0.1').status_code for _ in range(3)] == [401, 401, 429]
+    assert login('password123', '10.0.0.2').status_code == 200
+
+
+def test_per_process_limits_are_split_across_workers(tmp_path, capsys):
+    app = create_app(make_config(tmp_path, ADMISSION_CONTROL_ENABLED=True, ADMISSION_WORKERS=4,
+                                 ADMISSION_LOGIN_IP_RATE=2, ADMISSION_LOGIN_IP_BURST=60,
+                                 ADMISSION_LOGIN_CONCURRENCY=2))
+    login = app.extensions['admission'].policies['login']
+    assert (login.ip_rate, login.ip_burst, login.concurrency) == (0.5, 15, 1)
+    assert 'ADMISSION_REDIS_URL' in capsys.readouterr().out
+
+    app = create_app(make_config(tmp_path, ADMISSION_CONTROL_ENABLED=True, ADMISSION_WORKERS=1,
+                                 ADMISSION_LOGIN_IP_RATE=2, ADMISSION_LOGIN_IP_BURST=60))
+    login = app.extensions['admission'].policies['login']
+    assert (login.ip_rate, login.ip_burst) == (2, 60)
+
+
+def test_asgi_routes_are_admission_controlled(monkeypatch):
+    pytest.importorskip('starlette')
+    from starlette.testclient import TestClient
+    import asgi
+
+    init_db(asgi.app)
+    monkeypatch.setitem(asgi.app.extensions, 'admission', None)
+    strict_admission(asgi.app, ADMISSION_RESERVATIONS_USER_RATE=0.001, ADMISSION_RESERVATIONS_USER_BURST=1,
+                     ADMISSION_LOGIN_USER_RATE=0.001, ADMISSION_LOGIN_USER_BURST=1)
+    book_id = add_books(asgi.app, 1, genre='Admission')[0]
+    _, student = add_user(asgi.app, 'asgi-student', password='password123')
+
+    with TestClient(asgi.application) as client:
+        # Native async route
+        assert client.post('/api/reservations', headers=student, json={'book_id': book_id}).status_code == 201
+        response = client.post('/api/reservations', headers=student, json={'book_id': book_id})
+        assert response.status_code == 429
+        assert int(response.headers['Retry-After']) >= 1
+
+        # Login is the Flask view, mounted
+        body = {'username': 'asgi-student', 'password': 'password123'}
+        assert client.post('/api/auth/login', json=body).status_code == 200
+        assert client.post('/api/auth/login', json=body).status_code == 429
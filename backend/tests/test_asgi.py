@@ -0,0 +1,72 @@
+import shutil
+import pytest
+from sqlalchemy import create_engine, text
+from app import init_db
+from catalog_cache import bump_catalog_version
+from conftest import add_books, add_user
+from models import db
+from replicas import PrimaryPins, ReplicaSet
+
+pytest.importorskip('starlette')
+from starlette.testclient import TestClient  # noqa: E402
+import asgi  # noqa: E402
+
+ORIGIN = 'http://localhost:3000'
+
+
+@pytest.fixture
+def client():
+    init_db(asgi.app)
+    with TestClient(asgi.application) as client:
+        yield client
+
+
+def test_catalog_routes_use_the_cache_and_request_hooks(client):
+    book_id = add_books(asgi.app, 1, genre='Cached')[0]
+
+    response = client.get(f'/api/books/{book_id}', headers={'Origin': ORIGIN})
+    assert response.status_code == 200
+    assert response.headers['Access-Control-Allow-Origin'] in ('*', ORIGIN)
+    # Counted against the Flask view's @query_budget
+    assert response.headers['X-Query-Count'] == '1'
+
+    revalidated = client.get(f'/api/books/{book_id}', headers={'If-None-Match': response.headers['ETag']})
+    assert revalidated.status_code == 304
+    assert revalidated.headers['X-Query-Count'] == '0'
+
+    hit = client.get(f'/api/books/{book_id}')
+    assert hit.status_code == 200 and hit.headers['X-Query-Count'] == '0'
+    assert hit.content == response.content
+
+
+def test_catalog_reads_go_to_a_replica_unless_pinned(client, tmp_path, monkeypatch):
+    book_id = add_books(asgi.app, 1, genre='Replicated')[0]
+    student_id, student = add_user(asgi.app, 'replica-reader')
+    with asgi.app.app_context():
+        primary = db.engine.url.database
+        db.engine.dispose()
+    shutil.copy(primary, tmp_path / 'replica.db')
+
+    replica = create_engine(f"sqlite:///{tmp_path / 'replica.db'}")
+    with replica.begin() as conn:
+        conn.execute(text('UPDATE books SET title = :title WHERE id = :id'), {'title': 'On the replica', 'id': book_id})
+    replica_async = asgi.replica_engine(replica)
+    pins = PrimaryPins(str(tmp_path / 'pins'))
+    monkeypatch.setitem(asgi.app.extensions, 'read_replicas', ReplicaSet([replica], 30))
+    monkeypatch.setitem(asgi.app.extensions, 'primary_pins', pins)
+    monkeypatch.setitem(asgi.replica_engines, replica, replica_async)
+
+    def title(headers=None):
+        response = client.get(f'/api/books/{book_id}?fields=title', headers=headers)
+        assert response.status_code == 200
+        return response.json()['title']
+
+    try:
+        # As after a catalog write the replica has not caught up with yet
+        with asgi.app.app_context():
+            bump_catalog_version()
+        assert title() == 'On the replica'
+        pins.pin(str(student_id), 60)
+        assert title(student) == 'Book 0000'
+    finally:
+        replica.dispose()
@@ -0,0 +1,69 @@
+import pytest
+from conftest import add_user
+
+FULL_BOOK = {'title': 'Dune', 'author': 'Frank Herbert', 'genre': 'Science Fiction', 'year': 1965,
+             'description': 'Spice'}
+
+
+@pytest.mark.parametrize('isbn, error', [
+    (123, 'isbn must be a string'),
+    ('', 'isbn must not be empty'),
+    ('   ', 'isbn must not be empty'),
+    (None, 'Missing required field: isbn'),
+])
+def test_create_book_rejects_bad_isbn(app, client, isbn, error):
+    _, teacher = add_user(app, 'teacher', role='teacher')
+
+    response = client.post('/api/books', headers=teacher, json={'isbn': isbn})
+    assert response.status_code == 400
+    assert response.get_json() == {'error': error}
+
+    response = client.post('/api/books', headers=teacher, json=dict(FULL_BOOK, isbn=isbn))
+    assert response.status_code == 400
+    assert response.get_json() == {'error': error}
+
+
+def test_bulk_import_reports_isbn_errors_per_row(app, client):
+    _, teacher = add_user(app, 'teacher', role='teacher')
+
+    response = client.post('/api/books/bulk', headers=teacher, json=[
+        {'isbn': ''},
+        {'isbn': 9780441013593},
+        dict(FULL_BOOK, isbn=9780441013593),
+        {'room_number': '12'},
+        dict(FULL_BOOK, isbn='978-0441013593'),
+    ])
+    assert response.status_code == 200
+    body = response.get_json()
+    assert [(result['status'], result.get('error')) for result in body['results']] == [
+        ('invalid', 'isbn must not be empty'),
+        ('invalid', 'isbn must be a string'),
+        ('invalid', 'isbn must be a string'),
+        ('invalid', 'Missing required field: isbn'),
+        ('created', None),
+    ]
+    assert body['summary']['invalid'] == 4
+
+
+def test_isbns_are_stored_and_deduplicated_without_surrounding_whitespace(app, client):
+    _, teacher = add_user(app, 'teacher', role='teacher')
+
+    response = client.post('/api/books', headers=teacher, json=dict(FULL_BOOK, isbn=' 9780441013593\n'))
+    assert response.status_code == 201
+    assert response.get_json()['isbn'] == '9780441013593'
+
+    response = client.post('/api/books', headers=teacher, json=dict(FULL_BOOK, isbn='9780441013593 '))
+    assert response.status_code == 400
+    assert response.get_json() == {'error': 'Book with this ISBN already exists'}
+
+    response = client.post('/api/books/bulk', headers=teacher, json=[
+        dict(FULL_BOOK, isbn=' 9780441013593'),
+        dict(FULL_BOOK, isbn=' 9780132350884 '),
+    ])
+    assert [(result['status'], result['isbn']) for result in response.get_json()['results']] == [
+        ('skipped_duplicate', '9780441013593'),
+        ('created', '9780132350884'),
+    ]
+
+    response = client.post('/api/books', headers=teacher, json=dict(FULL_BOOK, isbn='9780132350884\t'))
+    assert response.status_code == 400
@@ -0,0 +1,101 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from urllib.parse import parse_qs, urlparse
+import pytest
+import enrichment
+from conftest import add_user
+from google_books import FIELD_LENGTHS, GoogleBooksClient
+
+# isbn -> (status, Google Books volumes response)
+VOLUMES = {
+    '9780000000001': (200, {'totalItems': 1, 'items': [{'volumeInfo': {
+        'title': 'T' * 300, 'authors': ['Ada Lovelace', 'Charles Babbage'], 'categories': ['Computing'],
+        'publishedDate': '1843-10-01', 'description': 'Notes',
+        'imageLinks': {'thumbnail': 'http://covers.example.com/' + 'x' * 600},
+    }}]}),
+    '9780000000002': (200, {'totalItems': 0}),
+    '9780000000003': (503, {}),
+}
+
+
+class GoogleBooksStub(BaseHTTPRequestHandler):
+    def do_GET(self):
+        isbn = parse_qs(urlparse(self.path).query)['q'][0].removeprefix('isbn:')
+        status, body = VOLUMES[isbn]
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def upstream():
+    """A GoogleBooksClient talking to a local stand-in for the volumes API"""
+    server = HTTPServer(('127.0.0.1', 0), GoogleBooksStub)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield GoogleBooksClient(f'http://127.0.0.1:{server.server_port}/volumes', rate_limit=1000)
+    server.shutdown()
+    server.server_close()
+
+
+def test_lookup_parses_volumes_and_fits_the_columns(upstream):
+    found = upstream.lookup('978-0-00-000000-1')
+    assert found['author'] == 'Ada Lovelace, Charles Babbage'
+    assert (found['genre'], found['year'], found['description']) == ('Computing', 1843, 'Notes')
+    assert found['title'] == 'T' * FIELD_LENGTHS['title']
+    # A truncated URL would point nowhere
+    assert found['cover'] == ''
+
+    assert upstream.lookup('9780000000002') is None
+    with pytest.raises(Exception):
+        upstream.lookup('9780000000003')
+
+    assert upstream.fetch_many(['9780000000002', '9780000000003']) == {
+        '9780000000002': None, '9780000000003': None,
+    }
+
+
+@pytest.mark.parametrize('isbn, status', [
+    ('9780000000001', 'complete'),
+    ('9780000000002', 'not_found'),
+    ('9780000000003', 'failed'),
+])
+def test_background_enrichment_updates_cached_catalog_reads(app, client, upstream, isbn, status):
+    _, teacher = add_user(app, 'teacher', role='teacher')
+    app.extensions['isbn_client'] = upstream
+
+    response = client.post('/api/books', headers=teacher, json={'isbn': isbn, 'room_number': 'A1'})
+    assert response.status_code == 202
+    book_id = response.get_json()['id']
+    # Caches the placeholder response
+    assert client.get(f'/api/books/{book_id}').get_json()['metadata_status'] == 'pending'
+
+    app.extensions['isbn_enrichment_pool'].shutdown(wait=True)
+
+    book = client.get(f'/api/books/{book_id}').get_json()
+    assert book['metadata_status'] == status
+    if status == 'complete':
+        assert book['author'] == 'Ada Lovelace, Charles Babbage'
+        assert len(book['title']) == FIELD_LENGTHS['title']
+
+
+def test_a_failed_write_marks_the_book_failed(app, client, upstream, monkeypatch):
+    _, teacher = add_user(app, 'teacher', role='teacher')
+    app.extensions['isbn_client'] = upstream
+
+    def store_metadata(isbn, fields):
+        raise ValueError('value too long for type character varying(200)')
+    monkeypatch.setattr(enrichment, 'store_metadata', store_metadata)
+
+    book_id = client.post('/api/books', headers=teacher, json={'isbn': '9780000000001'}).get_json()['id']
+    assert client.get(f'/api/books/{book_id}').get_json()['metadata_status'] == 'pending'
+    app.extensions['isbn_enrichment_pool'].shutdown(wait=True)
+
+    assert client.get(f'/api/books/{book_id}').get_json()['metadata_status'] == 'failed'
@@ -0,0 +1,50 @@
+import csv
+import io
+from datetime import datetime
+from conftest import add_books, add_reservations, add_user
+from export import parse_since
+from models import db, Book, Reservation
+
+
+def test_since_offsets_are_converted_to_utc():
+    assert parse_since('2024-09-01T00:00:00+05:00') == datetime(2024, 8, 31, 19, 0)
+    assert parse_since('2024-09-01T00:00:00Z') == datetime(2024, 9, 1)
+    assert parse_since('2024-09-01T00:00:00') == datetime(2024, 9, 1)
+
+
+def test_since_with_an_offset_filters_on_utc(app, client):
+    book_ids = add_books(app, 2)
+    student_id, _ = add_user(app, 'student')
+    _, teacher = add_user(app, 'teacher', role='teacher')
+    add_reservations(app, student_id, book_ids, status='returned')
+    with app.app_context():
+        first, second = Reservation.query.order_by(Reservation.id)
+        first.reservation_date = datetime(2024, 8, 31, 18, 30)
+        second.reservation_date = datetime(2024, 8, 31, 19, 30)
+        db.session.commit()
+        expected = second.id
+
+    # Midnight at +05:00 is 19:00 UTC the day before
+    response = client.get('/api/export/reservations?since=2024-09-01T00:00:00%2B05:00', headers=teacher)
+    assert response.status_code == 200
+    assert [row['id'] for row in map(app.json.loads, response.get_data(as_text=True).splitlines())] == [expected]
+
+
+def test_csv_cells_cannot_start_a_formula(app, client):
+    book_id = add_books(app, 1)[0]
+    student_id, _ = add_user(app, 'student')
+    _, teacher = add_user(app, 'teacher', role='teacher')
+    add_reservations(app, student_id, [book_id], status='returned')
+    with app.app_context():
+        db.session.get(Book, book_id).title = '@SUM(A1:A9)'
+        Reservation.query.one().notes = '=HYPERLINK("http://example.com","x")'
+        db.session.commit()
+
+    response = client.get('/api/export/reservations?format=csv', headers=teacher)
+    assert response.status_code == 200
+    row = next(csv.DictReader(io.StringIO(response.get_data(as_text=True))))
+    assert row['book_title'] == "'@SUM(A1:A9)"
+    assert row['notes'] == '\'=HYPERLINK("http://example.com","x")'
+
+    response = client.get('/api/export/books?format=csv', headers=teacher)
+    assert next(csv.DictReader(io.StringIO(response.get_data(as_text=True))))['title'] == "'@SUM(A1:A9)"
@@ -0,0 +1,26 @@
+import pytest
+from conftest import add_books
+from pagination import encode_cursor
+
+
+def test_cursors_page_through_the_catalog(app, client):
+    add_books(app, 5)
+
+    first = client.get('/api/books?limit=3').get_json()
+    second = client.get(f"/api/books?limit=3&cursor={first['next_cursor']}").get_json()
+    assert [book['title'] for book in first['books'] + second['books']] == [f'Book {i:04d}' for i in range(5)]
+    assert second['next_cursor'] is None
+
+
+@pytest.mark.parametrize('values', [
+    ['Book 0001', '1'],
+    [['Book 0001'], 1],
+    ['Book 0001', True],
+    [None, 1],
+    ['Book 0001', 1.5],
+    ['Book 0001'],
+])
+def test_crafted_cursors_are_rejected(app, client, values):
+    response = client.get(f'/api/books?limit=3&cursor={encode_cursor(values)}')
+    assert response.status_code == 400
+    assert response.get_json() == {'error': 'Invalid cursor'}
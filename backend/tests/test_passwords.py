@@ -0,0 +1,22 @@
+from conftest import add_user
+from models import db, User
+import passwords
+
+
+def login_with_hash_cost(app, client, rounds):
+    """Log in as a user whose hash has cost `rounds`; returns the cost stored afterwards"""
+    user_id, _ = add_user(app, f'user{rounds}')
+    with app.app_context():
+        db.session.get(User, user_id).password_hash = passwords.hash_password('password123', rounds=rounds)
+        db.session.commit()
+
+    response = client.post('/api/auth/login', json={'username': f'user{rounds}', 'password': 'password123'})
+    assert response.status_code == 200
+    with app.app_context():
+        return passwords.hash_cost(db.session.get(User, user_id).password_hash)
+
+
+def test_login_upgrades_weaker_hashes_and_keeps_stronger_ones(app, client):
+    app.config['BCRYPT_LOG_ROUNDS'] = 5
+    assert login_with_hash_cost(app, client, 4) == 5
+    assert login_with_hash_cost(app, client, 6) == 6
@@ -0,0 +1,167 @@
+from datetime import datetime, timedelta
+import pytest
+from flask import request
+from conftest import add_books, add_user
+from models import db, Book, IsbnMetadata, Reservation, User
+
+# The auth decorators answer a get_or_404 inside them with 401
+MISSING = (401, 404)
+
+
+def budgeted_routes(app):
+    """(method, rule) of every view declaring a @query_budget"""
+    routes = set()
+    for rule in app.url_map.iter_rules():
+        if getattr(app.view_functions[rule.endpoint], 'query_budget', None) is not None:
+            routes.update((method, rule.rule) for method in rule.methods - {'HEAD', 'OPTIONS'})
+    return routes
+
+
+def age_reservations(app, user_id):
+    """Push a user's pending reservations past the expiry window without sweeping them"""
+    with app.app_context():
+        db.session.execute(
+            db.update(Reservation)
+            .where(Reservation.user_id == user_id, Reservation.status == 'pending')
+            .values(reservation_date=datetime.utcnow() - timedelta(days=30))
+        )
+        db.session.commit()
+
+
+class LookupFailed(Exception):
+    pass
+
+
+@pytest.fixture
+def exercised(app):
+    """(method, rule) of every request made through the app"""
+    seen = set()
+
+    @app.after_request
+    def record(response):
+        if request.url_rule is not None:
+            seen.add((request.method, request.url_rule.rule))
+        return response
+
+    return seen
+
+
+def test_every_path_stays_within_its_budget(app, client, exercised, monkeypatch):
+    """Errors, retries and successes of each budgeted route, with QUERY_BUDGET_ENFORCE on.
+
+    A request over its budget raises QueryBudgetExceeded out of the test client.
+    """
+    def lookup(isbn):
+        raise LookupFailed(isbn)
+    monkeypatch.setattr(app.extensions['isbn_client'], 'lookup', lookup)
+
+    b0, b1, b2, b3 = add_books(app, 4)
+    shared = add_books(app, 1, copies=2, genre='Poetry')[0]
+    student_id, student = add_user(app, 'student', password='password123')
+    other_id, other = add_user(app, 'other')
+    _, third = add_user(app, 'third')
+    _, teacher = add_user(app, 'teacher', role='teacher')
+    inactive_id, _ = add_user(app, 'inactive', password='password123')
+    with app.app_context():
+        db.session.get(User, inactive_id).active = False
+        db.session.add_all([
+            IsbnMetadata(isbn='000', found=False),
+            IsbnMetadata(isbn='111', title='Known', author='A', genre='G', year=2000, description='D'),
+        ])
+        db.session.commit()
+
+    def call(method, path, status, headers=None, json=None):
+        response = client.open(path, method=method, headers=headers, json=json)
+        expected = status if isinstance(status, tuple) else (status,)
+        assert response.status_code in expected, (method, path, response.get_json(silent=True))
+        return response.get_json(silent=True)
+
+    # Authentication
+    call('POST', '/api/auth/login', 400, json={'username': 'student'})
+    call('POST', '/api/auth/login', 401, json={'username': 'nobody', 'password': 'password123'})
+    call('POST', '/api/auth/login', 401, json={'username': 'student', 'password': 'wrong-password'})
+    call('POST', '/api/auth/login', 401, json={'username': 'inactive', 'password': 'password123'})
+    app.config['BCRYPT_LOG_ROUNDS'] = 5  # the stored hash is upgraded
+    call('POST', '/api/auth/login', 200, json={'username': 'student', 'password': 'password123'})
+    call('GET', '/api/auth/me', 200, student)
+
+    # Catalog reads
+    call('GET', '/api/books?fields=nope', 400)
+    call('GET', '/api/books?limit=2&cursor=garbage', 400)
+    call('GET', '/api/books?limit=abc', 400)
+    call('GET', '/api/books?limit=2&genre=Fiction&available=true&search=book', 200)
+    call('GET', '/api/books/search', 400)
+    call('GET', '/api/books/search?q=book&limit=abc', 400)
+    call('GET', '/api/books/search?q=book', 200)
+    call('GET', '/api/books/facets?available=true', 200)
+    call('GET', '/api/books/999', 404)
+    call('GET', f'/api/books/{b0}?fields=nope', 400)
+    call('GET', '/api/genres', 200)
+
+    # Book writes
+    call('POST', '/api/books', 400, teacher, json={})
+    call('POST', '/api/books', 400, teacher, json={'isbn': 'isbn-Fiction-0'})
+    call('POST', '/api/books', 400, teacher, json={'isbn': '000'})
+    call('POST', '/api/books', 400, teacher, json={'isbn': '222', 'room_number': '4', 'title': 'T', 'author': 'A',
+                                                   'genre': 'G', 'year': 2000, 'description': 'D',
+                                                   'total_copies': 0})
+    call('POST', '/api/books', 201, teacher, json={'isbn': '111', 'room_number': '4'})
+    call('POST', '/api/books', 202, teacher, json={'isbn': '333'})
+    call('POST', '/api/books', 201, teacher, json={'isbn': '444', 'title': 'T', 'author': 'A', 'genre': 'G',
+                                                   'year': 2000, 'description': 'D', 'total_copies': 3})
+    call('PUT', '/api/books/999', MISSING, teacher, json={'title': 'x'})
+    call('PUT', f'/api/books/{b0}', 400, teacher, json={'available': False})
+    call('PUT', f'/api/books/{b0}', 400, teacher, json={'total_copies': 'two'})
+    call('PUT', f'/api/books/{b0}', 200, teacher, json={'title': 'Renamed', 'total_copies': 2})
+    call('DELETE', '/api/books/999', MISSING, teacher)
+
+    # Reservation creation, including both sweep-and-retry paths
+    call('POST', '/api/reservations', 400, student, json={})
+    call('POST', '/api/reservations', MISSING, student, json={'book_id': 999})
+    expired = call('POST', '/api/reservations', 201, student, json={'book_id': b1})['id']
+    call('POST', '/api/reservations', 400, student, json={'book_id': b2})  # already holds one
+    call('POST', '/api/reservations', 400, other, json={'book_id': b1})  # no copy left
+    age_reservations(app, student_id)
+    swept = call('POST', '/api/reservations', 201, other, json={'book_id': b1})['id']  # sweeps the book
+    age_reservations(app, other_id)
+    call('POST', '/api/reservations', 201, other, json={'book_id': b2})  # sweeps the student's own hold
+    held = call('POST', '/api/reservations', 201, third, json={'book_id': shared})['id']
+
+    # Reservation reads
+    call('GET', '/api/reservations?fields=nope', 400, student)
+    call('GET', '/api/reservations?status=pending&sideload=books', 200, teacher)
+    call('GET', '/api/reservations?fields=status', 200, other)
+    call('GET', '/api/reservations/stats?days=abc', 400, teacher)
+    call('GET', '/api/reservations/stats', 200, teacher)
+    call('GET', '/api/reservations/999', 404)
+    call('GET', f'/api/reservations/{held}', 200)
+
+    # Reservation updates
+    call('PUT', '/api/reservations/999', MISSING, student, json={'status': 'cancelled'})
+    call('PUT', f'/api/reservations/{held}', 403, student, json={'status': 'cancelled'})
+    call('PUT', f'/api/reservations/{held}', 400, third, json={'status': 'lost'})
+    call('PUT', f'/api/reservations/{held}', 200, third, json={'status': 'picked_up', 'notes': 'front desk'})
+    call('PUT', f'/api/reservations/{held}', 200, teacher, json={'status': 'returned'})
+    call('PUT', f'/api/reservations/{held}', 200, teacher, json={'status': 'pending', 'pickup_date': None})
+    call('PUT', f'/api/reservations/{swept}', 400, teacher, json={'status': 'pending'})  # other holds one
+    with app.app_context():
+        db.session.execute(db.update(Book).where(Book.id == b1).values(available_copies=0))
+        db.session.commit()
+    call('PUT', f'/api/reservations/{expired}', 400, student, json={'status': 'pending'})  # no copy left
+
+    # Deletes
+    call('DELETE', '/api/reservations/999', MISSING, student)
+    call('DELETE', f'/api/reservations/{held}', 403, student)
+    call('DELETE', f'/api/reservations/{held}', 200, third)
+    call('DELETE', f'/api/reservations/{expired}', 200, teacher)
+    call('DELETE', f'/api/books/{b3}', 200, teacher)
+
+    # Exports
+    call('GET', '/api/export/books?since=yesterday', 400, teacher)
+    call('GET', '/api/export/books?format=xml', 400, teacher)
+    call('GET', '/api/export/books?format=csv&since=2000-01-01', 200, teacher)
+    call('GET', '/api/export/reservations?since=yesterday', 400, teacher)
+    call('GET', '/api/export/reservations?status=pending', 200, teacher)
+
+    app.extensions['isbn_enrichment_pool'].shutdown(wait=True)
+    assert budgeted_routes(app) <= exercised
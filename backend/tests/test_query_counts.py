@@ -0,0 +1,40 @@
+import pytest
+from conftest import add_books, add_reservations, add_user
+
+# SQL statements per request (the X-Query-Count header with QUERY_DEBUG on),
+# which must not grow with the number of books or reservations returned.
+# Authenticated routes spend one of them loading the current user.
+ENDPOINTS = [
+    ('/api/books', None, 1),
+    ('/api/books?limit=20', None, 1),
+    ('/api/books?fields=title,author', None, 1),
+    ('/api/books/{book_id}', None, 1),
+    ('/api/reservations', 'teacher', 3),
+    ('/api/reservations', 'student', 3),
+    ('/api/reservations?sideload=books', 'teacher', 3),
+    ('/api/reservations?fields=status,book', 'teacher', 3),
+    ('/api/reservations?fields=status', 'teacher', 2),
+    ('/api/reservations/{reservation_id}', None, 1),
+]
+
+
+@pytest.mark.parametrize('book_count, reservation_count', [(3, 2), (80, 60)])
+def test_listing_query_counts_do_not_grow_with_rows(app, client, book_count, reservation_count):
+    book_ids = add_books(app, book_count, copies=2)
+    student_id, student = add_user(app, 'student')
+    other_id, _ = add_user(app, 'other')
+    _, teacher = add_user(app, 'teacher', role='teacher')
+    # Half each, so the teacher sees rows of two students and the student only their own
+    half = reservation_count // 2
+    add_reservations(app, student_id, book_ids[:half])
+    add_reservations(app, other_id, book_ids[:reservation_count - half])
+
+    headers = {'teacher': teacher, 'student': student, None: {}}
+    for path, user, expected in ENDPOINTS:
+        response = client.get(path.format(book_id=book_ids[-1], reservation_id=1), headers=headers[user])
+        assert response.status_code == 200, path
+        assert int(response.headers['X-Query-Count']) == expected, f"{path} as {user}"
+
+    listed = client.get('/api/reservations', headers=teacher).get_json()
+    assert len(listed) == reservation_count
+    assert all(reservation['book'] for reservation in listed)
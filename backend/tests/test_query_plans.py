@@ -0,0 +1,14 @@
+from app import endpoint_queries
+from models import db
+from query_plans import check_query_plans
+
+
+def test_endpoint_queries_use_an_index(app):
+    with app.app_context():
+        queries = endpoint_queries()
+        failures = check_query_plans(db.engine, queries)
+
+    names = [name for name, _ in queries]
+    assert any('facets' in name for name in names) and any('export' in name for name in names)
+    # {query: [tables read with a full scan]}; the plans are printed on failure
+    assert failures == {}
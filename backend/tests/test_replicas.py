@@ -0,0 +1,70 @@
+import shutil
+import pytest
+from app import create_app, init_db
+from conftest import add_books, add_user, make_config
+from models import db
+
+ORIGIN = 'http://localhost:3000'
+
+
+@pytest.fixture
+def replica_app(tmp_path):
+    """An app whose replica is a copy of the primary that never receives later writes"""
+    replica = tmp_path / 'replica.db'
+    app = create_app(make_config(
+        tmp_path,
+        DATABASE_REPLICA_URLS=[f'sqlite:///{replica}'],
+        REPLICA_STICKY_DIR=str(tmp_path / 'pins'),
+        REPLICA_STICKY_SECONDS=60,
+    ))
+    init_db(app)
+    yield app, replica
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose()
+
+
+def test_cross_origin_reads_follow_the_users_own_writes(replica_app, tmp_path):
+    app, replica = replica_app
+    book_id = add_books(app, 1)[0]
+    _, teacher = add_user(app, 'teacher', role='teacher')
+    _, student = add_user(app, 'student')
+    with app.app_context():
+        db.engine.dispose()
+    shutil.copy(tmp_path / 'test.db', replica)
+
+    # A browser calling the API from another origin sends no cookies
+    client = app.test_client(use_cookies=False)
+
+    def get_title(headers=None):
+        response = client.get(f'/api/books/{book_id}', headers={'Origin': ORIGIN, **(headers or {})})
+        assert response.status_code == 200
+        assert response.headers['Access-Control-Allow-Origin'] in ('*', ORIGIN)
+        return response.get_json()['title']
+
+    preflight = client.options(f'/api/books/{book_id}', headers={
+        'Origin': ORIGIN,
+        'Access-Control-Request-Method': 'PUT',
+        'Access-Control-Request-Headers': 'authorization,content-type',
+    })
+    assert 'authorization' in preflight.headers['Access-Control-Allow-Headers'].lower()
+
+    response = client.put(f'/api/books/{book_id}', headers={'Origin': ORIGIN, **teacher}, json={'title': 'Renamed'})
+    assert response.status_code == 200
+    assert 'Set-Cookie' not in response.headers
+
+    # Others still read the lagging replica; the writer reads the primary
+    assert get_title() == 'Book 0000'
+    assert get_title(student) == 'Book 0000'
+    assert get_title(teacher) == 'Renamed'
+
+
+def test_pins_expire(replica_app):
+    app, _ = replica_app
+    app.config['REPLICA_STICKY_SECONDS'] = -1
+    teacher_id, teacher = add_user(app, 'teacher', role='teacher')
+    book_id = add_books(app, 1)[0]
+
+    client = app.test_client(use_cookies=False)
+    assert client.put(f'/api/books/{book_id}', headers=teacher, json={'title': 'Renamed'}).status_code == 200
+    assert not app.extensions['primary_pins'].pinned(str(teacher_id))
@@ -0,0 +1,160 @@
+import random
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+import pytest
+from app import expire_old_reservations
+from conftest import add_books, add_user
+from models import db, Book, Reservation
+
+THREADS = 8
+ATTEMPTS = 6
+
+
+def reserve_concurrently(app, students, book_ids):
+    """Every student reserves random books from `book_ids` at once; returns the status codes"""
+    statuses = Counter()
+    lock = threading.Lock()
+    barrier = threading.Barrier(len(students))
+
+    def student(index, headers):
+        client = app.test_client()
+        rng = random.Random(index)
+        barrier.wait()
+        for _ in range(ATTEMPTS):
+            response = client.post('/api/reservations', headers=headers, json={'book_id': rng.choice(book_ids)})
+            with lock:
+                statuses[response.status_code] += 1
+
+    threads = [threading.Thread(target=student, args=(i, headers)) for i, headers in enumerate(students)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return statuses
+
+
+@pytest.mark.parametrize('copies', [1, 2])
+def test_concurrent_reservations_never_double_book(app, copies):
+    book_ids = add_books(app, 3, copies=copies)
+    students = [add_user(app, f'student{i}')[1] for i in range(THREADS)]
+
+    statuses = reserve_concurrently(app, students, book_ids)
+
+    # Lost races are 400s, never errors
+    assert set(statuses) <= {201, 400}
+    with app.app_context():
+        pending = db.session.execute(
+            db.select(Reservation.book_id, Reservation.user_id).where(Reservation.status == 'pending')
+        ).all()
+        books = {book.id: book for book in Book.query}
+
+    assert statuses[201] == len(pending) > 0
+    per_book = Counter(book_id for book_id, _ in pending)
+    per_student = Counter(user_id for _, user_id in pending)
+    # No book handed out more copies than it has, no student holds two
+    assert all(count <= copies for count in per_book.values())
+    assert all(count == 1 for count in per_student.values())
+    # Every copy is either on the shelf or held by exactly one pending reservation
+    for book_id, book in books.items():
+        assert book.available_copies == copies - per_book[book_id]
+
+
+def test_copy_counters_do_not_drift_under_concurrent_updates(app):
+    """Reserve, pick up, return, cancel, delete and expire at once, as inventory_benchmark does"""
+    book_ids = add_books(app, 3, copies=2)
+    students = [add_user(app, f'student{i}')[1] for i in range(THREADS)]
+    _, teacher_headers = add_user(app, 'teacher', role='teacher')
+    statuses = Counter()
+    reservation_ids = []
+    lock = threading.Lock()
+    barrier = threading.Barrier(THREADS + 2)
+    done = threading.Event()
+
+    def record(response):
+        with lock:
+            statuses[response.status_code] += 1
+
+    def student(index, headers):
+        client = app.test_client()
+        rng = random.Random(index)
+        barrier.wait()
+        for _ in range(ATTEMPTS):
+            response = client.post('/api/reservations', headers=headers, json={'book_id': rng.choice(book_ids)})
+            record(response)
+            if response.status_code != 201:
+                continue
+            reservation_id = response.get_json()['id']
+            with lock:
+                reservation_ids.append(reservation_id)
+
+            path = f'/api/reservations/{reservation_id}'
+            action = rng.random()
+            if action < 0.4:
+                record(client.put(path, headers=headers, json={'status': 'picked_up'}))
+                record(client.put(path, headers=headers, json={'status': 'returned'}))
+            elif action < 0.6:
+                record(client.put(path, headers=headers, json={'status': 'cancelled'}))
+            elif action < 0.8:
+                record(client.delete(path, headers=headers))
+            # Otherwise leave it pending for the teacher and the sweeper
+
+    def teacher():
+        client = app.test_client()
+        rng = random.Random(THREADS)
+        barrier.wait()
+        while not done.is_set():
+            with lock:
+                recent = reservation_ids[-20:]
+            if not recent:
+                time.sleep(0.001)
+                continue
+            status = rng.choice(['cancelled', 'returned', 'picked_up', 'pending'])
+            record(client.put(f'/api/reservations/{rng.choice(recent)}', headers=teacher_headers,
+                              json={'status': status}))
+
+    def sweeper():
+        rng = random.Random(THREADS + 1)
+        barrier.wait()
+        while not done.is_set():
+            with app.app_context():
+                # Age some pending reservations past the expiry window, then sweep
+                cutoff = datetime.utcnow() - timedelta(days=app.config['RESERVATION_EXPIRY_DAYS'] + 1)
+                pending = db.session.scalars(
+                    db.select(Reservation.id).where(Reservation.status == 'pending')
+                ).all()
+                if pending:
+                    db.session.execute(
+                        db.update(Reservation)
+                        .where(Reservation.id.in_(rng.sample(pending, max(1, len(pending) // 3))))
+                        .values(reservation_date=cutoff)
+                    )
+                    db.session.commit()
+                expire_old_reservations()
+            time.sleep(0.005)
+
+    threads = [threading.Thread(target=student, args=(i, headers)) for i, headers in enumerate(students)]
+    background = [threading.Thread(target=teacher), threading.Thread(target=sweeper)]
+    for thread in threads + background:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    done.set()
+    for thread in background:
+        thread.join()
+
+    # Lost races and rejected transitions are 4xx, never errors
+    assert statuses[201] > 0
+    assert all(status < 500 for status in statuses)
+    with app.app_context():
+        held = Counter(dict(
+            db.session.query(Reservation.book_id, db.func.count())
+            .filter(Reservation.status.in_(Reservation.HOLDS_COPY))
+            .group_by(Reservation.book_id)
+        ))
+        counters = {book.id: (book.total_copies, book.available_copies) for book in Book.query}
+
+    for book_id, (total, available) in counters.items():
+        assert 0 <= available <= total
+        assert available == total - held[book_id], f'book {book_id} drifted'
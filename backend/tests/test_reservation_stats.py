@@ -0,0 +1,13 @@
+from conftest import add_books, add_reservations, add_user
+
+
+def test_top_borrowers_are_students_only(app, client):
+    book_ids = add_books(app, 4)
+    student_id, _ = add_user(app, 'student')
+    teacher_id, teacher = add_user(app, 'teacher', role='teacher')
+    add_reservations(app, student_id, book_ids[:1], status='returned')
+    add_reservations(app, teacher_id, book_ids, status='returned')
+
+    response = client.get('/api/reservations/stats', headers=teacher)
+    assert response.status_code == 200
+    assert [borrower['user_id'] for borrower in response.get_json()['top_borrowers']] == [student_id]
@@ -0,0 +1,16 @@
+from conftest import add_books
+from models import db, Book
+
+
+def test_snippets_are_escaped_around_the_marks(app, client):
+    book_id = add_books(app, 1)[0]
+    with app.app_context():
+        book = db.session.get(Book, book_id)
+        book.description = 'Dragons & <img src=x onerror=alert(1)>'
+        db.session.commit()
+
+    response = client.get('/api/books/search?q=dragon')
+    assert response.status_code == 200
+    assert response.get_json()['results'][0]['snippet'] == (
+        '<mark>Dragons</mark> &amp; &lt;img src=x onerror=alert(1)&gt;'
+    )
@@ -24,13 +24,18 @@ export const getBooks = async (filters = {}) => {
   
   const url = `${API_BASE_URL}/books${params.toString() ? '?' + params.toString() : ''}`;
   
-  const response = await fetch(url);
+  // Signed-in users read their own writes: the API routes their catalog reads to the primary
+  const response = await fetch(url, {
+    headers: getAuthHeaders(),
+  });
   if (!response.ok) throw new Error('Failed to fetch books');
   return response.json();
 };
 
 export const getBook = async (bookId) => {
-  const response = await fetch(`${API_BASE_URL}/books/${bookId}`);
+  const response = await fetch(`${API_BASE_URL}/books/${bookId}`, {
+    headers: getAuthHeaders(),
+  });
   if (!response.ok) throw new Error('Failed to fetch book');
   return response.json();
 };
@@ -111,6 +116,14 @@ export const getReservations = async (filters = {}) => {
   return response.json();
 };
 
+export const getReservationStats = async (days = 30) => {
+  const response = await fetch(`${API_BASE_URL}/reservations/stats?days=${days}`, {
+    headers: getAuthHeaders(),
+  });
+  if (!response.ok) throw new Error('Failed to fetch reservation stats');
+  return response.json();
+};
+
 export const updateReservation = async (reservationId, updateData) => {
   const response = await fetch(`${API_BASE_URL}/reservations/${reservationId}`, {
     method: 'PUT',
@@ -124,7 +137,9 @@ export const updateReservation = async (reservationId, updateData) => {
 
 // Utility API calls
 export const getGenres = async () => {
-  const response = await fetch(`${API_BASE_URL}/genres`);
+  const response = await fetch(`${API_BASE_URL}/genres`, {
+    headers: getAuthHeaders(),
+  });
   if (!response.ok) throw new Error('Failed to fetch genres');
   return response.json();
 };
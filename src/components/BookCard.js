@@ -16,6 +16,9 @@ function BookCard({ book, onReserve, isTeacher, onEdit, onDelete }) {
         </div>
         <p className="book-description">{book.description}</p>
         <p className="book-isbn">ISBN: {book.isbn}</p>
+        {book.total_copies > 1 && (
+          <p className="book-copies">{book.available_copies} of {book.total_copies} copies available</p>
+        )}
         {book.room_number && (
           <div className="book-location">
             <span className="location-icon">📍</span>
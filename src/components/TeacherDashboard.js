@@ -1,12 +1,13 @@
 import React, { useState, useEffect } from 'react';
-import { getReservations, updateReservation } from '../api/library';
+import { getReservations, getReservationStats, updateReservation } from '../api/library';
 import { useAuth } from '../context/AuthContext';
 
 function TeacherDashboard({ onReservationChange }) {
   const { isTeacher } = useAuth();
   const [pendingReservations, setPendingReservations] = useState([]);
   const [recentPickups, setRecentPickups] = useState([]);
-  const [expiredReservations, setExpiredReservations] = useState([]);
+  const [overdueReservations, setOverdueReservations] = useState([]);
+  const [stats, setStats] = useState(null);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState('');
   const [processing, setProcessing] = useState(null);
@@ -21,19 +22,17 @@ function TeacherDashboard({ onReservationChange }) {
     try {
       setLoading(true);
 
-      // Fetch all reservations
-      const allReservations = await getReservations({});
-
-      // Separate by status
-      const pending = allReservations.filter(r => r.status === 'pending');
-      const pickedUp = allReservations
-        .filter(r => r.status === 'picked_up')
-        .slice(0, 5); // Show only 5 most recent
-      const expired = allReservations.filter(r => r.status === 'expired');
+      // Pending reservations (at most one per student) plus the server-side
+      // summary, instead of every reservation ever made
+      const [pending, summary] = await Promise.all([
+        getReservations({ status: 'pending' }),
+        getReservationStats(),
+      ]);
 
       setPendingReservations(pending);
-      setRecentPickups(pickedUp);
-      setExpiredReservations(expired);
+      setRecentPickups(summary.checked_out.reservations.slice(0, 5)); // Show only 5 most recent
+      setOverdueReservations(summary.overdue_pickups.reservations);
+      setStats(summary);
       setError('');
     } catch (err) {
       setError('Failed to load reservations');
@@ -43,10 +42,10 @@ function TeacherDashboard({ onReservationChange }) {
     }
   };
 
-  const handleMarkAsPickedUp = async (reservationId) => {
+  const handleStatusChange = async (reservationId, status, message) => {
     try {
       setProcessing(reservationId);
-      await updateReservation(reservationId, { status: 'picked_up' });
+      await updateReservation(reservationId, { status });
 
       // Refresh reservations
       await fetchReservations();
@@ -56,7 +55,7 @@ function TeacherDashboard({ onReservationChange }) {
         onReservationChange();
       }
 
-      alert('Book marked as picked up!');
+      alert(message);
     } catch (err) {
       setError('Failed to update reservation');
       console.error(err);
@@ -84,6 +83,14 @@ function TeacherDashboard({ onReservationChange }) {
 
       {error && <div className="error-message">{error}</div>}
 
+      {stats && (
+        <p className="dashboard-summary">
+          {stats.checked_out.count} checked out · {stats.overdue_pickups.count} overdue ·{' '}
+          {stats.by_status.picked_up} picked up · {stats.by_status.cancelled} cancelled ·{' '}
+          {stats.by_status.expired} expired
+        </p>
+      )}
+
       {/* Pending Pickups Section */}
       <div className="dashboard-section">
         <h3>📚 Pending Pickups ({pendingReservations.length})</h3>
@@ -110,7 +117,7 @@ function TeacherDashboard({ onReservationChange }) {
                 <div className="reservation-actions">
                   <button
                     className="btn-mark-picked-up"
-                    onClick={() => handleMarkAsPickedUp(reservation.id)}
+                    onClick={() => handleStatusChange(reservation.id, 'picked_up', 'Book marked as picked up!')}
                     disabled={processing === reservation.id}
                   >
                     {processing === reservation.id ? 'Processing...' : '✓ Mark as Picked Up'}
@@ -122,37 +129,46 @@ function TeacherDashboard({ onReservationChange }) {
         )}
       </div>
 
-      {/* Recent Pickups Section */}
+      {/* Checked Out Section */}
       <div className="dashboard-section">
-        <h3>✅ Recent Pickups</h3>
+        <h3>✅ Checked Out ({stats ? stats.checked_out.count : 0})</h3>
         {recentPickups.length === 0 ? (
-          <p className="no-data">No recent pickups</p>
+          <p className="no-data">No books checked out</p>
         ) : (
           <div className="reservations-list compact">
             {recentPickups.map((reservation) => (
-              <div key={reservation.id} className="reservation-item picked-up">
+              <div key={reservation.reservation_id} className="reservation-item picked-up">
                 <div className="reservation-details">
-                  <p className="book-title">{reservation.book?.title}</p>
+                  <p className="book-title">{reservation.book_title}</p>
                   <p className="student-name-small">{reservation.user_name}</p>
                   <p className="pickup-time">
                     Picked up: {new Date(reservation.reservation_date).toLocaleDateString()}
                   </p>
                 </div>
+                <div className="reservation-actions">
+                  <button
+                    className="btn-mark-picked-up"
+                    onClick={() => handleStatusChange(reservation.reservation_id, 'returned', 'Book marked as returned!')}
+                    disabled={processing === reservation.reservation_id}
+                  >
+                    {processing === reservation.reservation_id ? 'Processing...' : '↩ Mark as Returned'}
+                  </button>
+                </div>
               </div>
             ))}
           </div>
         )}
       </div>
 
-      {/* Expired Reservations Section */}
-      {expiredReservations.length > 0 && (
+      {/* Overdue Pickups Section */}
+      {overdueReservations.length > 0 && (
         <div className="dashboard-section">
-          <h3>⏰ Expired Reservations ({expiredReservations.length})</h3>
+          <h3>⏰ Overdue Pickups ({stats.overdue_pickups.count})</h3>
           <div className="reservations-list compact">
-            {expiredReservations.map((reservation) => (
-              <div key={reservation.id} className="reservation-item expired">
+            {overdueReservations.map((reservation) => (
+              <div key={reservation.reservation_id} className="reservation-item expired">
                 <div className="reservation-details">
-                  <p className="book-title">{reservation.book?.title}</p>
+                  <p className="book-title">{reservation.book_title}</p>
                   <p className="student-name-small">{reservation.user_name}</p>
                   <p className="expired-time">
                     Reserved: {new Date(reservation.reservation_date).toLocaleDateString()}